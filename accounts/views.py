@@ -3,7 +3,9 @@ from django.contrib import messages
 from django.views import generic
 from django.urls import reverse_lazy
 
+from cookbook.favorites import mark_favorites
 from cookbook.models import Recipe, User
+from cookbook.views import FavoritesFeedMixin
 from .forms import SignUpForm, UserUpdateForm
 
 
@@ -22,22 +24,27 @@ class SignUpView(generic.CreateView):
         return super().form_valid(form) # noqa
 
 
-class ProfileView(LoginRequiredMixin, generic.TemplateView):
+class ProfileView(LoginRequiredMixin, FavoritesFeedMixin,
+                  generic.TemplateView):
     """Current user's profile view"""
     template_name = "registration/profile.html"
+    query_budget = 10
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
-        user_recipes = Recipe.objects.filter(author=user)
+        user_recipes = Recipe.objects.filter(
+            author=user
+        ).select_related("author", "category")
 
+        context.update(self.get_favorites_context())
         context.update({
             "profile_user": user,
             "user_recipes": user_recipes,
-            "favorite_recipes": user.favorite_recipes.all(),
             "total_recipes": user_recipes.count(),
             "total_comments": user.comments.count(),
         })
+        mark_favorites(user, user_recipes, context["favorite_recipes"])
         return context
 
 
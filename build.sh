@@ -7,8 +7,19 @@ set -o errexit
 pip install -r requirements.txt
 
 
-# Convert static asset files
+# Collect static files under content-hashed names, gzip and brotli
+# compressed. With STATIC_CACHE_DIR kept between builds, only the files
+# whose content changed are written and compressed again
+if [ -n "$STATIC_CACHE_DIR" ] && [ -d "$STATIC_CACHE_DIR" ]; then
+    mkdir -p staticfiles
+    cp -a "$STATIC_CACHE_DIR/." staticfiles/
+fi
 python manage.py collectstatic --no-input
+if [ -n "$STATIC_CACHE_DIR" ]; then
+    rm -rf "$STATIC_CACHE_DIR"
+    mkdir -p "$STATIC_CACHE_DIR"
+    cp -a staticfiles/. "$STATIC_CACHE_DIR/"
+fi
 
 
 # Apply any outstanding database migrations
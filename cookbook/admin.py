@@ -1,13 +1,19 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db.models import Count, F, FloatField
+from django.db.models.functions import Cast, NullIf
+from django.forms.models import BaseInlineFormSet
 
 from .models import (
     User,
     Category,
     Tag,
     Recipe,
-    Comment
+    Comment,
+    ImageDeletion
 )
+from .renditions import responsive_image
 
 
 @admin.register(User)
@@ -55,10 +61,16 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ["name", "recipe_count"]
     search_fields = ["name"]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            _recipe_count=Count("recipes")
+        )
+
     def recipe_count(self, obj):
-        return obj.recipes.count()
+        return obj._recipe_count
 
     recipe_count.short_description = "Number of Recipes"
+    recipe_count.admin_order_field = "_recipe_count"
 
 
 @admin.register(Tag)
@@ -72,37 +84,86 @@ class TagAdmin(admin.ModelAdmin):
     search_fields = ["name"]
     prepopulated_fields = {"slug": ("name",)}
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            _recipe_count=Count("recipes")
+        )
+
     def recipe_count(self, obj):
-        return obj.recipes.count()
+        return obj._recipe_count
 
     recipe_count.short_description = "Number of Recipes"
+    recipe_count.admin_order_field = "_recipe_count"
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Inline formset limited to one page of the parent's objects"""
+    page = None
+
+    def __init__(self, *args, queryset=None, **kwargs):
+        if self.page is not None:
+            queryset = queryset.filter(pk__in=list(self.page.object_list))
+        super().__init__(*args, queryset=queryset, **kwargs)
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        # Rows show str(obj), which usually mentions the parent
+        setattr(form.instance, self.fk.name, self.instance)
+        return form
 
 
 class CommentInline(admin.TabularInline):
-    """Inline comments for Recipe admin"""
+    """Inline comments for Recipe admin, one page at a time"""
     model = Comment
+    formset = PaginatedInlineFormSet
+    template = "admin/cookbook/recipe/comment_inline.html"
     extra = 0
+    per_page = 20
+    page_param = "comments_page"
     fields = [
         "author",
         "content",
         "rating",
         "created_at"
     ]
-    readonly_fields = ["created_at"]
+    # Editable, it would load every user (or one per row with
+    # raw_id_fields); comments are added through the Comment admin
+    readonly_fields = ["author", "created_at"]
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        if obj is None or obj.pk is None:
+            return formset
+        comment_ids = (obj.comments
+                       .order_by("-created_at", "-pk")
+                       .values_list("pk", flat=True)
+                       )
+        formset.page = Paginator(comment_ids, self.per_page).get_page(
+            request.GET.get(self.page_param)
+        )
+        return formset
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("author")
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Recipe admin panel"""
     list_display = [
+        "thumbnail",
         "title",
         "author",
         "category",
         "cooking_time",
         "servings",
         "created_at",
-        "average_rating"
+        "rating"
     ]
+    list_select_related = ["author", "category"]
     list_filter = [
         "category",
         "tags",
@@ -154,6 +215,25 @@ class RecipeAdmin(admin.ModelAdmin):
 
     inlines = [CommentInline]
 
+    def thumbnail(self, obj):
+        if not obj.image:
+            return ""
+        return responsive_image(obj.image, "admin-thumb", alt=obj.title)
+
+    thumbnail.short_description = "Image"
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            _average_rating=Cast("rating_sum", FloatField())
+            / NullIf(F("rating_count"), 0)
+        )
+
+    def rating(self, obj):
+        return obj.average_rating
+
+    rating.short_description = "Average rating"
+    rating.admin_order_field = "_average_rating"
+
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
@@ -165,6 +245,7 @@ class CommentAdmin(admin.ModelAdmin):
         "created_at",
         "short_content"
     ]
+    list_select_related = ["author", "recipe"]
     list_filter = [
         "rating",
         "created_at",
@@ -184,3 +265,16 @@ class CommentAdmin(admin.ModelAdmin):
             else obj.content
 
     short_content.short_description = "Content Preview"
+
+
+@admin.register(ImageDeletion)
+class ImageDeletionAdmin(admin.ModelAdmin):
+    """Pending Cloudinary image deletions"""
+    list_display = [
+        "public_id",
+        "attempts",
+        "next_attempt_at",
+        "created_at"
+    ]
+    search_fields = ["public_id"]
+    readonly_fields = ["created_at"]
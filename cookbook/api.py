@@ -0,0 +1,332 @@
+"""Read-only JSON API for recipes, categories and tags.
+
+The endpoints subclass the HTML views, so they filter, sort and paginate
+exactly like the pages do and only replace the template with a JSON
+body. ``?fields=title,author`` limits the recipe fields returned.
+``SuggestionAPIView`` answers search-as-you-type lookups from the
+suggestion index (see ``cookbook.suggest``) without touching a page view.
+
+Recipe responses carry an ETag built from the version of every recipe
+they contain (``updated_at``, which comment activity, tag changes and
+renaming its author, category or tags bump as well, see
+``cookbook.signals``); the detail endpoint also sends it as
+Last-Modified. Both come from the database alone, so every process
+computes the same validators. A conditional GET that matches is
+answered with 304 before tags are loaded or anything is serialized.
+Lists have no Last-Modified, a deleted recipe changes a page without
+making anything on it newer.
+"""
+import hashlib
+
+from django.db.models import (
+    aprefetch_related_objects,
+    prefetch_related_objects
+)
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag, urlencode
+from django.views import View
+
+from .models import Recipe
+from .suggest import DEFAULT_LIMIT, MAX_LIMIT, suggest
+from .views import (
+    CategoryListView,
+    RecipeDetailView,
+    RecipeListView,
+    TagListView
+)
+
+
+def _category(recipe):
+    category = recipe.category
+    if category is None:
+        return None
+    return {"id": category.pk, "name": category.name}
+
+
+RECIPE_FIELDS = {
+    "id": lambda recipe: recipe.pk,
+    "title": lambda recipe: recipe.title,
+    "description": lambda recipe: recipe.description,
+    "ingredients": lambda recipe: recipe.ingredients,
+    "instructions": lambda recipe: recipe.instructions,
+    "cooking_time": lambda recipe: recipe.cooking_time,
+    "servings": lambda recipe: recipe.servings,
+    "image": lambda recipe: recipe.image.url if recipe.image else None,
+    "author": lambda recipe: {
+        "id": recipe.author_id,
+        "username": recipe.author.username,
+    },
+    "category": _category,
+    "tags": lambda recipe: [
+        {"id": tag.pk, "name": tag.name, "slug": tag.slug}
+        for tag in recipe.tags.all()
+    ],
+    "average_rating": lambda recipe: recipe.average_rating,
+    "rating_count": lambda recipe: recipe.rating_count,
+    "comment_count": lambda recipe: recipe.comment_count,
+    "favorite_count": lambda recipe: recipe.favorite_count,
+    "created_at": lambda recipe: recipe.created_at,
+    "updated_at": lambda recipe: recipe.updated_at,
+}
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+class JSONResponseMixin:
+    """Renders views as JSON, honouring conditional GETs"""
+    # Conditional GETs make them cheap already, and cached copies
+    # would lose the validators
+    page_cache = False
+
+    @staticmethod
+    def set_validators(response, etag=None, last_modified=None):
+        if etag is not None:
+            response.headers["ETag"] = etag
+        if last_modified is not None:
+            response.headers["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def render_json(self, data, etag=None, last_modified=None):
+        return self.set_validators(
+            JsonResponse(data, safe=False),
+            etag,
+            last_modified
+        )
+
+    def not_modified(self, etag, last_modified=None):
+        """304 response if the client's copy is current, else None"""
+        response = get_conditional_response(
+            self.request,
+            etag=etag,
+            last_modified=last_modified
+        )
+        if response is not None:
+            self.set_validators(response, etag, last_modified)
+        return response
+
+    def error(self, message, status=400):
+        return JsonResponse({"error": message}, status=status)
+
+
+class RecipeJSONMixin(JSONResponseMixin):
+    def get_fields(self):
+        requested = self.request.GET.get("fields")
+        if not requested:
+            return list(RECIPE_FIELDS)
+        fields = [name.strip() for name in requested.split(",")]
+        unknown = [name for name in fields if name not in RECIPE_FIELDS]
+        if unknown:
+            raise InvalidFields(f"Unknown fields: {', '.join(unknown)}")
+        return list(dict.fromkeys(fields))
+
+    def get_queryset(self):
+        # Tags are loaded only once the conditional check missed
+        return super().get_queryset().prefetch_related(None)
+
+    def serialize(self, recipes, fields):
+        if "tags" in fields:
+            prefetch_related_objects(recipes, "tags")
+        return [
+            {name: RECIPE_FIELDS[name](recipe) for name in fields}
+            for recipe in recipes
+        ]
+
+    async def aserialize(self, recipes, fields):
+        if "tags" in fields:
+            await aprefetch_related_objects(recipes, "tags")
+        # Prefetched tags are not loaded again
+        return self.serialize(recipes, fields)
+
+    @staticmethod
+    def version(recipe):
+        return recipe.pk, recipe.updated_at.timestamp()
+
+    @staticmethod
+    def detail_validators(pk, fields, updated_at):
+        """(ETag, Last-Modified) of a single recipe"""
+        timestamp = updated_at.timestamp()
+        return make_etag(fields, pk, timestamp), int(timestamp)
+
+
+class RecipeListAPIView(RecipeJSONMixin, RecipeListView):
+    """Recipe list with the filters and sorts of the HTML listing"""
+    query_budget = 6
+
+    def get(self, request, *args, **kwargs):
+        try:
+            fields = self.get_fields()
+        except InvalidFields as exc:
+            return self.error(str(exc))
+
+        self.object_list = self.get_queryset()
+        paginator, page, recipes, _ = self.paginate_queryset(
+            self.object_list,
+            self.paginate_by
+        )
+        recipes = list(recipes)
+        links = {
+            "next": self.page_link(page, forward=True),
+            "previous": self.page_link(page, forward=False),
+        }
+
+        etag = make_etag(
+            fields,
+            [self.version(recipe) for recipe in recipes],
+            links
+        )
+        response = self.not_modified(etag)
+        if response is not None:
+            return response
+
+        data = {"results": self.serialize(recipes, fields), **links}
+        if not self.get_cursor_pagination():
+            data["count"] = paginator.count
+        return self.render_json(data, etag=etag)
+
+    def page_link(self, page, forward):
+        if forward and not page.has_next():
+            return None
+        if not forward and not page.has_previous():
+            return None
+
+        params = self.request.GET.copy()
+        if self.get_cursor_pagination():
+            params[self.cursor_kwarg] = (
+                page.next_cursor if forward else page.previous_cursor
+            )
+        else:
+            params[self.page_kwarg] = (
+                page.next_page_number() if forward
+                else page.previous_page_number()
+            )
+        return self.request.build_absolute_uri(
+            f"{self.request.path}?{params.urlencode()}"
+        )
+
+
+class RecipeDetailAPIView(RecipeJSONMixin, RecipeDetailView):
+    """A single recipe; its comments stay on the HTML page"""
+    query_budget = 4
+
+    def get_queryset(self):
+        # Without the viewer's favorite flag, which costs the session and
+        # user lookups for nothing
+        return Recipe.objects.select_related("author", "category")
+
+    def get(self, request, *args, **kwargs):
+        try:
+            fields = self.get_fields()
+        except InvalidFields as exc:
+            return self.error(str(exc))
+
+        # The version alone decides 304s, before the full row is loaded
+        updated_at = Recipe.objects.filter(
+            pk=kwargs["pk"]
+        ).values_list("updated_at", flat=True).first()
+        if updated_at is None:
+            raise Http404("No recipe found matching the query")
+
+        etag, last_modified = self.detail_validators(
+            kwargs["pk"],
+            fields,
+            updated_at
+        )
+        response = self.not_modified(etag, last_modified)
+        if response is not None:
+            return response
+
+        self.object = self.get_object()
+        data = self.serialize([self.object], fields)[0]
+        return self.render_json(data, etag, last_modified)
+
+
+class CategoryListAPIView(JSONResponseMixin, CategoryListView):
+    query_budget = 2
+
+    def get(self, request, *args, **kwargs):
+        data = [
+            {
+                "id": category.pk,
+                "name": category.name,
+                "description": category.description,
+                "recipe_count": category.recipe_count,
+            }
+            for category in self.get_queryset()
+        ]
+        etag = make_etag(data)
+        return self.not_modified(etag) or self.render_json(data, etag)
+
+
+class TagListAPIView(JSONResponseMixin, TagListView):
+    query_budget = 2
+
+    def get(self, request, *args, **kwargs):
+        data = [
+            {
+                "id": tag.pk,
+                "name": tag.name,
+                "slug": tag.slug,
+                "recipe_count": tag.recipe_count,
+            }
+            for tag in self.get_queryset()
+        ]
+        etag = make_etag(data)
+        return self.not_modified(etag) or self.render_json(data, etag)
+
+
+class SuggestionAPIView(JSONResponseMixin, View):
+    """Suggestions for a partial query, ``?q=tomat&limit=5``"""
+    # Lookups are answered from memory; rebuilding the in-process index
+    # loads names and weights of every source once
+    query_budget = 5
+    read_replica = True
+    # Browsers ask again for every key typed, backspacing included
+    max_age = 60
+
+    @staticmethod
+    def url(suggestion):
+        if suggestion.kind == "recipe":
+            return reverse("cookbook:recipe-detail", args=[suggestion.pk])
+        # The listing, filtered down to the suggestion
+        if suggestion.kind == "ingredient":
+            params = {"ingredients": suggestion.label}
+        else:
+            params = {suggestion.kind: suggestion.pk}
+        return f"{reverse('cookbook:recipe-list')}?{urlencode(params)}"
+
+    def get_limit(self):
+        limit = int(self.request.GET.get("limit", DEFAULT_LIMIT))
+        return max(1, min(limit, MAX_LIMIT))
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get("q", "")
+        try:
+            limit = self.get_limit()
+        except ValueError:
+            return self.error("limit must be a number")
+        return self.render_suggestions(query, *suggest(query, limit))
+
+    def render_suggestions(self, query, suggestions, did_you_mean):
+        response = self.render_json({
+            "query": query,
+            "suggestions": [
+                {
+                    "type": suggestion.kind,
+                    "id": suggestion.pk,
+                    "label": suggestion.label,
+                    "url": self.url(suggestion),
+                }
+                for suggestion in suggestions
+            ],
+            "did_you_mean": did_you_mean,
+        })
+        patch_cache_control(response, public=True, max_age=self.max_age)
+        return response
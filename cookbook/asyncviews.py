@@ -0,0 +1,191 @@
+"""Native async variants of the read views, for ASGI deployments.
+
+The variants run on the event loop and use the async ORM interface,
+starting the queries that do not depend on each other together with
+``asyncio.gather``: the listing's page, total and facet counts, the
+detail page's recipe, comments and related recipes. Templates are still
+rendered in a thread, by Django, after the view returns.
+
+Django runs the ORM calls of one request one at a time in the request's
+sync thread, so gathered queries are not parallel on the database, and
+each async ORM call is a hop to that thread where a sync view makes one
+for the whole request. Whether that pays off depends on the deployment;
+compare ``benchmark_views`` with ``benchmark_views --asgi`` and the two
+servers under load (see ``cookbook_project.settings.asgi``).
+
+Each variant subclasses its sync view, so querysets, filters, query
+budgets, replica routing and templates stay shared; only ``get`` and
+the page cache dispatch differ. ``as_view`` picks them for
+``cookbook.urls`` when COOKBOOK_ASYNC_VIEWS is on.
+"""
+import asyncio
+
+from django.conf import settings
+from django.http import Http404
+
+from .api import (
+    InvalidFields,
+    RecipeDetailAPIView,
+    RecipeListAPIView,
+    SuggestionAPIView,
+    make_etag
+)
+from .facets import aget_facets
+from .favorites import amark_favorites
+from .models import Recipe
+from .pagecache import AsyncPageCacheMixin
+from .suggest import asuggest
+from .views import RecipeDetailView, RecipeListView
+
+
+async def load_user(request):
+    """Resolves ``request.user``.
+
+    The lazy user of AuthenticationMiddleware queries the database the
+    first time it is used, which async code must not do synchronously.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
+class AsyncRecipeListView(AsyncPageCacheMixin, RecipeListView):
+    async def get(self, request, *args, **kwargs):
+        user = await load_user(request)
+        self.object_list = self.get_queryset()
+        (paginator, page, recipes, is_paginated), facets = (
+            await asyncio.gather(
+                self.apaginate_queryset(self.object_list, self.paginate_by),
+                aget_facets(self.get_filters())
+            )
+        )
+        await amark_favorites(user, recipes)
+        return self.render_to_response({
+            "paginator": paginator,
+            "page_obj": page,
+            "is_paginated": is_paginated,
+            "object_list": recipes,
+            self.get_context_object_name(recipes): recipes,
+            "view": self,
+            "cursor_pagination": self.get_cursor_pagination(),
+            **self.get_filter_context(facets),
+        })
+
+
+class AsyncRecipeDetailView(AsyncPageCacheMixin, RecipeDetailView):
+    async def get(self, request, *args, **kwargs):
+        await load_user(request)
+        self.object, (_, comments_page, _, _), related_recipes = (
+            await asyncio.gather(
+                self.aget_object(),
+                self.acursor_paginate(
+                    self.get_comments(),
+                    self.comments_paginate_by,
+                    cursor_kwarg=self.comments_cursor_kwarg
+                ),
+                self.aget_related_recipes()
+            )
+        )
+        return self.render_to_response(
+            self.get_detail_context(comments_page, related_recipes)
+        )
+
+    async def aget_object(self):
+        try:
+            return await self.get_queryset().aget(pk=self.kwargs["pk"])
+        except Recipe.DoesNotExist:
+            raise Http404("No recipe found matching the query")
+
+    async def aget_related_recipes(self):
+        return [
+            neighbor.related
+            async for neighbor in self.get_related_recipes()
+        ]
+
+
+class AsyncRecipeListAPIView(AsyncPageCacheMixin, RecipeListAPIView):
+    async def get(self, request, *args, **kwargs):
+        try:
+            fields = self.get_fields()
+        except InvalidFields as exc:
+            return self.error(str(exc))
+
+        self.object_list = self.get_queryset()
+        paginator, page, recipes, _ = await self.apaginate_queryset(
+            self.object_list,
+            self.paginate_by
+        )
+        links = {
+            "next": self.page_link(page, forward=True),
+            "previous": self.page_link(page, forward=False),
+        }
+
+        etag = make_etag(
+            fields,
+            [self.version(recipe) for recipe in recipes],
+            links
+        )
+        response = self.not_modified(etag)
+        if response is not None:
+            return response
+
+        data = {"results": await self.aserialize(recipes, fields), **links}
+        if not self.get_cursor_pagination():
+            data["count"] = paginator.count
+        return self.render_json(data, etag=etag)
+
+
+class AsyncRecipeDetailAPIView(AsyncPageCacheMixin, RecipeDetailAPIView):
+    async def get(self, request, *args, **kwargs):
+        try:
+            fields = self.get_fields()
+        except InvalidFields as exc:
+            return self.error(str(exc))
+
+        updated_at = await Recipe.objects.filter(
+            pk=kwargs["pk"]
+        ).values_list("updated_at", flat=True).afirst()
+        if updated_at is None:
+            raise Http404("No recipe found matching the query")
+
+        etag, last_modified = self.detail_validators(
+            kwargs["pk"],
+            fields,
+            updated_at
+        )
+        response = self.not_modified(etag, last_modified)
+        if response is not None:
+            return response
+
+        try:
+            self.object = await self.get_queryset().aget(pk=kwargs["pk"])
+        except Recipe.DoesNotExist:
+            # Deleted since the version was read
+            raise Http404("No recipe found matching the query")
+        data = (await self.aserialize([self.object], fields))[0]
+        return self.render_json(data, etag, last_modified)
+
+
+class AsyncSuggestionAPIView(SuggestionAPIView):
+    async def get(self, request, *args, **kwargs):
+        query = request.GET.get("q", "")
+        try:
+            limit = self.get_limit()
+        except ValueError:
+            return self.error("limit must be a number")
+        return self.render_suggestions(query, *await asuggest(query, limit))
+
+
+ASYNC_VARIANTS = {
+    RecipeListView: AsyncRecipeListView,
+    RecipeDetailView: AsyncRecipeDetailView,
+    RecipeListAPIView: AsyncRecipeListAPIView,
+    RecipeDetailAPIView: AsyncRecipeDetailAPIView,
+    SuggestionAPIView: AsyncSuggestionAPIView,
+}
+
+
+def as_view(view_class, **initkwargs):
+    """The view, or its async variant with COOKBOOK_ASYNC_VIEWS"""
+    if getattr(settings, "COOKBOOK_ASYNC_VIEWS", False):
+        view_class = ASYNC_VARIANTS.get(view_class, view_class)
+    return view_class.as_view(**initkwargs)
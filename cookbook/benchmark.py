@@ -0,0 +1,426 @@
+"""Seeded benchmark data and per-view latency/query measurements.
+
+``seed`` fills the database with a reproducible synthetic site (users,
+categories, tags, recipes, comments and favorites) at any scale. Recipes
+go through ``RecipeImporter``, comments and favorites through bulk
+inserts, so 10k-1M recipes take minutes rather than hours. Seeded users
+are named USERNAME_PREFIX + number and share BENCHMARK_PASSWORD.
+
+``benchmark`` requests every URL of the cookbook and accounts URLconfs
+with the test client, anonymously and logged in as the author of the
+most commented recipe, and records the status, the number of queries
+and the latency distribution of each. Views that only accept POST are
+measured inside a transaction that is rolled back, so runs do not change
+the data. The page cache is off unless asked for, the numbers are about
+rendering. With ``asgi`` the requests go through Django's ASGI request
+path instead of WSGI, reaching the async variants of the read views
+when COOKBOOK_ASYNC_VIEWS is on (see ``cookbook.asyncviews``).
+
+Results are plain JSON; ``compare`` checks them against a stored
+baseline and lists regressions: more queries, a changed status or a
+median latency above the baseline by more than the tolerance.
+"""
+import platform
+import random
+import statistics
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from .favorites import refresh_favorite_counts
+from .models import Category, Comment, Recipe, Tag, User
+from .querybudget import QueryRecorder, get_query_budget
+from .transfer import RecipeImporter
+
+
+USERNAME_PREFIX = "bench"
+BENCHMARK_PASSWORD = "benchmark"
+NAMESPACES = ("cookbook", "accounts")
+# Form data of the views that only accept POST
+POST_DATA = {
+    "cookbook:add-comment": {"content": "Benchmark comment", "rating": 4},
+    "cookbook:toggle-favorite": {"favorite": "1"},
+}
+
+INGREDIENTS = (
+    "flour", "sugar", "butter", "egg", "milk", "salt", "pepper", "onion",
+    "garlic", "tomato", "potato", "carrot", "rice", "chicken", "beef",
+    "pork", "salmon", "cheese", "cream", "lemon", "basil", "parsley",
+    "olive oil", "mushroom", "spinach", "bean", "pasta", "honey", "apple",
+    "cinnamon", "ginger", "chili", "yogurt", "cabbage", "beet", "dill",
+)
+UNITS = ("g", "ml", "tbsp", "tsp", "cup", "")
+ADJECTIVES = (
+    "Quick", "Classic", "Spicy", "Creamy", "Rustic", "Crispy", "Baked",
+    "Grandma's", "Summer", "Winter", "Smoky", "Light",
+)
+DISHES = (
+    "soup", "stew", "salad", "pie", "pancakes", "casserole", "curry",
+    "risotto", "bake", "stir-fry", "dumplings", "roll",
+)
+
+
+def _recipe_record(rng, number, users, categories, tags, now):
+    names = rng.sample(INGREDIENTS, rng.randint(3, 10))
+    lines = [
+        f"{rng.randint(1, 500)} {rng.choice(UNITS)} {name}".replace("  ", " ")
+        for name in names
+    ]
+    created_at = now - timedelta(seconds=rng.randint(0, 2 * 365 * 86400))
+    return {
+        "title": f"{rng.choice(ADJECTIVES)} {names[0]} "
+                 f"{rng.choice(DISHES)} #{number}",
+        "description": f"A {rng.choice(DISHES)} "
+                       f"with {' and '.join(names[:3])}.",
+        "ingredients": "\n".join(lines),
+        "instructions": "\n".join(
+            f"Step {step}: prepare the {name}."
+            for step, name in enumerate(names, 1)
+        ),
+        "cooking_time": rng.randint(5, 240),
+        "servings": rng.randint(1, 8),
+        "author": rng.choice(users),
+        "category": rng.choice(categories),
+        "tags": rng.sample(tags, rng.randint(0, min(4, len(tags)))),
+        "created_at": created_at.isoformat(),
+    }
+
+
+def _skewed_index(rng, size):
+    """Low indexes far more often, like real popularity"""
+    return int(size * rng.random() ** 3)
+
+
+def flush():
+    """Deletes what ``seed`` created"""
+    User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+    Category.objects.filter(name__startswith="Bench ").delete()
+    Tag.objects.filter(slug__startswith=f"{USERNAME_PREFIX}-").delete()
+
+
+def seed(users=1000, recipes=10_000, comments=50_000, favorites=20_000,
+         categories=20, tags=100, random_seed=0, batch_size=1000,
+         progress=None):
+    """Creates a synthetic site, returns the number of rows per kind.
+
+    The same arguments always produce the same data. Without recipes
+    there is nothing to comment on or favorite, so none are created.
+    Comment statistics are maintained by the bulk inserts; sort keys,
+    site stats and related recipes are left to the caller.
+    """
+    if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+        raise ValueError("The database already contains benchmark data")
+    rng = random.Random(random_seed)
+    now = timezone.now()
+
+    def report(kind, done):
+        if progress is not None:
+            progress(kind, done)
+
+    # One hash for everyone, hashing is deliberately slow
+    password = make_password(BENCHMARK_PASSWORD)
+    usernames = [f"{USERNAME_PREFIX}{i}" for i in range(users)]
+    for start in range(0, users, batch_size):
+        User.objects.bulk_create([
+            User(username=name, password=password)
+            for name in usernames[start:start + batch_size]
+        ])
+    user_ids = list(User.objects.filter(
+        username__startswith=USERNAME_PREFIX
+    ).order_by("pk").values_list("pk", flat=True))
+    report("users", len(user_ids))
+
+    category_names = [f"Bench {i}" for i in range(categories)] or [None]
+    tag_slugs = [f"{USERNAME_PREFIX}-{i}" for i in range(tags)]
+    importer = RecipeImporter()
+    importer.run(
+        (
+            (number, _recipe_record(
+                rng, number, usernames, category_names, tag_slugs, now
+            ))
+            for number in range(1, recipes + 1)
+        ),
+        batch_size,
+        lambda counts: report("recipes", counts["created"])
+    )
+    recipe_ids = list(Recipe.objects.filter(
+        author__username__startswith=USERNAME_PREFIX
+    ).order_by("pk").values_list("pk", flat=True))
+    if not recipe_ids:
+        comments = favorites = 0
+
+    created = 0
+    while created < comments:
+        size = min(batch_size, comments - created)
+        batch = [
+            Comment(
+                recipe_id=recipe_ids[_skewed_index(rng, len(recipe_ids))],
+                author_id=rng.choice(user_ids),
+                content=f"Made it {rng.randint(1, 9)} times, "
+                        f"{rng.choice(ADJECTIVES).lower()} result.",
+                rating=rng.choice((None, 1, 2, 3, 4, 4, 5, 5, 5)),
+            )
+            for _ in range(size)
+        ]
+        with transaction.atomic():
+            Comment.objects.bulk_create(batch)
+            # bulk_create stamps auto_now_add fields with the current time
+            for comment in batch:
+                comment.created_at = now - timedelta(
+                    seconds=rng.randint(0, 365 * 86400)
+                )
+            Comment.objects.bulk_update(batch, ["created_at"])
+        created += size
+        report("comments", created)
+
+    Favorite = User.favorite_recipes.through
+    pairs = set()
+    while len(pairs) < min(favorites, len(user_ids) * len(recipe_ids)):
+        pairs.add((
+            rng.choice(user_ids),
+            recipe_ids[_skewed_index(rng, len(recipe_ids))]
+        ))
+    pairs = sorted(pairs)
+    for start in range(0, len(pairs), batch_size):
+        Favorite.objects.bulk_create(
+            [
+                Favorite(user_id=user_id, recipe_id=recipe_id)
+                for user_id, recipe_id in pairs[start:start + batch_size]
+            ],
+            ignore_conflicts=True
+        )
+        report("favorites", min(start + batch_size, len(pairs)))
+    refresh_favorite_counts()
+
+    return {
+        "users": len(user_ids),
+        "recipes": len(recipe_ids),
+        "comments": created,
+        "favorites": len(pairs),
+    }
+
+
+Case = namedtuple("Case", ["name", "url_name", "url", "method", "user"])
+
+
+def _samples():
+    """Objects the parametrized URLs point at, the heaviest of each kind"""
+    recipe = (Recipe.objects
+              .order_by("-comment_count", "pk")
+              .select_related("author")
+              .first())
+    if recipe is None:
+        return None
+    return {
+        Recipe: recipe,
+        User: recipe.author,
+        Category: (Category.objects
+                   .annotate(total=Count("recipes"))
+                   .order_by("-total", "pk")
+                   .first()),
+        Tag: (Tag.objects
+              .annotate(total=Count("recipes"))
+              .order_by("-total", "pk")
+              .first()),
+    }
+
+
+def benchmark_cases(namespaces=NAMESPACES):
+    """A Case per URL, view method and kind of visitor"""
+    samples = _samples()
+    if samples is None:
+        raise ValueError("There are no recipes to benchmark, seed first")
+
+    resolver = get_resolver()
+    cases = []
+    for namespace in namespaces:
+        _, urlconf = resolver.namespace_dict[namespace]
+        for pattern in urlconf.url_patterns:
+            url_name = f"{namespace}:{pattern.name}"
+            view_class = getattr(pattern.callback, "view_class", None)
+            kwargs = {}
+            if "pk" in pattern.pattern.converters:
+                model = getattr(view_class, "model", None) or Recipe
+                sample = samples.get(model)
+                if sample is None:
+                    continue
+                kwargs["pk"] = sample.pk
+            url = reverse(url_name, kwargs=kwargs)
+
+            if view_class is not None and not (
+                hasattr(view_class, "get")
+                and "get" in view_class.http_method_names
+            ):
+                cases.append(Case(
+                    f"POST {url_name}", url_name, url, "post", "user"
+                ))
+                continue
+            visitors = ["user"]
+            if not (view_class and issubclass(view_class, LoginRequiredMixin)):
+                visitors.insert(0, "anonymous")
+            for visitor in visitors:
+                cases.append(Case(
+                    f"GET {url_name} [{visitor}]",
+                    url_name,
+                    url,
+                    "get",
+                    visitor
+                ))
+    return cases, samples[User]
+
+
+def run_case(client, case):
+    """Response of the case's request, POSTs are rolled back"""
+    send = getattr(client, case.method)
+    if isinstance(client, AsyncClient):
+        # The request's sync code runs in this thread, on its connection
+        send = async_to_sync(send)
+    if case.method == "get":
+        return send(case.url)
+    # Measured, then undone
+    with transaction.atomic():
+        response = send(case.url, POST_DATA.get(case.url_name, {}))
+        transaction.set_rollback(True)
+    return response
+
+
+def _summary(timings):
+    timings = sorted(timings)
+    if len(timings) > 1:
+        p95 = statistics.quantiles(timings, n=20, method="inclusive")[18]
+    else:
+        p95 = timings[0]
+    return {
+        "min": round(timings[0], 3),
+        "median": round(statistics.median(timings), 3),
+        "p95": round(p95, 3),
+        "mean": round(statistics.fmean(timings), 3),
+        "max": round(timings[-1], 3),
+    }
+
+
+def measure(case, user, repeat=10, warmup=2, asgi=False):
+    """Status, queries and latency (ms) of one case"""
+    client = AsyncClient() if asgi else Client()
+
+    def prepare():
+        # POSTs may log the client out (logout) or rely on a fresh session
+        if case.user == "user" and (
+            case.method == "post" or "_auth_user_id" not in client.session
+        ):
+            client.force_login(user)
+
+    for _ in range(warmup):
+        prepare()
+        run_case(client, case)
+
+    prepare()
+    # Counted on a separate run, recording slows the queries down
+    with QueryRecorder() as recorder:
+        response = run_case(client, case)
+    request = response.asgi_request if asgi else response.wsgi_request
+    budget = get_query_budget(request)
+
+    timings = []
+    for _ in range(repeat):
+        prepare()
+        started = time.perf_counter()
+        run_case(client, case)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "url": case.url,
+        "method": case.method.upper(),
+        "user": case.user,
+        "status": response.status_code,
+        "queries": recorder.count,
+        "query_budget": budget,
+        "over_budget": budget is not None and recorder.count > budget,
+        "sql_ms": round(sum(q.duration for q in recorder.queries) * 1000, 3),
+        "latency_ms": _summary(timings),
+    }
+
+
+def benchmark(repeat=10, warmup=2, page_cache=False, only=None,
+              asgi=False, progress=None):
+    """Measures every case, returns the result document"""
+    # Budgets are reported rather than enforced
+    with override_settings(
+        COOKBOOK_PAGE_CACHE=page_cache,
+        COOKBOOK_QUERY_BUDGET_MODE=None
+    ):
+        cases, user = benchmark_cases()
+        results = {}
+        for case in cases:
+            if only and only not in case.name:
+                continue
+            results[case.name] = measure(case, user, repeat, warmup, asgi)
+            if progress is not None:
+                progress(case.name, results[case.name])
+
+    return {
+        "meta": {
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "repeat": repeat,
+            "warmup": warmup,
+            "page_cache": page_cache,
+            "asgi": asgi,
+            "async_views": getattr(settings, "COOKBOOK_ASYNC_VIEWS", False),
+            "rows": {
+                "users": User.objects.count(),
+                "recipes": Recipe.objects.count(),
+                "comments": Comment.objects.count(),
+                "favorites": User.favorite_recipes.through.objects.count(),
+            },
+        },
+        "results": results,
+    }
+
+
+Regression = namedtuple(
+    "Regression",
+    ["case", "metric", "baseline", "current"]
+)
+
+
+def compare(baseline, current, tolerance=0.2, min_delta_ms=2.0):
+    """Regressions of ``current`` against ``baseline`` (result documents).
+
+    Query counts and statuses are deterministic and must not change;
+    median latencies may grow by ``tolerance`` (a fraction), and by at
+    least ``min_delta_ms`` to count, so fast views do not flap on noise.
+    Cases missing from either side are ignored.
+    """
+    regressions = []
+    for name, before in baseline["results"].items():
+        after = current["results"].get(name)
+        if after is None:
+            continue
+        if after["status"] != before["status"]:
+            regressions.append(Regression(
+                name, "status", before["status"], after["status"]
+            ))
+        if after["queries"] > before["queries"]:
+            regressions.append(Regression(
+                name, "queries", before["queries"], after["queries"]
+            ))
+        old = before["latency_ms"]["median"]
+        new = after["latency_ms"]["median"]
+        if new > old * (1 + tolerance) and new - old >= min_delta_ms:
+            regressions.append(Regression(name, "median_ms", old, new))
+    return regressions
@@ -0,0 +1,78 @@
+"""Rendered fragment caching for recipe listings.
+
+Card keys embed the recipe version (``updated_at`` plus the stored rating
+counters), so edits and new ratings switch to a fresh key by themselves.
+Data the card borrows from other rows (category name, author username)
+is invalidated explicitly from ``cookbook.signals``, which only reaches
+the other processes when they share the cache (Redis in production).
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.translation import get_language
+
+
+RECIPE_CARD_TEMPLATE = "cookbook/includes/recipe_card.html"
+
+# Hits and misses of the card cache in this process
+card_cache_stats = Counter()
+
+
+def recipe_card_key(pk, updated_at, rating_sum, rating_count):
+    version = int(updated_at.timestamp() * 1_000_000)
+    # Ratings are rendered with localized number formatting
+    return (
+        f"recipe-card:{get_language()}:"
+        f"{pk}:{version}:{rating_sum}:{rating_count}"
+    )
+
+
+def _key_for(recipe):
+    return recipe_card_key(
+        recipe.pk,
+        recipe.updated_at,
+        recipe.rating_sum,
+        recipe.rating_count
+    )
+
+
+def render_recipe_card(recipe):
+    """Rendered recipe card HTML, served from the cache when possible"""
+    key = _key_for(recipe)
+    html = cache.get(key)
+    if html is not None:
+        card_cache_stats["hits"] += 1
+        return html
+
+    card_cache_stats["misses"] += 1
+    html = render_to_string(RECIPE_CARD_TEMPLATE, {"recipe": recipe})
+    cache.set(
+        key,
+        html,
+        getattr(settings, "COOKBOOK_CARD_CACHE_TIMEOUT", 60 * 60 * 24)
+    )
+    return html
+
+
+def invalidate_recipe_cards(recipes, batch_size=500):
+    """Drops the cached cards of every recipe in the given queryset"""
+    versions = recipes.order_by().values_list(
+        "pk",
+        "updated_at",
+        "rating_sum",
+        "rating_count"
+    )
+    keys = []
+    for row in versions.iterator(chunk_size=batch_size):
+        keys.append(recipe_card_key(*row))
+        if len(keys) >= batch_size:
+            cache.delete_many(keys)
+            keys = []
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_recipe_card(recipe):
+    cache.delete(_key_for(recipe))
@@ -0,0 +1,105 @@
+"""EXPLAIN plans of the queries behind each page.
+
+``explain_cases`` requests the pages of ``cookbook.benchmark`` once each,
+records their SELECT statements with the parameters they ran with and
+asks the database how it executes them. Every plan is summarized as the
+tables it reads in full ("scans"), whether it reads through an index and
+whether it needs a separate sort step, which is what decides if a query
+stays fast as the tables grow.
+
+SQLite (EXPLAIN QUERY PLAN) and PostgreSQL (EXPLAIN) plans are
+understood; other databases raise ``UnsupportedDatabase``.
+"""
+import re
+from collections import namedtuple
+
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from .benchmark import benchmark_cases, run_case
+from .querybudget import QueryRecorder
+
+
+class UnsupportedDatabase(Exception):
+    pass
+
+
+Plan = namedtuple(
+    "Plan",
+    ["sql", "location", "lines", "scans", "uses_index", "sorts"]
+)
+
+# SQLite: "SCAN cookbook_recipe", but not "SCAN t USING [COVERING] INDEX"
+_SQLITE_SCAN = re.compile(r"^SCAN (\S+)(?! USING)(?:$| )")
+_SQLITE_INDEX = re.compile(r"USING (?:COVERING |INTEGER PRIMARY KEY|INDEX)")
+_SQLITE_SORT = re.compile(
+    r"USE TEMP B-TREE FOR (?:ORDER BY|GROUP BY|DISTINCT)"
+)
+_POSTGRES_SCAN = re.compile(r"Seq Scan on (\S+)")
+_POSTGRES_INDEX = re.compile(r"Index (?:Only )?Scan|Bitmap Index Scan")
+_POSTGRES_SORT = re.compile(r"(?:^|-> +)(?:Incremental )?Sort\b")
+
+
+def explain(sql, params=(), using="default"):
+    """Plan of one statement on the given database"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            lines = [row[-1] for row in cursor.fetchall()]
+            scans = {
+                match.group(1) for match in map(_SQLITE_SCAN.match, lines)
+                if match
+            }
+            uses_index = any(map(_SQLITE_INDEX.search, lines))
+            sorts = any(map(_SQLITE_SORT.search, lines))
+        elif connection.vendor == "postgresql":
+            cursor.execute(f"EXPLAIN {sql}", params)
+            lines = [row[0] for row in cursor.fetchall()]
+            scans = {
+                match.group(1) for match in map(_POSTGRES_SCAN.search, lines)
+                if match
+            }
+            uses_index = any(map(_POSTGRES_INDEX.search, lines))
+            sorts = any(
+                _POSTGRES_SORT.search(line.strip()) for line in lines
+            )
+        else:
+            raise UnsupportedDatabase(
+                f"Cannot read {connection.vendor} query plans"
+            )
+    return lines, sorted(scans), uses_index, sorts
+
+
+def explain_cases(only=None, page_cache=False):
+    """[(case name, [Plan, ...]), ...], each statement shape once per case"""
+    with override_settings(
+        COOKBOOK_PAGE_CACHE=page_cache,
+        COOKBOOK_QUERY_BUDGET_MODE=None
+    ):
+        cases, user = benchmark_cases()
+        reports = []
+        for case in cases:
+            if only and only not in case.name:
+                continue
+            client = Client()
+            if case.user == "user":
+                client.force_login(user)
+            with QueryRecorder() as recorder:
+                run_case(client, case)
+
+            plans, seen = [], set()
+            for query in recorder.queries:
+                if not query.sql.lstrip().upper().startswith("SELECT"):
+                    continue
+                if query.shape in seen:
+                    continue
+                seen.add(query.shape)
+                plans.append(Plan(
+                    query.sql,
+                    query.location,
+                    *explain(query.sql, query.params)
+                ))
+            reports.append((case.name, plans))
+    return reports
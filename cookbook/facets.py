@@ -0,0 +1,233 @@
+"""Faceted filtering of the recipe listing.
+
+``RecipeFilters`` reads the listing's filters from the query string: the
+search ``query``, the comma separated ``ingredients`` to cook with, any
+number of ``category`` and ``tag`` ids and the ``time_min``/``time_max``
+(minutes) and ``servings_min``/``servings_max`` ranges. Several
+categories match any of them; several tags match recipes with all of
+them, or any of them with ``tag_mode=any``. Values that are not
+non-negative numbers are ignored, as if they had not been given.
+
+``get_facets`` lists the categories and tags with the number of recipes
+each choice leads to. Selecting another category widens the listing, so
+category counts ignore the category filter; with ``tag_mode=any`` the
+same holds for tags, while with all tags required a tag's count is what
+the listing shrinks to once it is added. Both facets are counted in one
+grouped query (a UNION of the two GROUP BYs) and cached per filter
+combination. The keys embed the page cache versions of the "recipes",
+"categories" and "tags" tags (see ``cookbook.pagecache``), so the purges
+that make listing pages stale make their counts stale too, in every
+process as long as they share the cache. They are counted on the primary
+database, a lagging replica could store counts of before the purge.
+"""
+import asyncio
+import hashlib
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Value
+
+from .ingredients import cook_with
+from .models import Category, Recipe, Tag
+from .pagecache import tag_versions
+from .replicas import primary_reads
+from .search import get_search_backend
+
+
+TAG_MODES = ("all", "any")
+RANGES = {
+    "time_min": "cooking_time__gte",
+    "time_max": "cooking_time__lte",
+    "servings_min": "servings__gte",
+    "servings_max": "servings__lte",
+}
+FACET_TAGS = ("recipes", "categories", "tags")
+
+Facet = namedtuple("Facet", ["pk", "name", "count", "selected"])
+
+RecipeTag = Recipe.tags.through
+
+
+def _timeout():
+    return getattr(settings, "COOKBOOK_FACET_CACHE_TIMEOUT", 10 * 60)
+
+
+def _ids(values):
+    return tuple(sorted({int(value) for value in values if value.isdigit()}))
+
+
+def _number(value):
+    return int(value) if value and value.isdigit() else None
+
+
+class RecipeFilters:
+    """The filters of one listing request, normalized"""
+
+    def __init__(self, data):
+        self.query = data.get("query", "").strip()
+        self.ingredients = [
+            name.strip() for name in data.get("ingredients", "").split(",")
+            if name.strip()
+        ]
+        self.categories = _ids(data.getlist("category"))
+        self.tags = _ids(data.getlist("tag"))
+        mode = data.get("tag_mode")
+        self.tag_mode = mode if mode in TAG_MODES else TAG_MODES[0]
+        self.ranges = {
+            name: number for name, number in (
+                (name, _number(data.get(name))) for name in RANGES
+            ) if number is not None
+        }
+
+    def __bool__(self):
+        return bool(
+            self.query or self.ingredients or self.categories
+            or self.tags or self.ranges
+        )
+
+    def key(self):
+        """Canonical form; equal filters give equal keys"""
+        return json.dumps([
+            self.query,
+            sorted(self.ingredients),
+            self.categories,
+            self.tags,
+            self.tag_mode if self.tags else None,
+            sorted(self.ranges.items()),
+        ])
+
+    def filter(self, queryset, rank=False, skip=None):
+        """The queryset narrowed by every filter but the ``skip`` facet"""
+        if self.query:
+            queryset = get_search_backend().search(
+                queryset,
+                self.query,
+                rank=rank
+            )
+        if self.categories and skip != "category":
+            queryset = queryset.filter(category_id__in=self.categories)
+        if self.tags and skip != "tag":
+            # EXISTS per tag: no join to deduplicate, and the listing's
+            # own tags prefetch and facet GROUP BY stay independent of it
+            tagged = RecipeTag.objects.filter(recipe_id=OuterRef("pk"))
+            if self.tag_mode == "any":
+                queryset = queryset.filter(
+                    Exists(tagged.filter(tag_id__in=self.tags))
+                )
+            else:
+                for tag_id in self.tags:
+                    queryset = queryset.filter(
+                        Exists(tagged.filter(tag_id=tag_id))
+                    )
+        queryset = queryset.filter(**{
+            RANGES[name]: number for name, number in self.ranges.items()
+        })
+        # "What can I cook with X, Y, Z", ordered by ingredient coverage
+        if self.ingredients:
+            queryset = cook_with(self.ingredients, queryset)
+        return queryset
+
+
+def _counts_query(filters):
+    """UNION of both facets' GROUP BYs, None if nothing can match"""
+    recipes = Recipe.objects.all()
+    categories = filters.filter(recipes, skip="category")
+    tags = filters.filter(
+        recipes,
+        skip="tag" if filters.tag_mode == "any" else None
+    )
+    if categories.query.is_empty():
+        # Ingredient names that cannot match anything
+        return None
+    category_counts, tag_counts = (
+        queryset.order_by()
+        .values_list(Value(facet), field)
+        .annotate(count=Count("pk"))
+        for facet, field, queryset in (
+            ("category", "category_id", categories),
+            ("tag", "tags", tags),
+        )
+    )
+    return category_counts.union(tag_counts, all=True)
+
+
+def _counts(rows):
+    counts = {"category": {}, "tag": {}}
+    for facet, pk, count in rows:
+        if pk is not None:
+            counts[facet][pk] = count
+    return counts
+
+
+def facet_counts(filters):
+    """{"category": {id: count}, "tag": {id: count}} in one query"""
+    query = _counts_query(filters)
+    return _counts(() if query is None else query)
+
+
+async def afacet_counts(filters):
+    query = _counts_query(filters)
+    return _counts(() if query is None else [row async for row in query])
+
+
+def _facet_key(filters):
+    versions = tag_versions(FACET_TAGS)
+    digest = hashlib.md5(json.dumps([
+        filters.key(),
+        [versions[tag] for tag in FACET_TAGS],
+    ]).encode()).hexdigest()
+    return f"recipe-facets:{digest}"
+
+
+def _facets(filters, counts, categories, tags):
+    return {
+        "categories": [
+            Facet(pk, name, counts["category"].get(pk, 0),
+                  pk in filters.categories)
+            for pk, name in categories
+        ],
+        "tags": [
+            Facet(pk, name, counts["tag"].get(pk, 0), pk in filters.tags)
+            for pk, name in tags
+        ],
+    }
+
+
+def get_facets(filters):
+    """{"categories": [Facet, ...], "tags": [Facet, ...]}, cached"""
+    key = _facet_key(filters)
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    with primary_reads():
+        facets = _facets(
+            filters,
+            facet_counts(filters),
+            Category.objects.values_list("pk", "name"),
+            Tag.objects.values_list("pk", "name")
+        )
+    cache.set(key, facets, _timeout())
+    return facets
+
+
+async def aget_facets(filters):
+    """``get_facets`` for async views, its three queries gathered"""
+    key = _facet_key(filters)
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    async def names(model):
+        return [row async for row in model.objects.values_list("pk", "name")]
+
+    with primary_reads():
+        facets = _facets(filters, *await asyncio.gather(
+            afacet_counts(filters),
+            names(Category),
+            names(Tag)
+        ))
+    cache.set(key, facets, _timeout())
+    return facets
@@ -0,0 +1,159 @@
+"""Favorite recipes.
+
+``set_favorite`` and ``toggle_favorite`` change the membership with a
+single INSERT ... SELECT ... WHERE NOT EXISTS or DELETE, whose row count
+says whether anything changed, and shift the denormalized
+Recipe.favorite_count by the same amount. They write the M2M table
+directly, so they keep the count and purge the page cache themselves;
+changes made through ``user.favorite_recipes`` (the admin, fixtures) and
+deleted users, whose favorites go with them, are recounted by
+``cookbook.signals``. Favorites feed the related recipes only through
+``rebuild_related``, a toggle is too frequent and too small a change to
+recompute neighbours for.
+
+``mark_favorites`` flags the viewer's favorites on any number of recipe
+lists with one query (``amark_favorites`` in async views),
+``favorites_feed`` lists a user's favorites, most recently added first,
+for cursor pagination.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Recipe, User
+from .pagecache import purge_tags
+
+
+Favorite = User.favorite_recipes.through
+
+
+def _insert(user_id, recipe_id):
+    quote = connection.ops.quote_name
+    table = quote(Favorite._meta.db_table)
+    recipes = quote(Recipe._meta.db_table)
+    sql = (
+        f"INSERT INTO {table} ({quote('user_id')}, {quote('recipe_id')}) "
+        f"SELECT %s, {quote('id')} FROM {recipes} WHERE {quote('id')} = %s "
+        f"AND NOT EXISTS (SELECT 1 FROM {table} "
+        f"WHERE {quote('user_id')} = %s AND {quote('recipe_id')} = %s)"
+    )
+    try:
+        # Savepoint, a concurrent insert of the same pair is not an error
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [user_id, recipe_id, user_id, recipe_id])
+            return cursor.rowcount
+    except IntegrityError:
+        return 0
+
+
+def _delete(user_id, recipe_id):
+    deleted, _ = Favorite.objects.filter(
+        user_id=user_id,
+        recipe_id=recipe_id
+    ).delete()
+    return deleted
+
+
+def _changed(recipe_id, delta):
+    # favorite_count is part of the recipe's representation, like the
+    # comment counters
+    Recipe.objects.filter(pk=recipe_id).update(
+        favorite_count=F("favorite_count") + delta,
+        updated_at=timezone.now()
+    )
+    purge_tags(f"recipe:{recipe_id}")
+
+
+@transaction.atomic
+def set_favorite(user, recipe_id, favorite=True):
+    """Makes a recipe a favorite of the user or not; True if it changed.
+
+    Nothing changes for recipes that do not exist.
+    """
+    if favorite:
+        changed = _insert(user.pk, recipe_id)
+    else:
+        changed = _delete(user.pk, recipe_id)
+    if changed:
+        _changed(recipe_id, 1 if favorite else -1)
+    return bool(changed)
+
+
+@transaction.atomic
+def toggle_favorite(user, recipe_id):
+    """Flips the favorite state, returns the new one (None: no recipe)"""
+    if _delete(user.pk, recipe_id):
+        _changed(recipe_id, -1)
+        return False
+    if _insert(user.pk, recipe_id):
+        _changed(recipe_id, 1)
+        return True
+    return None
+
+
+def refresh_favorite_counts(recipe_ids=None):
+    """Recounts favorite_count of the given (or all) recipes"""
+    counts = (Favorite.objects
+              .filter(recipe_id=OuterRef("pk"))
+              .order_by()
+              .values("recipe_id")
+              .annotate(total=Count("pk"))
+              .values("total")
+              )
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    recipes.update(
+        favorite_count=Coalesce(Subquery(counts), 0),
+        updated_at=timezone.now()
+    )
+
+
+def _favorited(user, recipe_ids):
+    recipe_ids = set(recipe_ids)
+    if not user.is_authenticated or not recipe_ids:
+        return None
+    return Favorite.objects.filter(
+        user_id=user.pk,
+        recipe_id__in=recipe_ids
+    ).values_list("recipe_id", flat=True)
+
+
+def favorited_ids(user, recipe_ids):
+    """Which of the recipe ids the user has favorited"""
+    queryset = _favorited(user, recipe_ids)
+    return set() if queryset is None else set(queryset)
+
+
+async def afavorited_ids(user, recipe_ids):
+    queryset = _favorited(user, recipe_ids)
+    return set() if queryset is None else {pk async for pk in queryset}
+
+
+def mark_favorites(user, *recipe_lists):
+    """Sets ``is_favorite`` on every recipe of the lists"""
+    recipes = [recipe for recipes in recipe_lists for recipe in recipes]
+    favorites = favorited_ids(user, (recipe.pk for recipe in recipes))
+    for recipe in recipes:
+        recipe.is_favorite = recipe.pk in favorites
+
+
+async def amark_favorites(user, *recipe_lists):
+    recipes = [recipe for recipes in recipe_lists for recipe in recipes]
+    favorites = await afavorited_ids(user, (recipe.pk for recipe in recipes))
+    for recipe in recipes:
+        recipe.is_favorite = recipe.pk in favorites
+
+
+def favorites_feed(user):
+    """M2M rows of the user's favorites with their recipes, newest first.
+
+    The rows' primary keys follow the order favorites were added in, so
+    they make a cursor pagination key.
+    """
+    return (Favorite.objects
+            .filter(user_id=user.pk)
+            .select_related("recipe__author", "recipe__category")
+            .order_by("-pk")
+            )
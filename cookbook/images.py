@@ -0,0 +1,105 @@
+"""Cloudinary image housekeeping.
+
+Image deletions are written to the ImageDeletion outbox inside the
+transaction that drops the image, so they only become visible once it
+commits and are never lost. ``process_image_deletions`` drains the
+outbox in batches through the bulk delete API, retrying failures with
+exponential backoff.
+"""
+from datetime import timedelta
+
+import cloudinary.api
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ImageDeletion
+
+
+# Cloudinary accepts at most 100 public ids per delete_resources call
+MAX_BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+# How long a claimed batch stays hidden from other workers
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def public_id_of(image):
+    """Public id of a CloudinaryResource (or a raw stored value)"""
+    return getattr(image, "public_id", None) or str(image)
+
+
+def queue_image_deletion(*images):
+    """Schedules images for deletion once the current transaction commits"""
+    ImageDeletion.objects.bulk_create([
+        ImageDeletion(public_id=public_id_of(image))
+        for image in images if image
+    ])
+
+
+def cloudinary_delete(public_ids):
+    """Default deleter: {public_id: status} from the bulk delete API"""
+    return cloudinary.api.delete_resources(public_ids)["deleted"]
+
+
+def get_image_deleter():
+    path = getattr(settings, "COOKBOOK_IMAGE_DELETER", None)
+    return import_string(path) if path else cloudinary_delete
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(30 * 2 ** attempts, 60 * 60 * 6))
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            ImageDeletion.objects
+            .select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=now, attempts__lt=MAX_ATTEMPTS)
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        ImageDeletion.objects.filter(
+            pk__in=[item.pk for item in batch]
+        ).update(next_attempt_at=now + CLAIM_TIMEOUT)
+    return batch
+
+
+def process_image_deletions(batch_size=MAX_BATCH_SIZE, deleter=None):
+    """Deletes one batch of queued images.
+
+    Returns a (deleted, failed) tuple; ``(0, 0)`` means nothing was due.
+    """
+    batch = _claim_batch(min(batch_size, MAX_BATCH_SIZE))
+    if not batch:
+        return 0, 0
+
+    deleter = deleter or get_image_deleter()
+    public_ids = sorted({item.public_id for item in batch})
+    try:
+        results = deleter(public_ids)
+        error = ""
+    except Exception as exc:
+        results = {}
+        error = f"{type(exc).__name__}: {exc}"
+
+    done = [
+        item.pk for item in batch
+        if results.get(item.public_id) in ("deleted", "not_found")
+    ]
+    failed = [item for item in batch if item.pk not in done]
+
+    ImageDeletion.objects.filter(pk__in=done).delete()
+    now = timezone.now()
+    for item in failed:
+        item.attempts += 1
+        item.next_attempt_at = now + _backoff(item.attempts)
+        item.last_error = error or (
+            f"Unexpected status: {results.get(item.public_id)}"
+        )
+    ImageDeletion.objects.bulk_update(
+        failed,
+        ["attempts", "next_attempt_at", "last_error"]
+    )
+    return len(done), len(failed)
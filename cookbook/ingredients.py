@@ -0,0 +1,219 @@
+"""Structured ingredients parsed from the free-form Recipe.ingredients.
+
+Each line ("1 1/2 cups of chopped tomatoes") becomes a RecipeIngredient
+row with a quantity, a canonical unit and a normalized name ("tomato").
+The rows are rewritten whenever a recipe's ingredient text is saved and
+can be backfilled with ``backfill_ingredients``; ``cook_with`` matches
+them through the (name, recipe) index instead of scanning the text.
+"""
+import re
+import unicodedata
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Count, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast
+
+from .models import Recipe, RecipeIngredient
+
+
+ParsedIngredient = namedtuple(
+    "ParsedIngredient",
+    ["quantity", "unit", "name", "raw"]
+)
+
+UNITS = {
+    "g": ("g", "gr", "gram", "grams", "gramm"),
+    "kg": ("kg", "kilo", "kilos", "kilogram", "kilograms"),
+    "mg": ("mg",),
+    "ml": ("ml", "milliliter", "milliliters", "millilitre", "millilitres"),
+    "l": ("l", "liter", "liters", "litre", "litres"),
+    "tsp": ("tsp", "teaspoon", "teaspoons"),
+    "tbsp": ("tbsp", "tablespoon", "tablespoons", "tbs"),
+    "cup": ("cup", "cups"),
+    "oz": ("oz", "ounce", "ounces"),
+    "lb": ("lb", "lbs", "pound", "pounds"),
+    "pinch": ("pinch", "pinches"),
+    "clove": ("clove", "cloves"),
+    "slice": ("slice", "slices"),
+    "can": ("can", "cans"),
+    "bunch": ("bunch", "bunches"),
+    "pcs": ("pc", "pcs", "piece", "pieces"),
+}
+_UNIT_ALIASES = {
+    alias: unit for unit, aliases in UNITS.items() for alias in aliases
+}
+
+# Words describing the preparation rather than the ingredient itself
+_DESCRIPTORS = {
+    "a", "an", "of", "the", "fresh", "large", "small", "medium", "big",
+    "chopped", "sliced", "diced", "minced", "grated", "ground", "peeled",
+    "finely", "roughly", "thinly", "whole", "ripe", "about",
+}
+_NOTES = re.compile(r"\([^)]*\)|,.*$|\bto taste\b|\boptional\b")
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)](?=\s))\s*")
+_NUMBER = r"\d+(?:[.,]\d+)?"
+_QUANTITY = re.compile(
+    rf"^(?P<quantity>{_NUMBER}\s+\d+/\d+|\d+/\d+|{_NUMBER})"
+    rf"(?:\s*(?:-|to)\s*{_NUMBER})?\s*"
+)
+
+
+_QUANTITY_FIELD = RecipeIngredient._meta.get_field("quantity")
+_QUANTITY_STEP = Decimal(1).scaleb(-_QUANTITY_FIELD.decimal_places)
+# Quantities the column cannot hold are stored as NULL, the raw line
+# keeps them
+_MAX_QUANTITY = Decimal(10) ** (
+    _QUANTITY_FIELD.max_digits - _QUANTITY_FIELD.decimal_places
+)
+
+
+def _parse_quantity(text):
+    text = text.replace(",", ".")
+    try:
+        if "/" not in text:
+            value = Decimal(text)
+        else:
+            whole, _, fraction = text.rpartition(" ")
+            numerator, denominator = fraction.split("/")
+            value = Decimal(numerator) / Decimal(denominator)
+            if whole:
+                value += Decimal(whole)
+        value = value.quantize(_QUANTITY_STEP)
+    except (InvalidOperation, ZeroDivisionError):
+        return None
+    return value if value < _MAX_QUANTITY else None
+
+
+_IRREGULAR_PLURALS = {"leaves": "leaf", "halves": "half", "loaves": "loaf"}
+
+
+def _singular(word):
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def normalize_name(text):
+    """Canonical ingredient name: lowercase, singular, no descriptors"""
+    text = _NOTES.sub("", text.lower())
+    words = [
+        _singular(word) for word in re.findall(r"[^\W\d_]+", text)
+        if word not in _DESCRIPTORS
+    ]
+    return " ".join(words)[:100]
+
+
+def parse_ingredient(line):
+    """ParsedIngredient of a single line, None for blank lines"""
+    raw = " ".join(line.split())
+    text = _BULLET.sub("", unicodedata.normalize("NFKC", raw))
+    # NFKC turns "½" into "1⁄2"
+    text = text.replace("⁄", "/")
+    if not text:
+        return None
+
+    quantity = None
+    match = _QUANTITY.match(text)
+    if match:
+        quantity = _parse_quantity(match.group("quantity"))
+        text = text[match.end():]
+
+    unit = ""
+    first, _, rest = text.partition(" ")
+    alias = first.lower().rstrip(".")
+    # Also catches "200g butter", the quantity match ends before the "g"
+    if alias in _UNIT_ALIASES and (rest or quantity is not None):
+        unit = _UNIT_ALIASES[alias]
+        text = rest
+
+    name = normalize_name(text)
+    if not name:
+        return None
+    return ParsedIngredient(quantity, unit, name, raw[:255])
+
+
+def split_lines(text):
+    """Ingredient lines; single-line lists may be comma separated"""
+    lines = [line for line in (text or "").splitlines() if line.strip()]
+    if len(lines) == 1 and "," in lines[0] and "(" not in lines[0]:
+        return lines[0].split(",")
+    return lines
+
+
+def parse_ingredients(text):
+    return [
+        parsed for parsed in map(parse_ingredient, split_lines(text))
+        if parsed is not None
+    ]
+
+
+def ingredient_rows(recipe_id, text):
+    return [
+        RecipeIngredient(
+            recipe_id=recipe_id,
+            position=position,
+            quantity=parsed.quantity,
+            unit=parsed.unit,
+            name=parsed.name,
+            raw=parsed.raw
+        )
+        for position, parsed in enumerate(parse_ingredients(text))
+    ]
+
+
+def sync_ingredients(recipes):
+    """Rewrites the RecipeIngredient rows of (pk, ingredients) pairs"""
+    recipes = list(recipes)
+    rows = []
+    for recipe_id, text in recipes:
+        rows.extend(ingredient_rows(recipe_id, text))
+    with transaction.atomic():
+        RecipeIngredient.objects.filter(
+            recipe_id__in=[recipe_id for recipe_id, _ in recipes]
+        ).delete()
+        RecipeIngredient.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def cook_with(names, queryset=None):
+    """Recipes using any of the given ingredients, best coverage first.
+
+    ``matched`` is how many of the wanted ingredients a recipe uses and
+    ``coverage`` the share of the recipe's ingredients that they make up.
+    """
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    names = {normalize_name(name) for name in names} - {""}
+    if not names:
+        return queryset.none()
+
+    items = RecipeIngredient.objects.filter(recipe=OuterRef("pk"))
+    matched = (items.filter(name__in=names)
+               .values("recipe")
+               .annotate(count=Count("name", distinct=True))
+               .values("count")
+               )
+    total = (items.values("recipe")
+             .annotate(count=Count("pk"))
+             .values("count")
+             )
+    return (queryset
+            .filter(pk__in=RecipeIngredient.objects.filter(
+                name__in=names
+            ).values("recipe_id"))
+            .annotate(matched=Subquery(matched))
+            .annotate(
+                coverage=Cast("matched", FloatField()) / Subquery(total)
+            )
+            .order_by("-matched", "-coverage", "-created_at")
+            )
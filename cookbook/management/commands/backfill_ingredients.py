@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from cookbook.ingredients import sync_ingredients
+from cookbook.models import Recipe
+
+
+class Command(BaseCommand):
+    """Parse the ingredient text of existing recipes into rows"""
+    help = (
+        "Rebuilds RecipeIngredient rows from Recipe.ingredients, "
+        "streaming the recipes in primary key batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of recipes parsed per transaction"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        recipes = (Recipe.objects
+                   .order_by("pk")
+                   .values_list("pk", "ingredients")
+                   )
+
+        parsed = rows = 0
+        last_pk = 0
+        while True:
+            batch = list(recipes.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            rows += sync_ingredients(batch)
+            parsed += len(batch)
+            last_pk = batch[-1][0]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Parsed {rows} ingredients of {parsed} recipes."
+        ))
@@ -0,0 +1,132 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cookbook.benchmark import benchmark, compare
+
+
+class Command(BaseCommand):
+    """Measure latency and query counts of every page"""
+    help = (
+        "Requests every cookbook and accounts URL, anonymously and logged "
+        "in, and reports status, queries and latency. --output saves the "
+        "results as JSON, --baseline compares them with saved results "
+        "and fails on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help="Timed requests per case"
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=2,
+            help="Untimed requests per case before measuring"
+        )
+        parser.add_argument(
+            "--only",
+            help="Only run the cases whose name contains this text"
+        )
+        parser.add_argument(
+            "--page-cache",
+            action="store_true",
+            help="Measure with the anonymous page cache enabled"
+        )
+        parser.add_argument(
+            "--asgi",
+            action="store_true",
+            help="Send the requests through the ASGI handler"
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write the results to, '-' for stdout"
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Results file to compare against"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed median latency growth, as a fraction"
+        )
+        parser.add_argument(
+            "--min-delta",
+            type=float,
+            default=2.0,
+            help="Latency growth in ms below which nothing is flagged"
+        )
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"], encoding="utf-8") as stream:
+                    baseline = json.load(stream)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read the baseline: {exc}")
+
+        # The table goes to stderr when stdout carries the JSON
+        report = self.stderr if options["output"] == "-" else self.stdout
+
+        def progress(name, result):
+            latency = result["latency_ms"]
+            budget = result["query_budget"]
+            if budget is None:
+                budget = "-"
+            flag = " OVER BUDGET" if result["over_budget"] else ""
+            report.write(
+                f"{name:<48} {result['status']:>3} "
+                f"{result['queries']:>3}/{budget:<3}"
+                f" median {latency['median']:>8.2f} ms"
+                f"  p95 {latency['p95']:>8.2f} ms{flag}"
+            )
+
+        try:
+            results = benchmark(
+                repeat=options["repeat"],
+                warmup=options["warmup"],
+                page_cache=options["page_cache"],
+                only=options["only"],
+                asgi=options["asgi"],
+                progress=progress
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options["output"] == "-":
+            json.dump(results, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        elif options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                json.dump(results, stream, indent=2)
+
+        if baseline is None:
+            return
+        regressions = compare(
+            baseline,
+            results,
+            options["tolerance"],
+            options["min_delta"]
+        )
+        for regression in regressions:
+            report.write(self.style.ERROR(
+                f"{regression.case}: {regression.metric} "
+                f"{regression.baseline} -> {regression.current}"
+            ))
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} regressions against the baseline."
+            )
+        report.write(
+            self.style.SUCCESS("No regressions against the baseline.")
+        )
@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cookbook.explain import UnsupportedDatabase, explain_cases
+
+
+class Command(BaseCommand):
+    """Report how the database executes the queries of every page"""
+    help = (
+        "Requests every cookbook and accounts URL once and runs EXPLAIN "
+        "on each of its SELECT statements, reporting full table scans, "
+        "index use and separate sort steps. Meant for a database with "
+        "realistic data (see seed_benchmark_data); use -v 2 for the "
+        "plans themselves."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            help="Only explain the cases whose name contains this text"
+        )
+        parser.add_argument(
+            "--problems",
+            action="store_true",
+            help="Only list queries that scan a table or sort"
+        )
+        parser.add_argument(
+            "--fail-on-scan",
+            default="",
+            metavar="TABLES",
+            help="Comma separated tables whose full scan is an error"
+        )
+
+    def handle(self, *args, **options):
+        forbidden = {
+            table.strip() for table in options["fail_on_scan"].split(",")
+            if table.strip()
+        }
+        try:
+            reports = explain_cases(only=options["only"])
+        except (UnsupportedDatabase, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        total = indexed = scanning = sorting = 0
+        failures = []
+        for name, plans in reports:
+            lines = []
+            for plan in plans:
+                total += 1
+                indexed += plan.uses_index and not plan.scans
+                scanning += bool(plan.scans)
+                sorting += plan.sorts
+                if forbidden & set(plan.scans):
+                    failures.append((name, plan))
+                if options["problems"] and not (plan.scans or plan.sorts):
+                    continue
+
+                if plan.scans:
+                    verdict = self.style.WARNING(
+                        f"SCAN {', '.join(plan.scans)}"
+                    )
+                elif plan.uses_index:
+                    verdict = "index"
+                else:
+                    verdict = "-"
+                if plan.sorts:
+                    verdict += self.style.WARNING(" +sort")
+                lines.append(f"  {verdict}  {plan.location}")
+                lines.append(f"      {plan.sql[:150]}")
+                if options["verbosity"] > 1:
+                    lines.extend(f"      | {line}" for line in plan.lines)
+            if lines:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write("\n".join(lines))
+
+        self.stdout.write(
+            f"{total} queries: {indexed} through indexes, {scanning} with a "
+            f"full table scan, {sorting} with a sort step."
+        )
+        if failures:
+            for name, plan in failures:
+                self.stderr.write(
+                    f"{name}: scans {', '.join(plan.scans)} "
+                    f"({plan.location})"
+                )
+            raise CommandError(
+                f"{len(failures)} queries scan "
+                f"{', '.join(sorted(forbidden))}."
+            )
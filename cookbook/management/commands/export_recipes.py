@@ -0,0 +1,57 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cookbook.transfer import FORMATS, export_records, format_for_path
+
+
+class Command(BaseCommand):
+    """Bulk export recipes to JSON Lines or CSV"""
+    help = (
+        "Streams every recipe into a JSON Lines or CSV file ('-' for "
+        "stdout) that import_recipes can read back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to write, '-' for stdout")
+        parser.add_argument(
+            "--format",
+            choices=sorted(FORMATS),
+            help="File format, guessed from the extension by default"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of recipes read per query"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or format_for_path(path)
+        if file_format is None:
+            raise CommandError("Cannot guess the file format, use --format.")
+        write = FORMATS[file_format][1]
+
+        exported = 0
+
+        def count(records):
+            nonlocal exported
+            for exported, record in enumerate(records, 1):
+                yield record
+
+        started = time.monotonic()
+        records = count(export_records(batch_size=options["batch_size"]))
+        if path == "-":
+            write(records, sys.stdout)
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as stream:
+                write(records, stream)
+        elapsed = time.monotonic() - started
+
+        # stdout may be the export itself
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {exported} recipes in {elapsed:.1f}s "
+            f"({exported / max(elapsed, 1e-6):.0f} rows/s)."
+        ))
@@ -0,0 +1,99 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cookbook.recommendations import rebuild_related
+from cookbook.stats import refresh_site_stats
+from cookbook.transfer import (
+    FORMATS,
+    RecipeImporter,
+    RecipeImportError,
+    format_for_path
+)
+
+
+class Command(BaseCommand):
+    """Bulk import recipes from JSON Lines or CSV"""
+    help = (
+        "Streams recipes from a JSON Lines or CSV file ('-' for stdin) "
+        "into the database in batches. Records with the id of an "
+        "existing recipe update it."
+    )
+    # Skipped records printed before only counting them
+    max_reported_errors = 20
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to read, '-' for stdin")
+        parser.add_argument(
+            "--format",
+            choices=sorted(FORMATS),
+            help="File format, guessed from the extension by default"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of records written per transaction"
+        )
+        parser.add_argument(
+            "--create-authors",
+            action="store_true",
+            help="Create missing authors instead of skipping their recipes"
+        )
+        parser.add_argument(
+            "--skip-related",
+            action="store_true",
+            help="Do not rebuild the related recipes afterwards"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or format_for_path(path)
+        if file_format is None:
+            raise CommandError("Cannot guess the file format, use --format.")
+        read = FORMATS[file_format][0]
+
+        try:
+            importer = RecipeImporter(options["create_authors"])
+        except RecipeImportError as exc:
+            raise CommandError(str(exc))
+
+        started = time.monotonic()
+
+        def progress(counts):
+            if options["verbosity"] > 1:
+                rows = sum(counts.values())
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{rows} rows, {rows / max(elapsed, 1e-6):.0f} rows/s"
+                )
+
+        if path == "-":
+            counts = importer.run(
+                read(sys.stdin), options["batch_size"], progress
+            )
+        else:
+            with open(path, newline="", encoding="utf-8") as stream:
+                counts = importer.run(
+                    read(stream), options["batch_size"], progress
+                )
+        elapsed = time.monotonic() - started
+
+        for line_number, message in importer.errors[
+            :self.max_reported_errors
+        ]:
+            self.stderr.write(f"Line {line_number}: {message}")
+
+        if counts["created"] or counts["updated"]:
+            refresh_site_stats()
+            if not options["skip_related"]:
+                rebuild_related()
+
+        rows = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {rows} rows in {elapsed:.1f}s "
+            f"({rows / max(elapsed, 1e-6):.0f} rows/s): "
+            f"{counts['created']} created, {counts['updated']} updated, "
+            f"{counts['skipped']} skipped."
+        ))
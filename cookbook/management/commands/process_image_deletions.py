@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cookbook.images import MAX_BATCH_SIZE, process_image_deletions
+
+
+class Command(BaseCommand):
+    """Drain the Cloudinary image deletion outbox"""
+    help = (
+        "Deletes queued Cloudinary images in batches. "
+        "Use --loop to keep running as a background worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=MAX_BATCH_SIZE,
+            help="Images deleted per API call (at most 100)"
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting when empty"
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=10,
+            help="Seconds to wait between polls in --loop mode"
+        )
+
+    def handle(self, *args, **options):
+        total_deleted = total_failed = 0
+        while True:
+            deleted, failed = process_image_deletions(options["batch_size"])
+            total_deleted += deleted
+            total_failed += failed
+            if deleted or failed:
+                self.stdout.write(
+                    f"Deleted {deleted} images, {failed} failed."
+                )
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {total_deleted} deleted, {total_failed} failed."
+        ))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cookbook.recommendations import (
+    UPDATE_BATCH_SIZE,
+    process_related_updates
+)
+
+
+class Command(BaseCommand):
+    """Drain the related recipe update outbox"""
+    help = (
+        "Refreshes the related recipes of changed recipes in batches. "
+        "Use --loop to keep running as a background worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=UPDATE_BATCH_SIZE,
+            help="Recipes updated together"
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting when empty"
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=10,
+            help="Seconds to wait between polls in --loop mode"
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            updated = process_related_updates(options["batch_size"])
+            total += updated
+            if updated:
+                self.stdout.write(f"Updated {updated} recipes.")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: related recipes of {total} recipes updated."
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from cookbook.models import Recipe
+
+
+class Command(BaseCommand):
+    """Rebuild the stored rating/comment counters of every recipe"""
+    help = (
+        "Recalculates Recipe.rating_sum, rating_count and comment_count "
+        "from the comments table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of recipes updated per statement"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        recipe_ids = (Recipe.objects
+                      .order_by("pk")
+                      .values_list("pk", flat=True)
+                      )
+
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(recipe_ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            updated += (Recipe.objects
+                        .filter(pk__gte=batch[0], pk__lte=batch[-1])
+                        .refresh_comment_stats()
+                        )
+            last_pk = batch[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt statistics for {updated} recipes."
+        ))
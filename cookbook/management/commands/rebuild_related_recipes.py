@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from cookbook.recommendations import TOP_N, rebuild_related
+
+
+class Command(BaseCommand):
+    """Recompute the related recipes shown on recipe pages"""
+    help = (
+        "Recalculates the RelatedRecipe table from tags, ingredients "
+        "and favorites. Meant to run periodically (e.g. nightly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=TOP_N,
+            help="Number of related recipes stored per recipe"
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_related(n=options["top"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {rows} related recipe pairs."
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from cookbook.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """Recreate and repopulate the recipe full-text index"""
+    help = "Installs the recipe search index and rebuilds its contents."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database alias to rebuild the index on"
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        backend = get_search_backend(connections[using].vendor)
+        backend.install(using)
+        backend.rebuild(using)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt search index with {type(backend).__name__}."
+        ))
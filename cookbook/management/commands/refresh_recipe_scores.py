@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from cookbook.models import Recipe
+from cookbook.scores import compute_rating_prior, refresh_scores
+
+
+class Command(BaseCommand):
+    """Recompute the stored rating and trending sort keys"""
+    help = (
+        "Recalculates Recipe.bayesian_rating against the current site "
+        "mean rating and Recipe.trending_score from the comments. "
+        "Meant to run periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of recipes updated per batch"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        prior = compute_rating_prior()
+        recipe_ids = (Recipe.objects
+                      .order_by("pk")
+                      .values_list("pk", flat=True)
+                      )
+
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(recipe_ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            updated += refresh_scores(
+                Recipe.objects.filter(pk__gte=batch[0], pk__lte=batch[-1]),
+                prior
+            )
+            last_pk = batch[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed scores of {updated} recipes "
+            f"(site mean rating {prior:.2f})."
+        ))
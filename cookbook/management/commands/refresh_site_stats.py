@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from cookbook.stats import get_site_stats, refresh_site_stats
+
+
+class Command(BaseCommand):
+    """Reconcile the cached homepage aggregates with the database"""
+    help = (
+        "Recomputes the cached recipe/user totals and the popular "
+        "recipe list. Meant to run periodically."
+    )
+
+    def handle(self, *args, **options):
+        refresh_site_stats()
+        site_stats = get_site_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"{site_stats['total_recipes']} recipes, "
+            f"{site_stats['total_users']} users, "
+            f"popular: {site_stats['popular_ids']}"
+        ))
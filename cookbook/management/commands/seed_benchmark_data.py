@@ -0,0 +1,86 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from cookbook.benchmark import flush, seed
+from cookbook.recommendations import rebuild_related
+from cookbook.stats import refresh_site_stats
+
+
+class Command(BaseCommand):
+    """Fill the database with reproducible synthetic data for benchmarks"""
+    help = (
+        "Creates benchmark users, categories, tags, recipes, comments "
+        "and favorites. The same --seed always produces the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=10_000)
+        parser.add_argument("--comments", type=int, default=50_000)
+        parser.add_argument("--favorites", type=int, default=20_000)
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--tags", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows written per statement"
+        )
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="Delete previously seeded benchmark data first"
+        )
+        parser.add_argument(
+            "--skip-related",
+            action="store_true",
+            help="Do not rebuild the related recipes afterwards"
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 and options["recipes"]:
+            raise CommandError("Recipes need at least one user.")
+        if options["flush"]:
+            flush()
+
+        started = time.monotonic()
+
+        def progress(kind, done):
+            if options["verbosity"] > 1:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"{done} {kind} ({elapsed:.0f}s)")
+
+        try:
+            counts = seed(
+                users=options["users"],
+                recipes=options["recipes"],
+                comments=options["comments"],
+                favorites=options["favorites"],
+                categories=options["categories"],
+                tags=options["tags"],
+                random_seed=options["seed"],
+                batch_size=options["batch_size"],
+                progress=progress
+            )
+        except ValueError as exc:
+            raise CommandError(f"{exc}, use --flush to replace it.")
+
+        # Bulk inserts send no signals, bring the derived data up to date
+        call_command(
+            "refresh_recipe_scores",
+            batch_size=options["batch_size"],
+            stdout=self.stdout
+        )
+        refresh_site_stats()
+        if not options["skip_related"]:
+            rebuild_related()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {counts['users']} users, {counts['recipes']} recipes, "
+            f"{counts['comments']} comments and {counts['favorites']} "
+            f"favorites in {elapsed:.1f}s."
+        ))
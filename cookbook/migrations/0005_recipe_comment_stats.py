@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 02:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_stats(apps, schema_editor):
+    Recipe = apps.get_model("cookbook", "Recipe")
+    Comment = apps.get_model("cookbook", "Comment")
+    comments = Comment.objects.filter(recipe=OuterRef("pk")).order_by().values("recipe")
+
+    def total(aggregate):
+        return Coalesce(Subquery(comments.annotate(total=aggregate).values("total")), 0)
+
+    Recipe.objects.update(
+        rating_sum=total(Sum("rating")),
+        rating_count=total(Count("rating")),
+        comment_count=total(Count("pk")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cookbook", "0004_alter_category_description_alter_category_name_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="comment_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, help_text="Number of comments"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="rating_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, help_text="Number of rated comments"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="rating_sum",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, help_text="Sum of all comment ratings"
+            ),
+        ),
+        migrations.RunPython(backfill_comment_stats, migrations.RunPython.noop),
+    ]
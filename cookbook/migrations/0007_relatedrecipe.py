@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 02:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0006_imagedeletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='cookbook.recipe')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='cookbook.recipe')),
+            ],
+            options={
+                'ordering': ['recipe', '-score'],
+                'indexes': [models.Index(fields=['recipe', '-score'], name='related_recipe_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('recipe', 'related'), name='unique_related_recipe')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 02:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0007_relatedrecipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('quantity', models.DecimalField(blank=True, decimal_places=3, max_digits=9, null=True)),
+                ('unit', models.CharField(blank=True, max_length=20)),
+                ('name', models.CharField(help_text='Normalized ingredient name', max_length=100)),
+                ('raw', models.CharField(help_text='The line as written in the recipe', max_length=255)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_items', to='cookbook.recipe')),
+            ],
+            options={
+                'ordering': ['recipe', 'position'],
+                'indexes': [models.Index(fields=['name', 'recipe'], name='recipe_ingredient_name_idx')],
+                'constraints': [models.UniqueConstraint(fields=('recipe', 'position'), name='unique_recipe_ingredient_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 6.0 on 2026-10-18 02:26
+
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+from django.db.models import Avg, F
+
+
+def backfill_scores(apps, schema_editor):
+    # Same formulas as cookbook.scores with the default settings,
+    # refresh_recipe_scores recomputes them with the configured ones
+    Recipe = apps.get_model("cookbook", "Recipe")
+    Comment = apps.get_model("cookbook", "Comment")
+
+    prior = Comment.objects.aggregate(mean=Avg("rating"))["mean"] or 3.0
+    Recipe.objects.filter(rating_count__gt=0).update(
+        bayesian_rating=(5.0 * prior + F("rating_sum")) / (5.0 + F("rating_count"))
+    )
+
+    epoch = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def weight(when):
+        return 2.0 ** ((when - epoch).total_seconds() / (7 * 24 * 60 * 60))
+
+    scores = {
+        pk: weight(created_at)
+        for pk, created_at in Recipe.objects.values_list("pk", "created_at").iterator()
+    }
+    for recipe_id, created_at in Comment.objects.values_list("recipe_id", "created_at").iterator():
+        scores[recipe_id] += weight(created_at)
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, trending_score=score) for pk, score in scores.items()],
+        ["trending_score"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0008_recipeingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='bayesian_rating',
+            field=models.FloatField(default=0, editable=False, help_text='Average rating weighted towards the site mean (0 when unrated)'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, help_text='Time-decayed activity score, see cookbook.scores'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['created_at', 'id'], name='recipe_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['comment_count', 'id'], name='recipe_comment_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['bayesian_rating', 'id'], name='recipe_bayesian_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['trending_score', 'id'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
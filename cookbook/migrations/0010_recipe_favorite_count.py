@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 02:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_favorite_counts(apps, schema_editor):
+    Recipe = apps.get_model("cookbook", "Recipe")
+    Favorite = apps.get_model("cookbook", "User").favorite_recipes.through
+    counts = (Favorite.objects
+              .filter(recipe_id=OuterRef("pk"))
+              .order_by()
+              .values("recipe_id")
+              .annotate(total=Count("pk"))
+              .values("total"))
+    Recipe.objects.update(favorite_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0009_recipe_sort_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of users who favorited the recipe'),
+        ),
+        migrations.RunPython(backfill_favorite_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+from cookbook.operations import PostgresRunSQL
+
+
+class Migration(migrations.Migration):
+    """Weighted full-text search vector of recipes, on PostgreSQL
+
+    The column is generated from title, description and ingredients, so
+    PostgreSQL refuses to change their types while it exists: a later
+    migration altering one of them has to drop and re-add it.
+    """
+
+    dependencies = [
+        ('cookbook', '0011_hot_filter_indexes'),
+    ]
+
+    operations = [
+        PostgresRunSQL(
+            sql=[
+                "ALTER TABLE cookbook_recipe "
+                "ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                "GENERATED ALWAYS AS ("
+                "setweight(to_tsvector('english', "
+                "coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', "
+                "coalesce(description, '')), 'B') || "
+                "setweight(to_tsvector('english', "
+                "coalesce(ingredients, '')), 'C')"
+                ") STORED",
+                "CREATE INDEX IF NOT EXISTS cookbook_recipe_search_vector_gin "
+                "ON cookbook_recipe USING gin (search_vector)",
+            ],
+            reverse_sql=[
+                "DROP INDEX IF EXISTS cookbook_recipe_search_vector_gin",
+                "ALTER TABLE cookbook_recipe "
+                "DROP COLUMN IF EXISTS search_vector",
+            ]
+        ),
+    ]
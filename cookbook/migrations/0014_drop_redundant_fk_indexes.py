@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 05:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0013_relatedrecipeupdate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, help_text='Recipe name', on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='cookbook.recipe'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='author',
+            field=models.ForeignKey(db_index=False, help_text='Recipe author', on_delete=django.db.models.deletion.CASCADE, related_name='recipes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='category',
+            field=models.ForeignKey(db_index=False, help_text='Recipe category', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recipes', to='cookbook.category'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import migrations
+from django.db.models import F, Func
+
+from cookbook.operations import (
+    PostgresAddIndex,
+    PostgresRunSQL,
+    TrigramExtension,
+    UnaccentExtension
+)
+
+
+# (model, column) of every suggestion source
+SOURCES = [
+    ("recipe", "title"),
+    ("tag", "name"),
+    ("category", "name"),
+    ("recipeingredient", "name"),
+]
+
+
+class Migration(migrations.Migration):
+    """Trigram indexes of the suggestion sources, on PostgreSQL
+
+    ``cookbook_fold`` is lower(unaccent()) declared immutable, which
+    unaccent() itself is not, so that it can be indexed. The indexes
+    replace the lower() ones earlier versions created after migrating.
+    """
+
+    dependencies = [
+        ('cookbook', '0014_drop_redundant_fk_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        PostgresRunSQL(
+            sql=[
+                "CREATE OR REPLACE FUNCTION cookbook_fold(text) "
+                "RETURNS text AS $$ "
+                "SELECT lower(public.unaccent("
+                "'public.unaccent'::regdictionary, $1)) "
+                "$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT",
+            ] + [
+                f"DROP INDEX IF EXISTS cookbook_{model}_{column}_trgm"
+                for model, column in SOURCES
+            ],
+            reverse_sql=["DROP FUNCTION IF EXISTS cookbook_fold(text)"],
+        ),
+    ] + [
+        PostgresAddIndex(
+            model_name=model,
+            index=GinIndex(
+                OpClass(
+                    Func(F(column), function="cookbook_fold"),
+                    name="gin_trgm_ops"
+                ),
+                name=f"cookbook_{model}_{column}_trgm"
+            ),
+        )
+        for model, column in SOURCES
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import F, Value
+from django.db.models.functions import Log, Power
+
+
+def to_log2(apps, schema_editor):
+    Recipe = apps.get_model("cookbook", "Recipe")
+    Recipe.objects.filter(trending_score__gt=0).update(
+        trending_score=Log(Value(2.0), F("trending_score"))
+    )
+
+
+def from_log2(apps, schema_editor):
+    Recipe = apps.get_model("cookbook", "Recipe")
+    Recipe.objects.update(
+        trending_score=Power(Value(2.0), F("trending_score"))
+    )
+
+
+class Migration(migrations.Migration):
+    """Trending scores are stored as the log2 of their sums"""
+
+    dependencies = [
+        ('cookbook', '0015_suggestion_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_log2, from_log2),
+    ]
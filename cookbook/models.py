@@ -2,7 +2,15 @@ from cloudinary.models import CloudinaryField
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.urls import reverse
-from django.db.models import Avg
+from django.utils import timezone
+from django.db.models import (
+    Count,
+    F,
+    OuterRef,
+    Subquery,
+    Sum
+)
+from django.db.models.functions import Coalesce
 from django.core.validators import (
     MinValueValidator,
     MaxValueValidator
@@ -32,6 +40,13 @@ class User(AbstractUser):
     class Meta:
         ordering = ["username"]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Recipe cards show the username, signals compare against this
+        instance._loaded_username = instance.__dict__.get("username")
+        return instance
+
     def __str__(self):
         return self.username
 
@@ -58,6 +73,13 @@ class Category(models.Model):
         verbose_name_plural = "categories"
         ordering = ["name"]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Recipe cards show the name, signals compare against this
+        instance._loaded_name = instance.__dict__.get("name")
+        return instance
+
     def __str__(self):
         return self.name
 
@@ -84,6 +106,16 @@ class Tag(models.Model):
     class Meta:
         ordering = ["name"]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Recipes show the name and slug, signals compare against this
+        instance._loaded_label = (
+            instance.__dict__.get("name"),
+            instance.__dict__.get("slug")
+        )
+        return instance
+
     def __str__(self):
         return self.name
 
@@ -94,7 +126,128 @@ class Tag(models.Model):
         )
 
 
-class Recipe(models.Model):
+class LoadedStateMixin:
+    """Remembers the field values an instance was loaded with.
+
+    Changes are detected in memory, and saves of loaded instances only
+    write the columns that actually changed (plus auto_now fields). A
+    save without changes still touches the auto_now fields and sends
+    the save signals, like any other save.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def _remember_loaded_values(self, fields=None):
+        attnames = (
+            {self._meta.get_field(name).attname for name in fields}
+            if fields is not None
+            else {field.attname for field in self._meta.concrete_fields}
+        )
+        loaded = getattr(self, "_loaded_values", {})
+        loaded.update({
+            attname: self.__dict__[attname]
+            for attname in attnames if attname in self.__dict__
+        })
+        self._loaded_values = loaded
+
+    def get_loaded_value(self, name):
+        """Value of a field at load time, KeyError when it is unknown"""
+        attname = self._meta.get_field(name).attname
+        return self.__dict__["_loaded_values"][attname]
+
+    def get_dirty_fields(self):
+        """Names of changed fields, or None if the instance wasn't loaded"""
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return None
+
+        dirty = set()
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__ or field.primary_key:
+                continue
+            if field.attname not in loaded or (
+                field.get_prep_value(loaded[field.attname])
+                != field.get_prep_value(self.__dict__[field.attname])
+            ):
+                dirty.add(field.name)
+        return dirty
+
+    def save(self, **kwargs):
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                update_fields = dirty | {
+                    field.name for field in self._meta.concrete_fields
+                    if getattr(field, "auto_now", False)
+                }
+                # Django skips saves with empty update_fields, signals
+                # included
+                if update_fields:
+                    kwargs["update_fields"] = update_fields
+        super().save(**kwargs)
+        self._remember_loaded_values(kwargs.get("update_fields"))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(
+            using=using,
+            fields=fields,
+            from_queryset=from_queryset
+        )
+        if fields is not None:
+            fields = [
+                name for name in fields
+                if self._meta.get_field(name).concrete
+            ]
+        self._remember_loaded_values(fields)
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Recipe queryset with helpers for the stored comment statistics"""
+
+    def refresh_comment_stats(self):
+        """Recalculate rating_sum/rating_count/comment_count from comments"""
+        comments = (Comment.objects
+                    .filter(recipe=OuterRef("pk"))
+                    .order_by()
+                    .values("recipe")
+                    )
+
+        # Same totals, but the condition lets the rated comments index
+        # answer them
+        rated = comments.filter(rating__isnull=False)
+
+        def total(comments, aggregate):
+            return Coalesce(
+                Subquery(comments.annotate(total=aggregate).values("total")),
+                0
+            )
+
+        from . import stats
+        from .scores import bayesian_rating
+
+        updated = self.update(
+            rating_sum=total(rated, Sum("rating")),
+            rating_count=total(rated, Count("rating")),
+            comment_count=total(comments, Count("pk")),
+        )
+        # Separate statement, SET expressions only see the old counters
+        self.update(bayesian_rating=bayesian_rating(
+            F("rating_sum"),
+            F("rating_count")
+        ))
+        stats.comment_counts_refreshed()
+        return updated
+
+
+class Recipe(LoadedStateMixin, models.Model):
     """Main Recipe model"""
     title = models.CharField(
         max_length=200,
@@ -125,10 +278,12 @@ class Recipe(models.Model):
         null=True,
         help_text="Upload a photo of your dish"
     )
+    # Both lead an index of Meta.indexes, which serves their lookups
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name="recipes",
+        db_index=False,
         help_text="Recipe author"
     )
     category = models.ForeignKey(
@@ -136,6 +291,7 @@ class Recipe(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         related_name="recipes",
+        db_index=False,
         help_text="Recipe category"
     )
     tags = models.ManyToManyField(
@@ -144,11 +300,73 @@ class Recipe(models.Model):
         blank=True,
         help_text="Recipe tags"
     )
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Sum of all comment ratings"
+    )
+    rating_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of rated comments"
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of comments"
+    )
+    favorite_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of users who favorited the recipe"
+    )
+    bayesian_rating = models.FloatField(
+        default=0,
+        editable=False,
+        help_text="Average rating weighted towards the site mean "
+                  "(0 when unrated)"
+    )
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        help_text="Time-decayed activity score, see cookbook.scores"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
+        # One per listing sort, with the primary key as the tie breaker
+        # (scanned backwards for descending sorts)
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"],
+                name="recipe_created_idx"
+            ),
+            models.Index(
+                fields=["comment_count", "id"],
+                name="recipe_comment_count_idx"
+            ),
+            models.Index(
+                fields=["bayesian_rating", "id"],
+                name="recipe_bayesian_rating_idx"
+            ),
+            models.Index(
+                fields=["trending_score", "id"],
+                name="recipe_trending_idx"
+            ),
+            # Category and user pages list their recipes newest first
+            models.Index(
+                fields=["category", "created_at", "id"],
+                name="recipe_category_created_idx"
+            ),
+            models.Index(
+                fields=["author", "created_at", "id"],
+                name="recipe_author_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -161,17 +379,59 @@ class Recipe(models.Model):
 
     @property
     def average_rating(self):
-        """Calculate average rating from comments"""
-        avg = self.comments.aggregate(Avg('rating'))['rating__avg']
-        return round(avg, 1) if avg else None
+        """Average comment rating, served from the stored counters"""
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 1)
+
+
+class CommentQuerySet(models.QuerySet):
+    """Keeps recipe statistics in sync for bulk operations,
+    which bypass the model signals"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        Recipe.objects.filter(
+            pk__in={obj.recipe_id for obj in objs}
+        ).refresh_comment_stats()
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if {"rating", "recipe", "recipe_id"} & set(fields):
+            recipe_ids = {obj.recipe_id for obj in objs}
+            recipe_ids.update(
+                obj._loaded_stats[0] for obj in objs
+                if hasattr(obj, "_loaded_stats")
+            )
+            Recipe.objects.filter(
+                pk__in=recipe_ids
+            ).refresh_comment_stats()
+        return rows
+
+    def update(self, **kwargs):
+        if not {"rating", "recipe", "recipe_id"} & set(kwargs):
+            return super().update(**kwargs)
+        recipe_ids = set(
+            self.order_by().values_list("recipe_id", flat=True)
+        )
+        rows = super().update(**kwargs)
+        new_recipe = kwargs.get("recipe", kwargs.get("recipe_id"))
+        if new_recipe is not None:
+            recipe_ids.add(getattr(new_recipe, "pk", new_recipe))
+        Recipe.objects.filter(pk__in=recipe_ids).refresh_comment_stats()
+        return rows
 
 
 class Comment(models.Model):
     """Comments on recipes"""
+    # Leads comment_recipe_created_idx, which serves its lookups
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         related_name="comments",
+        db_index=False,
         help_text="Recipe name"
     )
     author = models.ForeignKey(
@@ -191,8 +451,32 @@ class Comment(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Comment pages of a recipe, newest first
+            models.Index(
+                fields=["recipe", "created_at", "id"],
+                name="comment_recipe_created_idx"
+            ),
+            # Covers the rating aggregates, which only read rated comments
+            models.Index(
+                fields=["recipe", "rating"],
+                condition=models.Q(rating__isnull=False),
+                name="comment_rated_idx"
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this comment contributes to the recipe stats,
+        # so signals can apply a delta instead of re-aggregating
+        if {"recipe_id", "rating"} <= instance.__dict__.keys():
+            instance._loaded_stats = (instance.recipe_id, instance.rating)
+        return instance
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.recipe.title}"
@@ -202,3 +486,117 @@ class Comment(models.Model):
             "cookbook:recipe-detail",
             kwargs={"pk": self.recipe.pk}
         )
+
+
+class ImageDeletion(models.Model):
+    """Outbox of Cloudinary images waiting to be deleted"""
+    public_id = models.CharField(
+        max_length=255,
+        help_text="Cloudinary public id of the image"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["next_attempt_at"]
+
+    def __str__(self):
+        return self.public_id
+
+
+class RelatedRecipe(models.Model):
+    """Precomputed nearest neighbours of a recipe (see recommendations)"""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="neighbors"
+    )
+    related = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="neighbor_of"
+    )
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ["recipe", "-score"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "related"],
+                name="unique_related_recipe"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["recipe", "-score"],
+                name="related_recipe_score_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class RelatedRecipeUpdate(models.Model):
+    """Outbox of recipes whose related recipes are out of date"""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="+"
+    )
+    queued_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["queued_at"]
+
+    def __str__(self):
+        return str(self.recipe_id)
+
+
+class RecipeIngredient(models.Model):
+    """A parsed line of Recipe.ingredients (see cookbook.ingredients)"""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="ingredient_items"
+    )
+    position = models.PositiveSmallIntegerField()
+    quantity = models.DecimalField(
+        max_digits=9,
+        decimal_places=3,
+        null=True,
+        blank=True
+    )
+    unit = models.CharField(max_length=20, blank=True)
+    name = models.CharField(
+        max_length=100,
+        help_text="Normalized ingredient name"
+    )
+    raw = models.CharField(
+        max_length=255,
+        help_text="The line as written in the recipe"
+    )
+
+    class Meta:
+        ordering = ["recipe", "position"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "position"],
+                name="unique_recipe_ingredient_position"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["name", "recipe"],
+                name="recipe_ingredient_name_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return self.raw
@@ -0,0 +1,61 @@
+"""Migration operations for schema that only exists on PostgreSQL.
+
+The search structures of PostgreSQL (a generated tsvector column,
+trigram indexes and the extensions they need) have no equivalent on
+SQLite, which development and tests use. These operations apply them on
+PostgreSQL and do nothing elsewhere, so both run the same migrations.
+"""
+from django.contrib.postgres import operations as postgres
+from django.db import migrations
+
+
+def is_postgresql(schema_editor):
+    return schema_editor.connection.vendor == "postgresql"
+
+
+class PostgresOnlyMixin:
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if is_postgresql(schema_editor):
+            super().database_forwards(
+                app_label,
+                schema_editor,
+                from_state,
+                to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if is_postgresql(schema_editor):
+            super().database_backwards(
+                app_label,
+                schema_editor,
+                from_state,
+                to_state
+            )
+
+
+class PostgresRunSQL(PostgresOnlyMixin, migrations.RunSQL):
+    """RunSQL applied on PostgreSQL only"""
+
+
+class TrigramExtension(PostgresOnlyMixin, postgres.TrigramExtension):
+    """pg_trgm, also reversible on other databases"""
+
+
+class UnaccentExtension(PostgresOnlyMixin, postgres.UnaccentExtension):
+    """unaccent, also reversible on other databases"""
+
+
+class PostgresAddIndex(PostgresOnlyMixin, migrations.AddIndex):
+    """AddIndex applied on PostgreSQL only, and kept out of model state.
+
+    Model state is shared by every database, so an index there would
+    be created by the SQLite table remakes of later migrations.
+    """
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def describe(self):
+        return f"{super().describe()} on PostgreSQL"
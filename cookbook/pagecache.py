@@ -0,0 +1,238 @@
+"""Full-response cache of anonymous page views.
+
+Views using ``PageCacheMixin`` store the rendered page per URL and
+language for anonymous visitors. Requests carrying a session or messages
+cookie bypass the cache (the page may depend on who is asking), and
+responses that set cookies, used a CSRF token or are not 200s are never
+stored. Every response gets ``Vary: Cookie`` for downstream caches.
+
+Each page records the versions of the cache tags it depends on
+("recipe:12", "recipes", "categories", ...). ``purge_tags`` bumps those
+versions after the transaction commits (see ``cookbook.signals``), which
+makes every dependent page stale at once without knowing its URL. That
+only holds for every process if they share the cache (Redis in
+production): with a per-process LocMemCache the other processes keep
+serving their copies for up to COOKBOOK_PAGE_CACHE_TIMEOUT.
+
+Pages that will be stored are rendered from the primary database, see
+``cookbook.replicas.primary_reads``.
+
+Stale pages are not dropped: the first request to see one takes a short
+lock and renders the page again while concurrent requests keep getting
+the stale copy, so a purge costs one render per page rather than one per
+visitor (stale-while-revalidate). Pages are fresh for
+COOKBOOK_PAGE_CACHE_TIMEOUT seconds and kept for revalidation
+COOKBOOK_PAGE_CACHE_STALE_TIMEOUT seconds longer. COOKBOOK_PAGE_CACHE
+turns the whole cache off.
+"""
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.translation import get_language
+
+from .replicas import primary_reads
+
+
+# Pages of every view depend on it, for changes that touch all of them
+SITE_TAG = "site"
+LOCK_TIMEOUT = 30
+
+
+def is_enabled():
+    return getattr(settings, "COOKBOOK_PAGE_CACHE", True)
+
+
+def _fresh_timeout():
+    return getattr(settings, "COOKBOOK_PAGE_CACHE_TIMEOUT", 5 * 60)
+
+
+def _stale_timeout():
+    return getattr(settings, "COOKBOOK_PAGE_CACHE_STALE_TIMEOUT", 60 * 60)
+
+
+def _tag_key(tag):
+    return f"page-tag:{tag}"
+
+
+def tag_versions(tags):
+    """{tag: version}; tags without a version get a new one"""
+    keys = {_tag_key(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        # Evicted or never purged, pages stored before cannot match
+        cache.add(key, time.time_ns(), None)
+        versions[key] = cache.get(key)
+    return {tag: versions[key] for key, tag in keys.items()}
+
+
+def _purge(tags):
+    version = time.time_ns()
+    cache.set_many({_tag_key(tag): version for tag in tags}, None)
+
+
+def purge_tags(*tags):
+    """Marks the pages depending on any of the tags stale on commit"""
+    if tags:
+        transaction.on_commit(lambda: _purge(tags))
+
+
+def is_cacheable_request(request):
+    return (
+        is_enabled()
+        and request.method in ("GET", "HEAD")
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and "messages" not in request.COOKIES
+    )
+
+
+def page_key(request):
+    url = request.build_absolute_uri()
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f"page-cache:{get_language()}:{digest}"
+
+
+def _is_fresh(entry):
+    if entry["expires"] < time.time():
+        return False
+    return tag_versions(entry["tags"]) == entry["tags"]
+
+
+def _response(entry, status):
+    response = HttpResponse(
+        entry["content"],
+        content_type=entry["content_type"]
+    )
+    response["X-Page-Cache"] = status
+    patch_vary_headers(response, ["Cookie"])
+    return response
+
+
+def _is_storable(request, response):
+    return (
+        response.status_code == 200
+        and not response.cookies
+        and not response.streaming
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+    )
+
+
+class PageCacheMixin:
+    """Serves anonymous GETs of a view from the page cache.
+
+    ``page_cache_tags`` lists the tags of every page of the view; views
+    add page-specific ones in ``get_page_cache_tags`` (known before the
+    render) or to ``self.page_cache_extra_tags`` while rendering.
+    """
+    page_cache = True
+    page_cache_tags = ()
+
+    def get_page_cache_tags(self):
+        return [SITE_TAG, *self.page_cache_tags]
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.uses_page_cache(request):
+            response = super().dispatch(request, *args, **kwargs)
+            patch_vary_headers(response, ["Cookie"])
+            return response
+        cached = self.get_cached_page(request)
+        if cached is not None:
+            return cached
+        try:
+            # The template's reads too, it is rendered for the cache
+            with primary_reads():
+                response = super().dispatch(request, *args, **kwargs)
+                if not getattr(response, "is_rendered", True):
+                    response.render()
+        except Exception:
+            # Http404 included, a stale copy must not outlive its page
+            cache.delete_many(self._page_cache_keys)
+            raise
+        return self.store_page(request, response)
+
+    def uses_page_cache(self, request):
+        return self.page_cache and is_cacheable_request(request)
+
+    def get_cached_page(self, request):
+        """The page if it can be served from the cache, else None.
+
+        With None the view renders it, and ``store_page`` stores it.
+        """
+        key = page_key(request)
+        lock_key = f"{key}:lock"
+        entry = cache.get(key)
+        if entry is not None:
+            if _is_fresh(entry):
+                return _response(entry, "hit")
+            if not cache.add(lock_key, True, LOCK_TIMEOUT):
+                # Someone else is already rendering it
+                return _response(entry, "stale")
+        self._page_cache_keys = [key, lock_key]
+        self._page_cache_status = "miss" if entry is None else "revalidated"
+
+        # Versions as of before the render, a purge during it wins
+        self.page_cache_extra_tags = []
+        self._page_cache_versions = tag_versions(self.get_page_cache_tags())
+        return None
+
+    def store_page(self, request, response):
+        key, lock_key = self._page_cache_keys
+        versions = self._page_cache_versions
+
+        def store(response):
+            if not _is_storable(request, response):
+                cache.delete_many([key, lock_key])
+                return
+            versions.update(tag_versions(
+                set(self.page_cache_extra_tags) - versions.keys()
+            ))
+            cache.set(key, {
+                "content": response.content,
+                "content_type": response["Content-Type"],
+                "tags": versions,
+                "expires": time.time() + _fresh_timeout(),
+            }, _fresh_timeout() + _stale_timeout())
+            cache.delete(lock_key)
+
+        if getattr(response, "is_rendered", True):
+            store(response)
+        else:
+            response.add_post_render_callback(store)
+        response["X-Page-Cache"] = self._page_cache_status
+        patch_vary_headers(response, ["Cookie"])
+        return response
+
+
+class AsyncPageCacheMixin(PageCacheMixin):
+    """``PageCacheMixin`` for views with async handlers.
+
+    Cache calls stay synchronous, they answer from memory (or a cache
+    server) without touching the database.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not self.uses_page_cache(request):
+            response = await super(PageCacheMixin, self).dispatch(
+                request, *args, **kwargs
+            )
+            patch_vary_headers(response, ["Cookie"])
+            return response
+        cached = self.get_cached_page(request)
+        if cached is not None:
+            return cached
+        try:
+            with primary_reads():
+                response = await super(PageCacheMixin, self).dispatch(
+                    request, *args, **kwargs
+                )
+                if not getattr(response, "is_rendered", True):
+                    await sync_to_async(response.render)()
+        except Exception:
+            cache.delete_many(self._page_cache_keys)
+            raise
+        return self.store_page(request, response)
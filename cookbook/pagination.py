@@ -0,0 +1,326 @@
+import asyncio
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+def _encode_value(value):
+    # Full precision on purpose: DjangoJSONEncoder drops microseconds,
+    # which would skip or repeat rows created within the same millisecond
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+class CursorPage(Sequence):
+    """A page of a keyset-paginated queryset"""
+
+    def __init__(self, object_list, paginator, next_values, previous_values):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_values = next_values
+        self.previous_values = previous_values
+
+    def __repr__(self):
+        return f"<CursorPage of {len(self)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_values is not None
+
+    def has_previous(self):
+        return self.previous_values is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return self.paginator.encode_cursor(self.next_values)
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return self.paginator.encode_cursor(
+                self.previous_values,
+                backwards=True
+            )
+
+
+class CursorPaginator:
+    """Keyset pagination over the queryset ordering.
+
+    Instead of OFFSET, each page continues after the ordering values of
+    the last row it showed (always ending with the primary key, so keys
+    are unique), which costs the same on page 1000 as on page 1. The
+    total is only counted when ``count`` is actually used.
+    """
+
+    def __init__(self, object_list, per_page, ordering=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = self._resolve_ordering(ordering)
+
+    def _resolve_ordering(self, ordering):
+        query = self.object_list.query
+        ordering = list(
+            ordering
+            or query.order_by
+            or self.object_list.model._meta.ordering
+        )
+        for item in ordering:
+            if not isinstance(item, str):
+                raise ValueError(
+                    "Cursor pagination needs field or annotation names "
+                    f"in the ordering, got {item!r}."
+                )
+
+        fields = [
+            (item.lstrip("-"), item.startswith("-")) for item in ordering
+        ]
+        if not any(name in ("pk", "id") for name, _ in fields):
+            fields.append(("pk", fields[0][1] if fields else False))
+        return fields
+
+    def _field(self, name):
+        model = self.object_list.model
+        if name == "pk":
+            return model._meta.pk
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return model._meta.get_field(name)
+
+    @cached_property
+    def count(self):
+        return self.object_list.count()
+
+    def encode_cursor(self, values, backwards=False):
+        payload = json.dumps(
+            [values, backwards],
+            default=_encode_value,
+            separators=(",", ":")
+        )
+        return base64.urlsafe_b64encode(
+            payload.encode()
+        ).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values, backwards = json.loads(base64.urlsafe_b64decode(padded))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            values = [
+                None if value is None else self._field(name).to_python(value)
+                for (name, _), value in zip(self.ordering, values)
+            ]
+        except (
+            binascii.Error,
+            TypeError,
+            ValueError,
+            ValidationError
+        ) as exc:
+            raise InvalidCursor("Invalid pagination cursor.") from exc
+        return values, bool(backwards)
+
+    def _values_of(self, obj):
+        return [getattr(obj, name) for name, _ in self.ordering]
+
+    def _seek(self, values, backwards):
+        """Q matching the rows that come after (or before) ``values``"""
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = "lt" if descending != backwards else "gt"
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return condition
+
+    def _page_query(self, cursor):
+        """(rows queryset, cursor values, backwards) of a page"""
+        values, backwards = (
+            self.decode_cursor(cursor) if cursor else (None, False)
+        )
+        ordering = [
+            ("-" if descending != backwards else "") + name
+            for name, descending in self.ordering
+        ]
+        queryset = self.object_list.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        return queryset[:self.per_page + 1], values, backwards
+
+    def page(self, cursor=None):
+        queryset, values, backwards = self._page_query(cursor)
+        return self._make_page(list(queryset), values, backwards)
+
+    async def apage(self, cursor=None):
+        queryset, values, backwards = self._page_query(cursor)
+        return self._make_page(await _alist(queryset), values, backwards)
+
+    def _make_page(self, rows, values, backwards):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        first = self._values_of(rows[0]) if rows else None
+        last = self._values_of(rows[-1]) if rows else None
+        if backwards:
+            return CursorPage(
+                rows,
+                self,
+                next_values=last,
+                previous_values=first if has_more else None
+            )
+        return CursorPage(
+            rows,
+            self,
+            next_values=last if has_more else None,
+            previous_values=first if values is not None else None
+        )
+
+
+class CursorPaginationMixin:
+    """Opt-in keyset pagination for recipe listings.
+
+    Views enable it with ``cursor_pagination = True``; when left as None
+    the COOKBOOK_CURSOR_PAGINATION setting decides.
+    """
+    cursor_pagination = None
+    cursor_paginate_by = 12
+    cursor_kwarg = "cursor"
+
+    def get_cursor_pagination(self):
+        if self.cursor_pagination is None:
+            return getattr(settings, "COOKBOOK_CURSOR_PAGINATION", False)
+        return self.cursor_pagination
+
+    def cursor_paginate(self, queryset, page_size=None, cursor_kwarg=None):
+        """Returns (paginator, page, object_list, is_paginated)"""
+        paginator = CursorPaginator(
+            queryset,
+            page_size or self.cursor_paginate_by
+        )
+        cursor = self.request.GET.get(cursor_kwarg or self.cursor_kwarg)
+        try:
+            page = paginator.page(cursor)
+        except InvalidCursor as exc:
+            raise Http404(str(exc))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    async def acursor_paginate(self, queryset, page_size=None,
+                               cursor_kwarg=None):
+        """``cursor_paginate`` through the async ORM interface"""
+        paginator = CursorPaginator(
+            queryset,
+            page_size or self.cursor_paginate_by
+        )
+        cursor = self.request.GET.get(cursor_kwarg or self.cursor_kwarg)
+        try:
+            page = await paginator.apage(cursor)
+        except InvalidCursor as exc:
+            raise Http404(str(exc))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_cursor_page_context(self, queryset, context_object_name):
+        """Paginated context for a list shown on a non-list view"""
+        if not self.get_cursor_pagination():
+            return {context_object_name: queryset}
+        paginator, page, object_list, is_paginated = (
+            self.cursor_paginate(queryset)
+        )
+        return {
+            context_object_name: object_list,
+            "paginator": paginator,
+            "page_obj": page,
+            "is_paginated": is_paginated,
+        }
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.get_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        return self.cursor_paginate(queryset, page_size)
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """``paginate_queryset`` through the async ORM interface.
+
+        A numbered page asks for its rows and the total together, the
+        rows of a page past the end are simply not shown.
+        """
+        if self.get_cursor_pagination():
+            return await self.acursor_paginate(queryset, page_size)
+        paginator = self.get_paginator(
+            queryset,
+            page_size,
+            orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty()
+        )
+        page = (
+            self.kwargs.get(self.page_kwarg)
+            or self.request.GET.get(self.page_kwarg)
+            or 1
+        )
+        try:
+            number = int(page)
+        except ValueError:
+            if page != "last":
+                raise Http404(
+                    "Page is not “last”, nor can it be converted to "
+                    "an int."
+                )
+            paginator.count = await queryset.acount()
+            number = paginator.num_pages
+        if number < 1:
+            raise Http404(
+                f"Invalid page ({number}): "
+                f"{paginator.error_messages['min_page']}"
+            )
+
+        # Orphans join the last page, which only the total tells
+        bottom = (number - 1) * paginator.per_page
+        top = bottom + paginator.per_page + paginator.orphans
+        paginator.count, rows = await asyncio.gather(
+            queryset.acount(),
+            _alist(queryset[bottom:top])
+        )
+        try:
+            number = paginator.validate_number(number)
+        except InvalidPage as exc:
+            raise Http404(f"Invalid page ({number}): {exc}")
+        if top < paginator.count:
+            rows = rows[:paginator.per_page]
+        page = paginator._get_page(rows, number, paginator)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["cursor_pagination"] = self.get_cursor_pagination()
+        return context
@@ -0,0 +1,225 @@
+"""SQL query recording, N+1 detection and per-view query budgets.
+
+``QueryRecorder`` hooks every database connection through
+``execute_wrapper`` and remembers each statement together with the code
+that triggered it: the innermost template node being rendered (template
+name and line) or else the innermost frame of project code.
+
+Views declare ``query_budget = <max queries>``; other URLs (e.g. admin
+changelists) can be budgeted by URL name in COOKBOOK_QUERY_BUDGETS.
+``QueryBudgetMiddleware`` enforces them according to
+COOKBOOK_QUERY_BUDGET_MODE: "warn" logs, "raise" fails the request (and
+so the test), anything else disables the middleware.
+"""
+import logging
+import re
+import sys
+import time
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger("cookbook.queries")
+
+# The same statement shape this many times in one request is an N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+RecordedQuery = namedtuple(
+    "RecordedQuery",
+    ["sql", "params", "shape", "duration", "location"]
+)
+
+_NUMBERS = re.compile(r"\b\d+\b")
+_PLACEHOLDER_LISTS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+_IGNORED_PATHS = ("site-packages", "dist-packages", __file__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def statement_shape(sql):
+    """SQL with literals and IN lists collapsed, for grouping"""
+    shape = _NUMBERS.sub("?", sql)
+    return _PLACEHOLDER_LISTS.sub("(...)", shape)
+
+
+def _trigger_location():
+    """Template line (or project source line) issuing the query"""
+    code_location = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        node = frame.f_locals.get("self")
+        if (
+            frame.f_code.co_name == "render_annotated"
+            and getattr(node, "token", None) is not None
+            and getattr(node, "origin", None) is not None
+        ):
+            return f"{node.origin.template_name}:{node.token.lineno}"
+
+        filename = frame.f_code.co_filename
+        if (
+            code_location is None
+            and filename.startswith(_PROJECT_ROOT)
+            and not any(path in filename for path in _IGNORED_PATHS)
+        ):
+            code_location = (
+                f"{Path(filename).relative_to(_PROJECT_ROOT)}:"
+                f"{frame.f_lineno} in {frame.f_code.co_name}"
+            )
+        frame = frame.f_back
+    return code_location or "<unknown>"
+
+
+class QueryRecorder:
+    """Context manager recording every query on every connection"""
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(RecordedQuery(
+                sql=sql,
+                params=params,
+                shape=statement_shape(sql),
+                duration=time.perf_counter() - start,
+                location=_trigger_location(),
+            ))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """Statement shapes run at least ``threshold`` times (N+1s)"""
+        groups = {}
+        for query in self.queries:
+            groups.setdefault(query.shape, []).append(query)
+        return {
+            shape: queries for shape, queries in groups.items()
+            if len(queries) >= threshold
+        }
+
+    def report(self, threshold=N_PLUS_ONE_THRESHOLD):
+        lines = [f"{self.count} queries"]
+        for shape, queries in self.repeated(threshold).items():
+            locations = sorted({query.location for query in queries})
+            lines.append(
+                f"  N+1: {len(queries)}x {shape[:200]}\n"
+                f"       from {', '.join(locations)}"
+            )
+        return "\n".join(lines)
+
+
+@contextmanager
+def query_budget(max_queries):
+    """Fails when the block runs more than ``max_queries`` queries"""
+    with QueryRecorder() as recorder:
+        yield recorder
+    if recorder.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"Query budget of {max_queries} exceeded: {recorder.report()}"
+        )
+
+
+class QueryBudgetTestMixin:
+    """TestCase helpers, like assertNumQueries but with a ceiling"""
+
+    @contextmanager
+    def assertMaxQueries(self, max_queries):
+        try:
+            with query_budget(max_queries) as recorder:
+                yield recorder
+        except QueryBudgetExceeded as exc:
+            self.fail(str(exc))
+
+    def assertNoNPlusOne(self, recorder, threshold=N_PLUS_ONE_THRESHOLD):
+        if recorder.repeated(threshold):
+            self.fail(recorder.report(threshold))
+
+
+def get_query_budget(request):
+    """Budget of the view that handled ``request``, if it declares one"""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None
+    view_class = getattr(match.func, "view_class", None)
+    budget = getattr(view_class, "query_budget", None)
+    if budget is None:
+        budgets = getattr(settings, "COOKBOOK_QUERY_BUDGETS", {})
+        budget = budgets.get(match.view_name)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    """Records the queries of each request and enforces view budgets"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, "COOKBOOK_QUERY_BUDGET_MODE", None)
+        if self.mode not in ("warn", "raise"):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.check(request, response, recorder)
+
+    async def __acall__(self, request):
+        # Connections are per thread; the ORM queries of the request run
+        # in its sync thread, so the recorder is installed there
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        return self.check(request, response, recorder)
+
+    def check(self, request, response, recorder):
+        response["X-Query-Count"] = str(recorder.count)
+
+        if recorder.repeated():
+            logger.warning("%s %s", request.path, recorder.report())
+
+        budget = get_query_budget(request)
+        if budget is not None and recorder.count > budget:
+            message = (
+                f"{request.path} exceeded its query budget of {budget}: "
+                f"{recorder.report()}"
+            )
+            if self.mode == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
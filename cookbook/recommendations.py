@@ -0,0 +1,281 @@
+"""Related-recipe recommendations.
+
+Every recipe is described by three sparse binary vectors: its tags, the
+tokens of its ingredient list and the users who favorited it. Two recipes
+are compared with the Jaccard index of their tags and ingredients and the
+cosine similarity of their favorites, mixed with WEIGHTS.
+
+Similarities are computed through inverted indexes (feature -> recipes),
+so only pairs sharing at least one feature are ever looked at, which is
+the sparse product of the recipe/feature matrix with its transpose. The
+top TOP_N neighbours of each recipe are stored in RelatedRecipe, where
+the detail page reads them with a single indexed query.
+
+``rebuild_related_recipes`` recomputes everything. In between, changed
+recipes (new ones, changed ingredients or tags) are queued in the
+RelatedRecipeUpdate outbox, a single INSERT on the request path, and
+``process_related_updates`` hands them to ``update_related`` off it.
+That refreshes their neighbours and patches their scores into the lists
+of at most MAX_CANDIDATES recipes sharing the most tags, and as many
+sharing the most favorites, with them. It only sees part of the data, so
+patched lists are never refilled and common ingredients are not filtered
+out until the next rebuild, which is also the only one to see new
+favorites.
+"""
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Recipe, RelatedRecipe, RelatedRecipeUpdate, User
+from .pagecache import SITE_TAG, purge_tags
+
+
+TOP_N = 6
+WEIGHTS = {
+    "tags": 0.4,
+    "ingredients": 0.35,
+    "favorites": 0.25,
+}
+# Ingredient tokens found in more recipes than this (salt, water, ...)
+# say nothing about similarity and would make the index dense
+MAX_INGREDIENT_SHARE = 0.2
+MIN_SCORE = 0.01
+# Lists an incremental update revisits per feature kind, out of the
+# recipes sharing tags (or favorites) with the changed ones
+MAX_CANDIDATES = 200
+UPDATE_BATCH_SIZE = 100
+
+_INGREDIENT_STOPWORDS = {
+    "and", "or", "the", "for", "with", "of", "to", "taste", "optional",
+    "cup", "cups", "tbsp", "tsp", "tablespoon", "tablespoons", "teaspoon",
+    "teaspoons", "pinch", "pieces", "piece", "large", "small", "medium",
+    "fresh", "chopped", "sliced", "diced", "minced", "grated",
+    "ml", "gr", "kg", "pcs",
+}
+
+
+def ingredient_tokens(text):
+    """Distinct meaningful words of a free-form ingredient list"""
+    return {
+        word for word in re.findall(r"[^\W\d_]+", (text or "").lower())
+        if len(word) > 2 and word not in _INGREDIENT_STOPWORDS
+    }
+
+
+def load_features(recipe_ids=None):
+    """{kind: {recipe_id: set(features)}} for the given (or all) recipes"""
+    tags = Recipe.tags.through.objects.values_list("recipe_id", "tag_id")
+    favorites = User.favorite_recipes.through.objects.values_list(
+        "recipe_id", "user_id"
+    )
+    recipes = Recipe.objects.values_list("pk", "ingredients")
+    if recipe_ids is not None:
+        tags = tags.filter(recipe_id__in=recipe_ids)
+        favorites = favorites.filter(recipe_id__in=recipe_ids)
+        recipes = recipes.filter(pk__in=recipe_ids)
+
+    features = {kind: defaultdict(set) for kind in WEIGHTS}
+    for recipe_id, tag_id in tags.iterator():
+        features["tags"][recipe_id].add(tag_id)
+    for recipe_id, user_id in favorites.iterator():
+        features["favorites"][recipe_id].add(user_id)
+    for recipe_id, ingredients in recipes.iterator():
+        tokens = ingredient_tokens(ingredients)
+        if tokens:
+            features["ingredients"][recipe_id] = tokens
+    return features
+
+
+def _inverted(vectors, max_postings=None):
+    index = defaultdict(set)
+    for recipe_id, items in vectors.items():
+        for item in items:
+            index[item].add(recipe_id)
+    if max_postings is not None:
+        index = {
+            item: recipe_ids for item, recipe_ids in index.items()
+            if len(recipe_ids) <= max_postings
+        }
+    return index
+
+
+def _similarity(kind, overlap, size_a, size_b):
+    if kind == "favorites":
+        return overlap / math.sqrt(size_a * size_b)
+    return overlap / (size_a + size_b - overlap)
+
+
+def similarities(features, sources, max_ingredient_postings=None):
+    """{source_id: Counter(other_id: score)} over shared features only"""
+    indexes = {
+        kind: _inverted(
+            vectors,
+            max_ingredient_postings if kind == "ingredients" else None
+        )
+        for kind, vectors in features.items()
+    }
+
+    scores = {}
+    for source in sources:
+        total = Counter()
+        for kind, vectors in features.items():
+            items = vectors.get(source)
+            if not items:
+                continue
+            overlaps = Counter()
+            for item in items:
+                overlaps.update(indexes[kind].get(item, ()))
+            overlaps.pop(source, None)
+            for other, overlap in overlaps.items():
+                total[other] += WEIGHTS[kind] * _similarity(
+                    kind, overlap, len(items), len(vectors[other])
+                )
+        scores[source] = total
+    return scores
+
+
+def _top(scores, n=TOP_N):
+    return heapq.nlargest(
+        n,
+        (
+            (other, score) for other, score in scores.items()
+            if score >= MIN_SCORE
+        ),
+        key=lambda item: (item[1], -item[0])
+    )
+
+
+def _store(neighbors):
+    """Replaces the neighbour lists of the given recipes"""
+    with transaction.atomic():
+        RelatedRecipe.objects.filter(recipe_id__in=neighbors).delete()
+        RelatedRecipe.objects.bulk_create([
+            RelatedRecipe(recipe_id=recipe_id, related_id=other, score=score)
+            for recipe_id, top in neighbors.items()
+            for other, score in top
+        ], batch_size=1000)
+
+
+def rebuild_related(n=TOP_N):
+    """Recomputes the neighbours of every recipe, returns the row count"""
+    started = timezone.now()
+    features = load_features()
+    recipe_ids = list(Recipe.objects.values_list("pk", flat=True))
+    scores = similarities(
+        features,
+        recipe_ids,
+        max(2, int(len(recipe_ids) * MAX_INGREDIENT_SHARE))
+    )
+    neighbors = {
+        recipe_id: _top(scores[recipe_id], n=n) for recipe_id in recipe_ids
+    }
+    _store(neighbors)
+    # Everything queued before the features were loaded is up to date
+    RelatedRecipeUpdate.objects.filter(queued_at__lte=started).delete()
+    purge_tags(SITE_TAG)
+    return sum(len(top) for top in neighbors.values())
+
+
+def _sharing(through, feature, recipe_ids, limit):
+    """Recipes sharing the most ``feature`` values with the given ones"""
+    return list(
+        through.objects
+        .filter(**{f"{feature}__in": through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values(feature)})
+        .exclude(recipe_id__in=recipe_ids)
+        .values("recipe_id")
+        .annotate(shared=Count("pk"))
+        .order_by("-shared", "recipe_id")
+        .values_list("recipe_id", flat=True)[:limit]
+    )
+
+
+def _candidates(recipe_ids):
+    """Recipes whose neighbour lists may involve the given recipes"""
+    candidates = set(_sharing(
+        Recipe.tags.through,
+        "tag_id",
+        recipe_ids,
+        MAX_CANDIDATES
+    ))
+    candidates.update(_sharing(
+        User.favorite_recipes.through,
+        "user_id",
+        recipe_ids,
+        MAX_CANDIDATES
+    ))
+    # Lists holding them now have to lose or rescore them
+    candidates.update(
+        RelatedRecipe.objects.filter(
+            related_id__in=recipe_ids
+        ).values_list("recipe_id", flat=True)
+    )
+    return candidates - set(recipe_ids)
+
+
+def update_related(recipe_ids):
+    """Refreshes the neighbours of changed recipes and their candidates"""
+    changed = set(Recipe.objects.filter(
+        pk__in=recipe_ids
+    ).values_list("pk", flat=True))
+    if not changed:
+        return
+    candidates = _candidates(changed)
+    features = load_features(changed | candidates)
+
+    scores = similarities(features, changed)
+    neighbors = {recipe_id: _top(scores[recipe_id]) for recipe_id in changed}
+
+    # Patch the new pair scores into the existing candidate lists
+    stored = defaultdict(dict)
+    for recipe_id, other, score in RelatedRecipe.objects.filter(
+        recipe_id__in=candidates
+    ).values_list("recipe_id", "related_id", "score"):
+        stored[recipe_id][other] = score
+    for candidate in candidates:
+        current = stored[candidate]
+        for recipe_id in changed:
+            current.pop(recipe_id, None)
+            score = scores[recipe_id].get(candidate)
+            if score:
+                current[recipe_id] = score
+        neighbors[candidate] = _top(current)
+
+    _store(neighbors)
+    purge_tags(*(f"recipe:{recipe_id}" for recipe_id in neighbors))
+
+
+def queue_related_update(recipe_ids):
+    """Queues recipes for ``process_related_updates``"""
+    RelatedRecipeUpdate.objects.bulk_create(
+        [RelatedRecipeUpdate(recipe_id=pk) for pk in set(recipe_ids)],
+        ignore_conflicts=True
+    )
+
+
+def process_related_updates(batch_size=UPDATE_BATCH_SIZE):
+    """Updates one batch of queued recipes, returns its size"""
+    with transaction.atomic():
+        recipe_ids = list(
+            RelatedRecipeUpdate.objects
+            .select_for_update(skip_locked=True)
+            .values_list("recipe_id", flat=True)[:batch_size]
+        )
+        # Claimed: changes from now on queue the recipes again
+        RelatedRecipeUpdate.objects.filter(recipe_id__in=recipe_ids).delete()
+    if not recipe_ids:
+        return 0
+    try:
+        update_related(recipe_ids)
+    except Exception:
+        queue_related_update(Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list("pk", flat=True))
+        raise
+    return len(recipe_ids)
@@ -0,0 +1,146 @@
+"""Named, resized renditions of recipe and profile images.
+
+Cloudinary images are resized by the CDN through transformation URLs.
+Images kept in a regular Django storage are resized once with Pillow,
+and the results are saved under RENDITIONS_DIR in the same storage.
+
+Either way, the URLs of a rendition only depend on the stored image, so
+they are computed once per image and process.
+"""
+import posixpath
+from collections import namedtuple
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+
+Rendition = namedtuple(
+    "Rendition",
+    ["widths", "aspect_ratio", "sizes", "gravity"]
+)
+
+RENDITIONS = {
+    # 200px tall cards in a 1/2/3 column grid
+    "card": Rendition(
+        widths=(360, 540, 720, 1080),
+        aspect_ratio=16 / 9,
+        sizes="(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw",
+        gravity="auto"
+    ),
+    # Up to 400px tall, in the 2/3 wide main column
+    "hero": Rendition(
+        widths=(640, 960, 1280, 1920),
+        aspect_ratio=2.0,
+        sizes="(min-width: 992px) 66vw, 100vw",
+        gravity="auto"
+    ),
+    "avatar": Rendition(
+        widths=(48, 96, 120, 240),
+        aspect_ratio=1.0,
+        sizes="120px",
+        gravity="face"
+    ),
+    "admin-thumb": Rendition(
+        widths=(60, 120),
+        aspect_ratio=1.0,
+        sizes="60px",
+        gravity="auto"
+    ),
+}
+
+RENDITIONS_DIR = "renditions"
+URL_CACHE_SIZE = 4096
+
+# {(image identity, rendition name): ((url, width), ...)}
+_url_cache = {}
+
+
+def _size(rendition, width):
+    return width, round(width / rendition.aspect_ratio)
+
+
+def _cloudinary_url(image, rendition, width):
+    width, height = _size(rendition, width)
+    return image.build_url(
+        width=width,
+        height=height,
+        crop="fill",
+        gravity=rendition.gravity,
+        fetch_format="auto",
+        quality="auto"
+    )
+
+
+def _local_url(file, name, rendition, width):
+    """Resizes a storage file with Pillow, once per rendition width"""
+    from PIL import Image, ImageOps
+
+    storage = file.storage
+    base, _ = posixpath.splitext(file.name)
+    path = posixpath.join(RENDITIONS_DIR, name, str(width), f"{base}.webp")
+    if not storage.exists(path):
+        with storage.open(file.name, "rb") as original:
+            image = ImageOps.exif_transpose(Image.open(original))
+            image = ImageOps.fit(
+                image.convert("RGB"),
+                _size(rendition, width),
+                Image.Resampling.LANCZOS
+            )
+        buffer = BytesIO()
+        image.save(buffer, "WEBP", quality=80)
+        storage.save(path, ContentFile(buffer.getvalue()))
+    return storage.url(path)
+
+
+def _identity(image):
+    """What the rendition URLs of an image depend on"""
+    get_prep_value = getattr(image, "get_prep_value", None)
+    if get_prep_value is not None:
+        return "cloudinary", get_prep_value()
+    return "storage", image.name
+
+
+def rendition_urls(image, name):
+    """((url, width), ...) of a named rendition, smallest first"""
+    try:
+        rendition = RENDITIONS[name]
+    except KeyError:
+        raise ValueError(f"Unknown image rendition {name!r}.") from None
+
+    key = (_identity(image), name)
+    urls = _url_cache.get(key)
+    if urls is None:
+        if len(_url_cache) >= URL_CACHE_SIZE:
+            _url_cache.clear()
+        if key[0][0] == "cloudinary":
+            urls = tuple(
+                (_cloudinary_url(image, rendition, width), width)
+                for width in rendition.widths
+            )
+        else:
+            urls = tuple(
+                (_local_url(image, name, rendition, width), width)
+                for width in rendition.widths
+            )
+        _url_cache[key] = urls
+    return urls
+
+
+def responsive_image(image, name, sizes=None, loading="lazy", **attrs):
+    """<img> of a rendition with srcset, sizes and lazy loading"""
+    urls = rendition_urls(image, name)
+    rendition = RENDITIONS[name]
+    # Fallback src for browsers without srcset: the second smallest
+    src, width = urls[min(1, len(urls) - 1)]
+    attrs.update({
+        "src": src,
+        "srcset": ", ".join(f"{url} {w}w" for url, w in urls),
+        "sizes": sizes or rendition.sizes,
+        "width": width,
+        "height": _size(rendition, width)[1],
+        "loading": loading,
+        "decoding": "async",
+    })
+    return format_html("<img{}>", flatatt(attrs))
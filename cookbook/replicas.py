@@ -0,0 +1,236 @@
+"""Read replicas with read-your-writes stickiness.
+
+Views that only read declare ``read_replica = True``. For their GET and
+HEAD requests ``ReplicaMiddleware`` picks one of the healthy aliases of
+COOKBOOK_READ_REPLICAS and ``ReplicaRouter`` sends the request's reads
+there. Everything else stays on the primary ("default"): writes, reads
+of other views, reads inside a transaction and reads after the request
+has written.
+
+Reads that fill shared caches (pages, facet counts, the suggestion
+index) use ``primary_reads``: the entries record the cache versions of
+after the latest purge, so data read from a lagging replica would be
+stored as fresh.
+
+A request that writes sets a cookie keeping its client on the primary
+for COOKBOOK_REPLICA_PIN_SECONDS, long enough for the replicas to catch
+up, so people see their own comments, favorites and edits at once.
+
+Each process checks a replica at most every
+COOKBOOK_REPLICA_CHECK_INTERVAL seconds. One that cannot be reached or
+is more than COOKBOOK_REPLICA_MAX_LAG seconds behind is skipped until
+the next check; without a healthy replica reads fall back to the
+primary. Without COOKBOOK_READ_REPLICAS nothing is routed.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async
+)
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.connection import ConnectionDoesNotExist
+
+
+PIN_COOKIE = "cookbook_primary"
+# Sessions are read by every request and written by many, replication
+# lag would log people out
+PRIMARY_APPS = {"sessions"}
+
+_state = ContextVar("cookbook_replica_state", default=None)
+# {alias: (checked at, healthy)} of this process
+_health = {}
+
+
+class _State:
+    def __init__(self, alias=None):
+        self.alias = alias
+        self.wrote = False
+
+
+def get_replicas():
+    return list(getattr(settings, "COOKBOOK_READ_REPLICAS", ()))
+
+
+def _pin_seconds():
+    return getattr(settings, "COOKBOOK_REPLICA_PIN_SECONDS", 10)
+
+
+def _check_interval():
+    return getattr(settings, "COOKBOOK_REPLICA_CHECK_INTERVAL", 5)
+
+
+def _max_lag():
+    return getattr(settings, "COOKBOOK_REPLICA_MAX_LAG", 5)
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind its primary"""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        # Local setups (a second alias of the same SQLite file) do not lag
+        return 0.0
+    with connection.cursor() as cursor:
+        # A replica that replayed everything it received is current, no
+        # matter how long ago the primary last wrote
+        cursor.execute(
+            "SELECT CASE WHEN NOT pg_is_in_recovery() "
+            "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+            "THEN 0 ELSE COALESCE(EXTRACT(EPOCH FROM "
+            "now() - pg_last_xact_replay_timestamp()), 0) END"
+        )
+        return float(cursor.fetchone()[0])
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    checked = _health.get(alias)
+    if checked is not None and now - checked[0] < _check_interval():
+        return checked[1]
+    try:
+        healthy = replica_lag(alias) <= _max_lag()
+    except ConnectionDoesNotExist:
+        healthy = False
+    except DatabaseError:
+        healthy = False
+        # Reconnect on the next check rather than reuse a broken link
+        connections[alias].close()
+    _health[alias] = (now, healthy)
+    return healthy
+
+
+def choose_replica(request, view_class):
+    """Replica alias the request may read from, None for the primary"""
+    replicas = get_replicas()
+    if (
+        not replicas
+        or request.method not in ("GET", "HEAD")
+        or not getattr(view_class, "read_replica", False)
+        or PIN_COOKIE in request.COOKIES
+    ):
+        return None
+    healthy = [alias for alias in replicas if is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+@contextmanager
+def read_from(alias):
+    """Routes the reads of the block to ``alias`` (None: the primary)"""
+    token = _state.set(_State(alias))
+    try:
+        yield _state.get()
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Routes the reads of the block to the primary, within the request.
+
+    Unlike ``read_from(None)`` the request keeps its state, so writes in
+    the block still pin its client.
+    """
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    alias, state.alias = state.alias, None
+    try:
+        yield
+    finally:
+        state.alias = alias
+
+
+class ReplicaRouter:
+    """Reads to the replica chosen for the request, the rest to default"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None
+            or state.alias is None
+            or state.wrote
+            or model._meta.app_label in PRIMARY_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return None
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_APPS:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas receive the schema through replication
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Chooses where each request reads from and pins writers"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django would run a sync process_view in a thread
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with read_from(None) as state:
+            response = self.get_response(request)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        # Sync code of the request runs in a copy of this context, which
+        # shares the state object
+        with read_from(None) as state:
+            response = await self.get_response(request)
+        return self.pin(state, response)
+
+    def pin(self, state, response):
+        if state.wrote and get_replicas():
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=_pin_seconds(),
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax"
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.choose(request, view_func)
+
+    async def aprocess_view(self, request, view_func, view_args,
+                            view_kwargs):
+        if get_replicas():
+            # Health checks query the replicas
+            await sync_to_async(self.choose)(request, view_func)
+
+    def choose(self, request, view_func):
+        _state.get().alias = choose_replica(
+            request,
+            getattr(view_func, "view_class", None)
+        )
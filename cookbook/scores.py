@@ -0,0 +1,140 @@
+"""Stored sort keys of recipe listings.
+
+``bayesian_rating`` shrinks a recipe's average rating towards the site
+mean: (C * m + rating_sum) / (C + rating_count), where C is
+COOKBOOK_RATING_PRIOR_WEIGHT and m the mean of all ratings, so a single
+5-star review does not outrank fifty 4.8 ones. Unrated recipes get 0 and
+sort last.
+
+``trending_score`` is log2 of the sum of 2 ** ((t - TRENDING_EPOCH) /
+half-life) over the recipe's creation and each of its comments. Every
+contribution would decay by the same factor over time, so comparing
+these growing sums ranks recipes exactly like decayed scores would,
+while a score only changes when something happens to the recipe. The
+sums themselves would leave float range after about 1024 half-lives,
+their logarithms only grow by one per half-life.
+
+Both are maintained on write (see ``cookbook.signals``) and recomputed
+from scratch by ``refresh_recipe_scores``, which also picks up a new
+site mean.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+import math
+
+from django.db.models import (
+    Avg,
+    Case,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Value,
+    When
+)
+from django.db.models.functions import Greatest, Least, Log, Power
+from django.db.models.lookups import GreaterThan
+
+from .models import Comment, Recipe
+
+
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+DEFAULT_RATING_PRIOR = 3.0
+RATING_PRIOR_KEY = "recipe-scores:rating-prior"
+
+
+def trending_weight(when):
+    """log2 of the contribution of an event at ``when`` to the score"""
+    half_life = getattr(settings, "COOKBOOK_TRENDING_HALF_LIFE_DAYS", 7)
+    elapsed = (when - TRENDING_EPOCH).total_seconds()
+    return elapsed / (half_life * 24 * 60 * 60)
+
+
+def add_trending(*weights):
+    """log2 of the sum of 2 ** weight, without leaving float range"""
+    top = max(weights)
+    return top + math.log2(sum(2.0 ** (weight - top) for weight in weights))
+
+
+def add_trending_expression(score, weight):
+    """Expression adding a weight to a stored trending score"""
+    weight = Value(weight)
+    return ExpressionWrapper(
+        Greatest(score, weight) + Log(
+            Value(2.0),
+            Value(1.0) + Power(
+                Value(2.0),
+                Least(score, weight) - Greatest(score, weight)
+            )
+        ),
+        output_field=FloatField()
+    )
+
+
+def compute_rating_prior():
+    """Mean of all comment ratings, cached for the write path"""
+    prior = Comment.objects.filter(
+        rating__isnull=False
+    ).aggregate(mean=Avg("rating"))["mean"]
+    prior = DEFAULT_RATING_PRIOR if prior is None else prior
+    cache.set(RATING_PRIOR_KEY, prior, None)
+    return prior
+
+
+def rating_prior():
+    prior = cache.get(RATING_PRIOR_KEY)
+    if prior is None:
+        prior = compute_rating_prior()
+    return prior
+
+
+def bayesian_rating(rating_sum, rating_count, prior=None):
+    """Expression computing bayesian_rating from the rating counters"""
+    weight = float(getattr(settings, "COOKBOOK_RATING_PRIOR_WEIGHT", 5))
+    if prior is None:
+        prior = rating_prior()
+    return Case(
+        When(
+            GreaterThan(rating_count, 0),
+            then=ExpressionWrapper(
+                (Value(weight * prior) + rating_sum)
+                / (Value(weight) + rating_count),
+                output_field=FloatField()
+            )
+        ),
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+
+
+def refresh_trending(recipes):
+    """Recomputes the trending scores of a (small) recipe queryset"""
+    weights = {
+        pk: [trending_weight(created_at)]
+        for pk, created_at in recipes.values_list("pk", "created_at")
+    }
+    for recipe_id, created_at in Comment.objects.filter(
+        recipe_id__in=weights
+    ).values_list("recipe_id", "created_at").iterator():
+        weights[recipe_id].append(trending_weight(created_at))
+
+    Recipe.objects.bulk_update(
+        [
+            Recipe(pk=pk, trending_score=add_trending(*recipe_weights))
+            for pk, recipe_weights in weights.items()
+        ],
+        ["trending_score"],
+        batch_size=500
+    )
+    return len(weights)
+
+
+def refresh_scores(recipes, prior=None):
+    """Recomputes both scores of a (small) recipe queryset"""
+    recipes.update(bayesian_rating=bayesian_rating(
+        F("rating_sum"),
+        F("rating_count"),
+        prior
+    ))
+    return refresh_trending(recipes)
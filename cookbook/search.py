@@ -0,0 +1,171 @@
+"""Full-text search backends for recipes.
+
+The index is kept in sync by the database itself (triggers / a generated
+column), which covers ``save()``, ``delete()`` and bulk queryset
+operations alike. PostgreSQL's generated column and GIN index come from
+migration 0012. SQLite's FTS5 table and triggers are installed
+idempotently after every ``migrate`` instead (see ``cookbook.signals``),
+since the table rebuilds of later migrations drop the triggers.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+SEARCH_FIELDS = ("title", "description", "ingredients")
+
+
+def tokenize(query):
+    """Split a raw user query into plain search terms"""
+    return re.findall(r"\w+", query.lower())
+
+
+class SimpleSearchBackend:
+    """Unindexed fallback using icontains lookups"""
+
+    def install(self, using="default"):
+        pass
+
+    def rebuild(self, using="default"):
+        pass
+
+    def search(self, queryset, query, rank=False):
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f"{field}__icontains": query})
+        queryset = queryset.filter(condition)
+        if rank:
+            queryset = queryset.annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            )
+        return queryset
+
+
+class SQLiteSearchBackend(SimpleSearchBackend):
+    """FTS5 external-content table maintained by triggers"""
+    table = "cookbook_recipe_fts"
+    # Column weights for bm25(), in SEARCH_FIELDS order
+    weights = (10.0, 5.0, 1.0)
+
+    def install(self, using="default"):
+        columns = ", ".join(SEARCH_FIELDS)
+        new_values = ", ".join(f"new.{field}" for field in SEARCH_FIELDS)
+        old_values = ", ".join(f"old.{field}" for field in SEARCH_FIELDS)
+        delete_old = (
+            f"INSERT INTO {self.table}({self.table}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values});"
+        )
+        insert_new = (
+            f"INSERT INTO {self.table}(rowid, {columns}) "
+            f"VALUES (new.id, {new_values});"
+        )
+        triggers = {
+            f"{self.table}_ai": f"AFTER INSERT ON cookbook_recipe "
+                                f"BEGIN {insert_new} END",
+            f"{self.table}_ad": f"AFTER DELETE ON cookbook_recipe "
+                                f"BEGIN {delete_old} END",
+            f"{self.table}_au": f"AFTER UPDATE OF {columns} "
+                                f"ON cookbook_recipe "
+                                f"BEGIN {delete_old} {insert_new} END",
+        }
+
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                "AND tbl_name = 'cookbook_recipe'"
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                f"USING fts5({columns}, content='cookbook_recipe', "
+                f"content_rowid='id', "
+                f"tokenize='porter unicode61 remove_diacritics 2')"
+            )
+            missing = triggers.keys() - existing
+            for name in missing:
+                cursor.execute(f"CREATE TRIGGER {name} {triggers[name]}")
+
+        # Triggers are dropped whenever a migration rebuilds the recipe
+        # table, so anything written meanwhile has to be reindexed
+        if missing:
+            self.rebuild(using)
+
+    def rebuild(self, using="default"):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')"
+            )
+
+    def search(self, queryset, query, rank=False):
+        terms = tokenize(query)
+        if not terms:
+            # Nothing to index ("c++", "!!"), match it as typed
+            return super().search(queryset, query, rank)
+
+        # Every term must match, each as a prefix (search as you type)
+        match = " ".join(f'"{term}"*' for term in terms)
+        queryset = queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s",
+            [match]
+        ))
+        if rank:
+            weights = ", ".join(str(weight) for weight in self.weights)
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f"SELECT -bm25({self.table}, {weights}) FROM {self.table} "
+                f"WHERE {self.table} MATCH %s "
+                f"AND {self.table}.rowid = cookbook_recipe.id",
+                [match],
+                output_field=FloatField()
+            ))
+        return queryset
+
+
+class PostgresSearchBackend(SimpleSearchBackend):
+    """Weighted tsvector generated column with a GIN index"""
+    column = "search_vector"
+    # Has to stay in sync with the generated column of migration 0012
+    config = "english"
+
+    def search(self, queryset, query, rank=False):
+        terms = tokenize(query)
+        if not terms:
+            # Nothing to index ("c++", "!!"), match it as typed
+            return super().search(queryset, query, rank)
+
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        queryset = queryset.filter(RawSQL(
+            f"cookbook_recipe.{self.column} @@ "
+            f"to_tsquery('{self.config}', %s)",
+            [tsquery],
+            output_field=BooleanField()
+        ))
+        if rank:
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f"ts_rank_cd(cookbook_recipe.{self.column}, "
+                f"to_tsquery('{self.config}', %s))",
+                [tsquery],
+                output_field=FloatField()
+            ))
+        return queryset
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend(vendor=None):
+    """Backend from COOKBOOK_SEARCH_BACKEND or the database vendor"""
+    path = getattr(settings, "COOKBOOK_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    backend_class = BACKENDS.get(
+        vendor or connection.vendor,
+        SimpleSearchBackend
+    )
+    return backend_class()
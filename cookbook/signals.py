@@ -1,27 +1,440 @@
-import cloudinary.uploader
-from django.db.models.signals import post_delete, pre_save
+from collections import Counter, defaultdict
+
+from django.db import connections
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_save
+)
 from django.dispatch import receiver
+from django.utils import timezone
 
-from .models import Recipe
+from .cache import invalidate_recipe_card, invalidate_recipe_cards
+from .favorites import refresh_favorite_counts
+from .images import queue_image_deletion
+from .ingredients import sync_ingredients
+from .models import User, Category, Recipe, Comment, Tag
+from .pagecache import SITE_TAG, purge_tags
+from . import stats
+from .recommendations import queue_related_update
+from .scores import (
+    add_trending,
+    add_trending_expression,
+    bayesian_rating,
+    refresh_trending,
+    trending_weight
+)
+from .search import get_search_backend
+from .suggest import INDEX_TAG as SUGGESTIONS_TAG
 
 
 @receiver(post_delete, sender=Recipe)
 def photo_delete(sender, instance, **kwargs):
     if instance.image:
-        cloudinary.uploader.destroy(instance.image.public_id)
+        queue_image_deletion(instance.image)
 
 
 @receiver(pre_save, sender=Recipe)
-def photo_delete_on_change(sender, instance, **kwargs):
+def photo_delete_on_change(sender, instance, update_fields=None, **kwargs):
     """Deletes old image from Cloudinary when a new one is uploaded"""
     if not instance.pk:
         return False
+    if update_fields is not None and "image" not in update_fields:
+        return False
 
     try:
-        old_file = Recipe.objects.get(pk=instance.pk).image
-    except Recipe.DoesNotExist:
-        return False
+        old_file = instance.get_loaded_value("image")
+    except KeyError:
+        # Not loaded from the database, the old image is unknown
+        try:
+            old_file = Recipe.objects.only("image").get(pk=instance.pk).image
+        except Recipe.DoesNotExist:
+            return False
 
+    # CloudinaryResource has no __eq__, compare the stored values
+    field = sender._meta.get_field("image")
     new_file = instance.image
-    if old_file and old_file != new_file:
-        cloudinary.uploader.destroy(old_file.public_id)
+    if old_file and (
+        field.get_prep_value(old_file) != field.get_prep_value(new_file)
+    ):
+        queue_image_deletion(old_file)
+
+
+@receiver(pre_save, sender=Recipe)
+def trending_score_on_create(sender, instance, raw=False, **kwargs):
+    """A new recipe starts with the weight of its own creation"""
+    if instance._state.adding and not raw and not instance.trending_score:
+        instance.trending_score = trending_weight(timezone.now())
+
+
+def _comment_stats_delta(rating, created_at, sign=1):
+    """What a single comment contributes to the recipe statistics"""
+    return Counter({
+        "comment_count": sign,
+        "rating_sum": sign * (rating or 0),
+        "rating_count": sign * (rating is not None),
+        # Trending scores are logarithms, they cannot simply be shifted
+        "trending_events": sign,
+    })
+
+
+def _apply_comment_stats_delta(instance, recipe_id, delta):
+    """Shift the stored statistics of a recipe by the given delta.
+
+    Uses F() expressions so concurrent comments don't overwrite each
+    other, and mirrors the change on the recipe cached on the comment.
+    """
+    delta = {field: value for field, value in delta.items() if value}
+    if recipe_id is None or not delta:
+        return
+
+    events = delta.pop("trending_events", 0)
+    updates = {field: F(field) + value for field, value in delta.items()}
+    if events > 0:
+        weight = trending_weight(instance.created_at)
+        updates["trending_score"] = add_trending_expression(
+            F("trending_score"),
+            weight
+        )
+    if "rating_sum" in delta or "rating_count" in delta:
+        updates["bayesian_rating"] = bayesian_rating(
+            updates.get("rating_sum", F("rating_sum")),
+            updates.get("rating_count", F("rating_count"))
+        )
+    # The statistics are part of the recipe's representation, API
+    # clients validate their copies against updated_at
+    updated_at = timezone.now()
+    Recipe.objects.filter(pk=recipe_id).update(
+        updated_at=updated_at,
+        **updates
+    )
+    if events < 0:
+        # Subtracting a power of two loses precision, recount instead
+        refresh_trending(Recipe.objects.filter(pk=recipe_id))
+    if "comment_count" in delta:
+        stats.comment_count_changed(recipe_id, delta["comment_count"])
+    # Listings show the counters too
+    purge_tags("recipes")
+
+    recipe = instance._state.fields_cache.get("recipe")
+    if recipe is not None and recipe.pk == recipe_id:
+        for field, value in delta.items():
+            setattr(recipe, field, getattr(recipe, field) + value)
+        if events > 0:
+            recipe.trending_score = add_trending(
+                recipe.trending_score,
+                weight
+            )
+        elif events < 0:
+            recipe.refresh_from_db(fields=["trending_score"])
+        recipe.updated_at = updated_at
+
+
+@receiver(post_save, sender=Comment)
+def comment_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    """Keeps Recipe rating/comment counters in sync with its comments"""
+    if raw:
+        return
+
+    loaded = getattr(instance, "_loaded_stats", None)
+    if not created and loaded is None:
+        # Saved without being loaded first, the previous state is unknown
+        Recipe.objects.filter(
+            pk=instance.recipe_id
+        ).refresh_comment_stats()
+        return
+
+    deltas = defaultdict(Counter)
+    if not created:
+        old_recipe_id, old_rating = loaded
+        deltas[old_recipe_id].update(
+            _comment_stats_delta(old_rating, instance.created_at, sign=-1)
+        )
+    deltas[instance.recipe_id].update(
+        _comment_stats_delta(instance.rating, instance.created_at)
+    )
+    for recipe_id, delta in deltas.items():
+        _apply_comment_stats_delta(instance, recipe_id, delta)
+
+    instance._loaded_stats = (instance.recipe_id, instance.rating)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_stats_on_delete(sender, instance, origin=None, **kwargs):
+    """Removes a deleted comment from the Recipe counters"""
+    if isinstance(origin, Recipe) and origin.pk == instance.recipe_id:
+        # The recipe itself is being deleted, nothing to keep in sync
+        return
+
+    recipe_id, rating = getattr(
+        instance,
+        "_loaded_stats",
+        (instance.recipe_id, instance.rating)
+    )
+    _apply_comment_stats_delta(
+        instance,
+        recipe_id,
+        _comment_stats_delta(rating, instance.created_at, sign=-1)
+    )
+
+
+@receiver(post_migrate)
+def install_search_index(sender, using="default", **kwargs):
+    """(Re)creates the SQLite full-text index once migrations ran.
+
+    The PostgreSQL search and suggestion structures come from migrations.
+    """
+    if sender.name != "cookbook":
+        return
+
+    connection = connections[using]
+    if Recipe._meta.db_table not in connection.introspection.table_names():
+        return
+    get_search_backend(connection.vendor).install(using)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_card_delete(sender, instance, **kwargs):
+    invalidate_recipe_card(instance)
+
+
+def _new_recipe_versions(recipes):
+    # Related names are part of a recipe's representation, whose API
+    # validators follow updated_at
+    recipes.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Category)
+def recipe_cards_on_category_rename(sender, instance, created, **kwargs):
+    """Cards show the category name, so renames have to drop them"""
+    loaded = getattr(instance, "_loaded_name", None)
+    if not created and loaded != instance.name:
+        invalidate_recipe_cards(instance.recipes.all())
+        _new_recipe_versions(instance.recipes.all())
+    instance._loaded_name = instance.name
+
+
+@receiver(pre_delete, sender=Category)
+def recipe_cards_on_category_delete(sender, instance, **kwargs):
+    # Before SET_NULL runs, which updates the recipes without saving them
+    invalidate_recipe_cards(instance.recipes.all())
+    _new_recipe_versions(instance.recipes.all())
+
+
+@receiver(post_save, sender=User)
+def recipe_cards_on_author_rename(sender, instance, created, **kwargs):
+    """Cards show the author username, so renames have to drop them"""
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "username" not in update_fields:
+        return
+
+    loaded = getattr(instance, "_loaded_username", None)
+    if not created and loaded != instance.username:
+        invalidate_recipe_cards(instance.recipes.all())
+        _new_recipe_versions(instance.recipes.all())
+        # Usernames appear on cards and comments of any page
+        purge_tags(SITE_TAG)
+    instance._loaded_username = instance.username
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_ingredients_on_save(sender, instance, created, raw=False,
+                               update_fields=None, **kwargs):
+    """Re-parses the ingredient rows when the ingredient text changes"""
+    if raw:
+        return
+    if created or update_fields is None or "ingredients" in update_fields:
+        sync_ingredients([(instance.pk, instance.ingredients)])
+
+
+def _schedule_related_update(recipe_ids):
+    # Computed by process_related_updates, off the request
+    if recipe_ids:
+        queue_related_update(recipe_ids)
+
+
+@receiver(post_save, sender=Recipe)
+def related_recipes_on_save(sender, instance, created, raw=False,
+                            update_fields=None, **kwargs):
+    """New recipes and changed ingredient lists get fresh neighbours"""
+    if raw:
+        return
+    if created or update_fields is None or "ingredients" in update_fields:
+        _schedule_related_update([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def related_recipes_on_m2m_change(sender, instance, action, pk_set=None,
+                                  **kwargs):
+    """Tags are a recommendation feature too.
+
+    Favorites are one as well, but only ``rebuild_related`` picks them up
+    (see ``cookbook.favorites``).
+    """
+    if isinstance(instance, Recipe):
+        if action.startswith("post_"):
+            _schedule_related_update([instance.pk])
+    elif action == "pre_clear":
+        # Which recipes are affected is only known before the clear
+        _schedule_related_update(sender.objects.filter(
+            tag_id=instance.pk
+        ).values_list("recipe_id", flat=True))
+    elif action in ("post_add", "post_remove"):
+        _schedule_related_update(pk_set)
+
+
+@receiver(m2m_changed, sender=User.favorite_recipes.through)
+def favorite_count_on_m2m_change(sender, instance, action, pk_set=None,
+                                 **kwargs):
+    """Recounts favorite_count after changes made through the relation.
+
+    ``cookbook.favorites`` writes the table directly and keeps the count
+    itself, this covers the admin and other ``favorite_recipes`` users.
+    """
+    if action == "pre_clear":
+        # Which recipes are affected is only known before the clear
+        if isinstance(instance, Recipe):
+            instance._cleared_favorites = {instance.pk}
+        else:
+            instance._cleared_favorites = set(sender.objects.filter(
+                user_id=instance.pk
+            ).values_list("recipe_id", flat=True))
+        return
+    if action == "post_clear":
+        recipe_ids = instance.__dict__.pop("_cleared_favorites", set())
+    elif action in ("post_add", "post_remove"):
+        recipe_ids = {instance.pk} if isinstance(instance, Recipe) else pk_set
+    else:
+        return
+    if recipe_ids:
+        refresh_favorite_counts(recipe_ids)
+        purge_tags(*(f"recipe:{recipe_id}" for recipe_id in recipe_ids))
+
+
+@receiver(pre_delete, sender=User)
+def favorite_counts_on_user_delete(sender, instance, **kwargs):
+    # The cascade deletes the favorites without m2m_changed
+    instance._deleted_favorites = set(
+        instance.favorite_recipes.values_list("pk", flat=True)
+    )
+
+
+@receiver(post_delete, sender=User)
+def favorite_counts_after_user_delete(sender, instance, **kwargs):
+    recipe_ids = instance.__dict__.pop("_deleted_favorites", set())
+    if recipe_ids:
+        refresh_favorite_counts(recipe_ids)
+        purge_tags(*(f"recipe:{recipe_id}" for recipe_id in recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def site_stats_on_create(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        name = "total_recipes" if sender is Recipe else "total_users"
+        stats.adjust_total(name, 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def site_stats_on_recipe_delete(sender, instance, **kwargs):
+    stats.recipe_removed(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def site_stats_on_user_delete(sender, instance, **kwargs):
+    stats.adjust_total("total_users", -1)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def page_cache_on_recipe_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        purge_tags("recipes", f"recipe:{instance.pk}")
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def page_cache_on_comment_change(sender, instance, raw=False, **kwargs):
+    recipe_ids = {instance.recipe_id}
+    loaded = getattr(instance, "_loaded_stats", None)
+    if loaded is not None:
+        # The comment may have been moved from another recipe
+        recipe_ids.add(loaded[0])
+    if not raw:
+        purge_tags(*(f"recipe:{recipe_id}" for recipe_id in recipe_ids))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def page_cache_on_recipe_tags_change(sender, instance, action, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, Recipe):
+        purge_tags("recipes", "tags", f"recipe:{instance.pk}")
+    else:
+        purge_tags("recipes", "tags")
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_version_on_tags_change(sender, instance, action, pk_set=None,
+                                  **kwargs):
+    """Tags are part of a recipe, changing them makes it a new version"""
+    now = timezone.now()
+    if isinstance(instance, Recipe):
+        if not action.startswith("post_"):
+            return
+        instance.updated_at = now
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    elif action == "pre_clear":
+        # Which recipes are affected is only known before the clear
+        recipes = Recipe.objects.filter(tags=instance)
+    elif action in ("post_add", "post_remove") and pk_set:
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+    else:
+        return
+    recipes.update(updated_at=now)
+
+
+@receiver(post_save, sender=Tag)
+def recipe_versions_on_tag_rename(sender, instance, created, raw=False,
+                                  **kwargs):
+    loaded = getattr(instance, "_loaded_label", None)
+    label = (instance.name, instance.slug)
+    if not created and not raw and loaded != label:
+        _new_recipe_versions(Recipe.objects.filter(tags=instance))
+    instance._loaded_label = label
+
+
+@receiver(pre_delete, sender=Tag)
+def recipe_versions_on_tag_delete(sender, instance, **kwargs):
+    # The cascade deletes the recipe tags without m2m_changed
+    _new_recipe_versions(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def page_cache_on_category_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        purge_tags("categories")
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def page_cache_on_tag_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        purge_tags("tags")
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def suggestions_on_change(sender, instance, raw=False, **kwargs):
+    # Names only, popularity catches up when the index times out
+    if not raw:
+        purge_tags(SUGGESTIONS_TAG)
@@ -0,0 +1,84 @@
+"""Static file collection and serving.
+
+``StaticFilesStorage`` collects the files under content-hashed names
+listed in a manifest, with gzip and brotli copies next to them, and
+only writes what changed since the previous build (see its docstring).
+WhiteNoise serves hashed names with far-future immutable cache headers,
+so repeat visitors do not download them again, and the precompressed
+copies to clients that accept them.
+
+``WhiteNoiseMiddleware`` is WhiteNoise's middleware made async capable.
+WhiteNoise declares itself synchronous only, which under ASGI moves
+every request through a thread and back on its way to the views, static
+or not. Finding a file is a dictionary lookup (a stat with autorefresh,
+in development), done on the event loop just the same.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from whitenoise import middleware
+from whitenoise.compress import brotli_installed
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Hashed, precompressed static files, collected incrementally.
+
+    A hashed name changes with the content, so a hashed file already in
+    STATIC_ROOT is current, and so are its compressed copies: keeping
+    STATIC_ROOT between builds, collectstatic only writes and compresses
+    the files that changed, then deletes those the previous manifest
+    listed and the new one does not. Unhashed copies are not kept.
+    """
+
+    keep_only_hashed_files = True
+
+    def post_process(self, *args, **kwargs):
+        # The storage loads the manifest of the previous build
+        previous = set(self.hashed_files.values())
+        yield from super().post_process(*args, **kwargs)
+        if not kwargs.get("dry_run"):
+            retired = previous - set(self.hashed_files.values())
+            self.delete_files(
+                path
+                for name in retired
+                for path in (name, f"{name}.gz", f"{name}.br")
+            )
+
+    def compress_files(self, paths):
+        # Files that do not compress well have no copies and are retried
+        return super().compress_files([
+            path for path in paths
+            if not all(map(self.exists, self.compressed_names(path)))
+        ])
+
+    @staticmethod
+    def compressed_names(name):
+        """The copies compress_files writes for ``name``"""
+        names = [f"{name}.gz"]
+        if brotli_installed:
+            names.append(f"{name}.br")
+        return names
+
+
+class WhiteNoiseMiddleware(middleware.WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
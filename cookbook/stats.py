@@ -0,0 +1,130 @@
+"""Site-wide homepage aggregates kept in the cache.
+
+The totals and the ids of the most commented recipes are computed once,
+then adjusted from ``cookbook.signals`` after every commit that changes
+them, so the homepage never counts or sorts whole tables. Anything the
+incremental path cannot handle simply drops the key, and the entries
+expire after COOKBOOK_SITE_STATS_TIMEOUT, which bounds any drift; the
+``refresh_site_stats`` command reconciles them on demand. The
+adjustments are made by whichever process commits, so every process has
+to read the same cache.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Recipe, User
+
+
+POPULAR_SIZE = 3
+POPULAR_KEY = "site-stats:popular"
+
+TOTALS = {
+    "total_recipes": Recipe.objects.count,
+    "total_users": User.objects.count,
+}
+
+
+def _timeout():
+    return getattr(settings, "COOKBOOK_SITE_STATS_TIMEOUT", 60 * 60)
+
+
+def _total_key(name):
+    return f"site-stats:{name}"
+
+
+def _compute_popular():
+    return [
+        list(entry) for entry in Recipe.objects
+        .order_by("-comment_count", "-pk")
+        .values_list("pk", "comment_count")[:POPULAR_SIZE]
+    ]
+
+
+def get_total(name):
+    key = _total_key(name)
+    value = cache.get(key)
+    if value is None:
+        value = TOTALS[name]()
+        cache.add(key, value, _timeout())
+    return value
+
+
+def get_popular_ids():
+    entries = cache.get(POPULAR_KEY)
+    if entries is None:
+        entries = _compute_popular()
+        cache.add(POPULAR_KEY, entries, _timeout())
+    return [pk for pk, _ in entries]
+
+
+def get_site_stats():
+    stats = {name: get_total(name) for name in TOTALS}
+    stats["popular_ids"] = get_popular_ids()
+    return stats
+
+
+def refresh_site_stats():
+    """Recomputes every aggregate from the database"""
+    timeout = _timeout()
+    cache.set_many({
+        _total_key(name): count() for name, count in TOTALS.items()
+    }, timeout)
+    cache.set(POPULAR_KEY, _compute_popular(), timeout)
+
+
+def _adjust_total(name, delta):
+    try:
+        cache.incr(_total_key(name), delta)
+    except ValueError:
+        # Not cached, the next read counts from the database
+        pass
+
+
+def adjust_total(name, delta):
+    transaction.on_commit(lambda: _adjust_total(name, delta))
+
+
+def _comment_count_changed(recipe_id, delta):
+    entries = cache.get(POPULAR_KEY)
+    if entries is None:
+        return
+
+    positions = {pk: index for index, (pk, _) in enumerate(entries)}
+    if recipe_id in positions:
+        if delta < 0:
+            # A recipe outside the list might overtake it now
+            cache.delete(POPULAR_KEY)
+            return
+        entries[positions[recipe_id]][1] += delta
+    elif delta > 0:
+        count = Recipe.objects.filter(
+            pk=recipe_id
+        ).values_list("comment_count", flat=True).first()
+        if count is None:
+            return
+        entries.append([recipe_id, count])
+    else:
+        return
+
+    entries.sort(key=lambda entry: (-entry[1], -entry[0]))
+    cache.set(POPULAR_KEY, entries[:POPULAR_SIZE], _timeout())
+
+
+def comment_count_changed(recipe_id, delta):
+    transaction.on_commit(lambda: _comment_count_changed(recipe_id, delta))
+
+
+def comment_counts_refreshed():
+    """Comment counts were recomputed in bulk, the deltas are unknown"""
+    transaction.on_commit(lambda: cache.delete(POPULAR_KEY))
+
+
+def recipe_removed(recipe_id):
+    def remove():
+        _adjust_total("total_recipes", -1)
+        entries = cache.get(POPULAR_KEY)
+        if entries is not None and recipe_id in (pk for pk, _ in entries):
+            cache.delete(POPULAR_KEY)
+
+    transaction.on_commit(remove)
@@ -0,0 +1,380 @@
+"""Search-as-you-type suggestions.
+
+``suggest(query)`` returns the recipe titles, tags, categories and
+ingredient names that what has been typed so far is a prefix of (of the
+whole name or of any word in it, "sou" finds "Tomato soup"), most
+popular first. When the query has no suggestions because of a typo, the
+closest query that does is returned as a "did you mean" hint, with its
+suggestions.
+
+Backends mirror ``cookbook.search``: PostgreSQL answers from trigram
+(pg_trgm) GIN indexes of migration 0015, any other database from
+``MemorySuggestionBackend``. That one keeps a sorted list
+of every word suffix of every name in the process and bisects it, and
+finds typo corrections through a trigram index of the vocabulary. It is
+rebuilt when the "suggestions" cache tag is purged (see
+``cookbook.signals``), which every process sharing the cache notices on
+its next lookup, and at the latest after COOKBOOK_SUGGEST_INDEX_TIMEOUT
+seconds, which refreshes the popularity order.
+
+Both compare names lowercased and without accents, "creme" finds "Crème
+brûlée". ``fold`` also drops punctuation, which PostgreSQL keeps in the
+indexed names: "mac cheese" is a prefix of "Mac & Cheese" in memory
+only, though "chee" finds it on both.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.db import connection, connections, router, transaction
+from django.db.models import (
+    Count,
+    F,
+    FloatField,
+    Func,
+    IntegerField,
+    Q,
+    TextField,
+    Value
+)
+from django.utils.module_loading import import_string
+
+from .models import Category, Recipe, RecipeIngredient, Tag
+from .pagecache import tag_versions
+from .replicas import primary_reads
+
+
+INDEX_TAG = "suggestions"
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Trigram similarity below which a word is not offered as a correction
+MIN_SIMILARITY = 0.3
+
+Suggestion = namedtuple("Suggestion", ["kind", "pk", "label", "weight"])
+Suggestions = namedtuple("Suggestions", ["suggestions", "did_you_mean"])
+
+
+def fold(text):
+    """Lowercase, accent-free form names and queries are compared in"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", text))
+
+
+def trigrams(word):
+    # Padded like pg_trgm, so word starts and ends weigh in
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(first, second):
+    first, second = trigrams(first), trigrams(second)
+    return len(first & second) / len(first | second)
+
+
+def load_suggestions():
+    """Every suggestion the site can make, with its popularity"""
+    suggestions = [
+        Suggestion("recipe", pk, title, weight)
+        for pk, title, weight in Recipe.objects.values_list(
+            "pk",
+            "title",
+            F("favorite_count") + F("comment_count")
+        ).order_by()
+    ]
+    for kind, model in (("tag", Tag), ("category", Category)):
+        suggestions.extend(
+            Suggestion(kind, pk, name, weight)
+            for pk, name, weight in model.objects.values_list(
+                "pk",
+                "name",
+                Count("recipes")
+            ).order_by()
+        )
+    suggestions.extend(
+        Suggestion("ingredient", None, name, weight)
+        for name, weight in RecipeIngredient.objects
+        .order_by()
+        .values("name")
+        .annotate(weight=Count("recipe_id", distinct=True))
+        .values_list("name", "weight")
+    )
+    return suggestions
+
+
+class SuggestionIndex:
+    """Sorted word suffixes of every suggestion plus a trigram index"""
+
+    def __init__(self, suggestions):
+        self.suggestions = suggestions
+        keys = []
+        vocabulary = set()
+        for position, suggestion in enumerate(suggestions):
+            words = fold(suggestion.label).split()
+            vocabulary.update(words)
+            for start in range(len(words)):
+                # Matches of the whole name rank before those of a word
+                keys.append((" ".join(words[start:]), start > 0, position))
+        keys.sort()
+        self.keys = [key for key, _, _ in keys]
+        self.refs = [(later, position) for _, later, position in keys]
+
+        # Numbers ("Pancakes #2") make no spelling corrections
+        self.words = sorted(
+            word for word in vocabulary if not word.isdigit()
+        )
+        self.trigrams = defaultdict(list)
+        for word in self.words:
+            for trigram in trigrams(word):
+                self.trigrams[trigram].append(word)
+
+    def lookup(self, query, limit):
+        query = fold(query)
+        if not query:
+            return []
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + "\U0010ffff", start)
+
+        def rank(ref):
+            later, position = ref
+            return not later, self.suggestions[position].weight
+
+        found, seen = [], set()
+        for _, position in heapq.nlargest(
+            limit * 4, self.refs[start:end], key=rank
+        ):
+            if position not in seen:
+                seen.add(position)
+                found.append(self.suggestions[position])
+        return found[:limit]
+
+    def is_prefix(self, word):
+        index = bisect_left(self.words, word)
+        return index < len(self.words) and self.words[index].startswith(word)
+
+    def correct(self, word):
+        """The most similar known word, or None"""
+        counts = defaultdict(int)
+        for trigram in trigrams(word):
+            for candidate in self.trigrams.get(trigram, ()):
+                counts[candidate] += 1
+        best, best_score = None, MIN_SIMILARITY
+        size = len(trigrams(word))
+        for candidate, common in counts.items():
+            score = common / (size + len(trigrams(candidate)) - common)
+            if score > best_score:
+                best, best_score = candidate, score
+        return best
+
+
+class SuggestionBackend:
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        raise NotImplementedError
+
+    async def asuggest(self, query, limit=DEFAULT_LIMIT):
+        return await sync_to_async(self.suggest)(query, limit)
+
+
+class MemorySuggestionBackend(SuggestionBackend):
+    """In-process index, rebuilt when the suggestions tag is purged"""
+    _index = None
+    _version = None
+    _built_at = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def _timeout(cls):
+        return getattr(settings, "COOKBOOK_SUGGEST_INDEX_TIMEOUT", 60 * 60)
+
+    @classmethod
+    def get_index(cls, rebuild=True):
+        """The current index; None if it is out of date and not ``rebuild``"""
+        version = tag_versions([INDEX_TAG])[INDEX_TAG]
+        index = cls._index
+        if (
+            index is not None and cls._version == version
+            and time.monotonic() - cls._built_at < cls._timeout()
+        ):
+            return index
+        if not rebuild:
+            return None
+        with cls._lock:
+            if cls._index is index:
+                # Kept for up to an hour, read it without replication lag
+                with primary_reads():
+                    suggestions = load_suggestions()
+                cls._index = SuggestionIndex(suggestions)
+                cls._version = version
+                cls._built_at = time.monotonic()
+            return cls._index
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        return self._suggest(self.get_index(), query, limit)
+
+    async def asuggest(self, query, limit=DEFAULT_LIMIT):
+        # Lookups stay on the event loop, a rebuild reads the database
+        index = self.get_index(rebuild=False)
+        if index is None:
+            index = await sync_to_async(self.get_index)()
+        return self._suggest(index, query, limit)
+
+    def _suggest(self, index, query, limit):
+        found = index.lookup(query, limit)
+        if found:
+            return Suggestions(found, None)
+
+        # Full words may be misspelled, the last one may still be typed
+        words = fold(query).split()
+        corrected = [
+            word if len(word) < 3 or index.is_prefix(word)
+            else index.correct(word) or word
+            for word in words
+        ]
+        if corrected == words:
+            return Suggestions([], None)
+        did_you_mean = " ".join(corrected)
+        found = index.lookup(did_you_mean, limit)
+        return Suggestions(found, did_you_mean if found else None)
+
+
+class _WordSimilarity(Func):
+    function = "word_similarity"
+    output_field = FloatField()
+
+
+class _Fold(Func):
+    # lower(unaccent()), created by migration 0015 with the indexes
+    function = "cookbook_fold"
+    output_field = TextField()
+
+
+class PostgresSuggestionBackend(SuggestionBackend):
+    """Prefix and similarity matches through pg_trgm GIN indexes"""
+    # (model, name column, kind)
+    sources = (
+        (Recipe, "title", "recipe"),
+        (Tag, "name", "tag"),
+        (Category, "name", "category"),
+        (RecipeIngredient, "name", "ingredient"),
+    )
+
+    def _rows(self, model, column, kind, filter_folded, limit):
+        """Top rows of one source, as (kind, pk, label, weight)"""
+        queryset = model.objects.annotate(folded=_Fold(column))
+        queryset, order = filter_folded(queryset)
+        if model is RecipeIngredient:
+            return (queryset
+                    .values("name")
+                    .annotate(weight=Count("recipe_id", distinct=True))
+                    .values_list(
+                        Value(kind),
+                        Value(None, output_field=IntegerField()),
+                        "name",
+                        "weight"
+                    )
+                    .order_by(order, "-weight")[:limit])
+        if model is Recipe:
+            weight = F("favorite_count") + F("comment_count")
+        else:
+            weight = Count("recipes")
+        return (queryset
+                .annotate(weight=weight)
+                .values_list(Value(kind), "pk", column, "weight")
+                .order_by(order, "-weight")[:limit])
+
+    def _union(self, filter_folded, limit):
+        parts = [
+            self._rows(model, column, kind, filter_folded, limit)
+            for model, column, kind in self.sources
+        ]
+        return [
+            Suggestion(*row)
+            for row in parts[0].union(*parts[1:], all=True)
+        ]
+
+    def _lookup(self, query, limit):
+        def starts_with(queryset):
+            # LIKE patterns are answered from the trigram indexes
+            queryset = queryset.annotate(
+                whole=Q(folded__startswith=query)
+            ).filter(Q(whole=True) | Q(folded__contains=f" {query}"))
+            return queryset, "-whole"
+
+        found = self._union(starts_with, limit)
+        found.sort(key=lambda suggestion: (
+            not fold(suggestion.label).startswith(query),
+            -suggestion.weight
+        ))
+        return found[:limit]
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        query = fold(query)
+        if not query:
+            return Suggestions([], None)
+        found = self._lookup(query, limit)
+        if found or len(query) < 3:
+            return Suggestions(found, None)
+
+        def similar(queryset):
+            # %> is answered from the trigram indexes, a comparison of
+            # word_similarity() has to compute it for every row
+            queryset = queryset.filter(
+                TrigramWordSimilar(F("folded"), Value(query))
+            ).annotate(similarity=_WordSimilarity(Value(query), "folded"))
+            return queryset, "-similarity"
+
+        # The name most similar to the query, then its own suggestions
+        alias = router.db_for_read(Recipe)
+        with (
+            transaction.atomic(using=alias),
+            connections[alias].cursor() as cursor
+        ):
+            # The threshold of %>, for this transaction only
+            cursor.execute(
+                "SELECT set_config("
+                "'pg_trgm.word_similarity_threshold', %s, true)",
+                [str(MIN_SIMILARITY)]
+            )
+            candidates = self._union(similar, 1)
+        if not candidates:
+            return Suggestions([], None)
+        best = max(
+            candidates,
+            key=lambda suggestion: similarity(query, fold(suggestion.label))
+        )
+        did_you_mean = fold(best.label)
+        return Suggestions(self._lookup(did_you_mean, limit), did_you_mean)
+
+
+BACKENDS = {
+    "postgresql": PostgresSuggestionBackend,
+}
+
+
+def get_suggestion_backend(vendor=None):
+    """Backend from COOKBOOK_SUGGEST_BACKEND or the database vendor"""
+    path = getattr(settings, "COOKBOOK_SUGGEST_BACKEND", None)
+    if path:
+        return import_string(path)()
+    backend_class = BACKENDS.get(
+        vendor or connection.vendor,
+        MemorySuggestionBackend
+    )
+    return backend_class()
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    """Suggestions(suggestions, did_you_mean) for a partial query"""
+    return get_suggestion_backend().suggest(query, limit)
+
+
+async def asuggest(query, limit=DEFAULT_LIMIT):
+    """``suggest`` for async views"""
+    return await get_suggestion_backend().asuggest(query, limit)
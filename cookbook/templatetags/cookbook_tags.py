@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from cookbook.cache import render_recipe_card
+from cookbook.renditions import responsive_image as render_responsive_image
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def recipe_card(recipe):
+    """Renders includes/recipe_card.html through the card cache"""
+    return mark_safe(render_recipe_card(recipe))
+
+
+@register.simple_tag
+def responsive_image(image, rendition, **attrs):
+    """{% responsive_image recipe.image "card" alt=recipe.title %}"""
+    return render_responsive_image(image, rendition, **attrs)
@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cookbook.models import Category, Comment, Recipe, Tag
+from cookbook.querybudget import QueryBudgetTestMixin
+
+
+User = get_user_model()
+
+
+@override_settings(STORAGES={
+    "default": {
+        "BACKEND": "django.core.files.storage.InMemoryStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+})
+class AdminTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            password="password123"
+        )
+        self.client.force_login(self.admin)
+        self.soups = Category.objects.create(name="Soups")
+        Category.objects.create(name="Desserts")
+        self.quick = Tag.objects.create(name="Quick", slug="quick")
+        self.recipes = []
+        for i in range(5):
+            user = User.objects.create_user(username=f"chef{i}")
+            recipe = Recipe.objects.create(
+                title=f"Soup {i}",
+                author=user,
+                category=self.soups,
+                cooking_time=10,
+                description="Soup",
+                ingredients="Water",
+                instructions="Boil"
+            )
+            recipe.tags.add(self.quick)
+            Comment.objects.create(
+                recipe=recipe,
+                author=user,
+                content="Good",
+                rating=5 - i
+            )
+            self.recipes.append(recipe)
+
+    def changelist(self, model, **params):
+        with self.assertMaxQueries(10) as recorder:
+            response = self.client.get(
+                reverse(f"admin:cookbook_{model}_changelist"),
+                params
+            )
+        self.assertNoNPlusOne(recorder)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_category_counts(self):
+        response = self.changelist("category", o="-2")
+        self.assertEqual(
+            [
+                (category.name, category._recipe_count)
+                for category in response.context["cl"].result_list
+            ],
+            [("Soups", 5), ("Desserts", 0)]
+        )
+
+    def test_tag_counts(self):
+        response = self.changelist("tag")
+        self.assertEqual(
+            response.context["cl"].result_list[0]._recipe_count,
+            5
+        )
+
+    def test_recipe_changelist_sorts_by_rating(self):
+        response = self.changelist("recipe", o="-8")
+        self.assertEqual(
+            list(response.context["cl"].result_list),
+            self.recipes
+        )
+        self.assertContains(response, "chef0")
+
+    def test_comment_changelist(self):
+        response = self.changelist("comment")
+        self.assertContains(response, "Soup 4")
+
+    def test_comment_inline_is_paginated(self):
+        recipe = self.recipes[0]
+        Comment.objects.bulk_create([
+            Comment(recipe=recipe, author=self.admin, content=f"#{i}")
+            for i in range(45)
+        ])
+        url = reverse("admin:cookbook_recipe_change", args=[recipe.pk])
+
+        with self.assertMaxQueries(15) as recorder:
+            response = self.client.get(url)
+        self.assertNoNPlusOne(recorder)
+        self.assertEqual(response.status_code, 200)
+        formset = response.context["inline_admin_formsets"][0].formset
+        self.assertEqual(len(formset.forms), 20)
+        self.assertContains(response, "Comments 1&ndash;20 of 46")
+
+        response = self.client.get(url, {"comments_page": 3})
+        formset = response.context["inline_admin_formsets"][0].formset
+        self.assertEqual(len(formset.forms), 6)
+        self.assertContains(response, "Comments 41&ndash;46 of 46")
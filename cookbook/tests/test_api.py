@@ -0,0 +1,231 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from cookbook.models import Category, Comment, Recipe, Tag
+
+
+User = get_user_model()
+
+
+class RecipeAPITests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.category = Category.objects.create(name="Desserts")
+        self.tag = Tag.objects.create(name="Sweet", slug="sweet")
+        self.recipes = []
+        for i in range(14):
+            recipe = Recipe.objects.create(
+                title=f"Cake {i}",
+                author=self.user,
+                category=self.category,
+                cooking_time=30,
+                description="Cake",
+                ingredients="Flour",
+                instructions="Bake"
+            )
+            recipe.tags.add(self.tag)
+            self.recipes.append(recipe)
+        self.recipe = self.recipes[0]
+        self.detail_url = reverse(
+            "cookbook:api-recipe-detail",
+            args=[self.recipe.pk]
+        )
+
+    def test_detail(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["title"], "Cake 0")
+        self.assertEqual(data["author"], {"id": self.user.pk,
+                                          "username": "chef"})
+        self.assertEqual(data["category"]["name"], "Desserts")
+        self.assertEqual(data["tags"][0]["slug"], "sweet")
+        self.assertIsNone(data["average_rating"])
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+
+    def test_sparse_fieldsets(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                self.detail_url,
+                {"fields": "id,title"}
+            )
+        self.assertEqual(response.json(), {"id": self.recipe.pk,
+                                           "title": "Cake 0"})
+
+        response = self.client.get(self.detail_url, {"fields": "id,secret"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Unknown fields: secret"})
+
+    def test_detail_conditional_get(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.detail_url,
+                headers={"if-none-match": etag}
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        Comment.objects.create(
+            recipe=self.recipe,
+            author=self.user,
+            content="Yum",
+            rating=5
+        )
+        response = self.client.get(
+            self.detail_url,
+            headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["average_rating"], 5.0)
+
+    def test_tag_changes_are_new_versions(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        self.recipe.tags.remove(self.tag)
+        response = self.client.get(
+            self.detail_url,
+            headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["tags"], [])
+
+        etag = response["ETag"]
+        other = Recipe.objects.get(pk=self.recipes[1].pk)
+        other_url = reverse("cookbook:api-recipe-detail", args=[other.pk])
+        other_etag = self.client.get(other_url)["ETag"]
+        self.tag.recipes.clear()
+        response = self.client.get(
+            other_url,
+            headers={"if-none-match": other_etag}
+        )
+        self.assertEqual(response.json()["tags"], [])
+
+    def test_renamed_names_are_new_versions(self):
+        url = reverse("cookbook:api-recipe-list")
+        list_etag = self.client.get(url)["ETag"]
+        response = self.client.get(self.detail_url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+
+        # Last-Modified has a resolution of seconds
+        later = timezone.now() + timedelta(minutes=1)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            self.category.name = "Cakes"
+            self.category.save()
+        response = self.client.get(
+            self.detail_url,
+            headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["category"]["name"], "Cakes")
+        response = self.client.get(
+            self.detail_url,
+            headers={"if-modified-since": last_modified}
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, headers={"if-none-match": list_etag})
+        self.assertEqual(response.status_code, 200)
+
+        for instance, field, name in (
+            (self.user, "username", "pastry-chef"),
+            (self.tag, "name", "Sugary"),
+        ):
+            etag = self.client.get(self.detail_url)["ETag"]
+            setattr(instance, field, name)
+            instance.save()
+            response = self.client.get(
+                self.detail_url,
+                headers={"if-none-match": etag}
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["author"]["username"], "pastry-chef")
+        self.assertEqual(response.json()["tags"][0]["name"], "Sugary")
+
+    def test_validators_come_from_the_database(self):
+        response = self.client.get(self.detail_url)
+        # As another process with its own cache would see them
+        cache.clear()
+        response = self.client.get(
+            self.detail_url,
+            headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_if_modified_since(self):
+        last_modified = self.client.get(self.detail_url)["Last-Modified"]
+        response = self.client.get(
+            self.detail_url,
+            headers={"if-modified-since": last_modified}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_recipe(self):
+        response = self.client.get(
+            reverse("cookbook:api-recipe-detail", args=[0])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_uses_listing_filters_and_pages(self):
+        url = reverse("cookbook:api-recipe-list")
+        response = self.client.get(url, {"fields": "title"})
+        data = response.json()
+        self.assertEqual(data["count"], 14)
+        self.assertEqual(len(data["results"]), 12)
+        self.assertEqual(data["results"][0], {"title": "Cake 13"})
+        self.assertIn("page=2", data["next"])
+        self.assertIsNone(data["previous"])
+
+        response = self.client.get(data["next"])
+        self.assertEqual(
+            [recipe["title"] for recipe in response.json()["results"]],
+            ["Cake 1", "Cake 0"]
+        )
+
+        response = self.client.get(url, {"query": "Cake 7", "fields": "id"})
+        self.assertIn(
+            {"id": self.recipes[7].pk},
+            response.json()["results"]
+        )
+
+    def test_list_conditional_get(self):
+        url = reverse("cookbook:api-recipe-list")
+        etag = self.client.get(url)["ETag"]
+
+        # Page and count, but no tags and no serialization
+        with self.assertNumQueries(2):
+            response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.recipes[-1].title = "Renamed"
+        self.recipes[-1].save()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_categories_and_tags(self):
+        response = self.client.get(reverse("cookbook:api-category-list"))
+        self.assertEqual(response.json(), [{
+            "id": self.category.pk,
+            "name": "Desserts",
+            "description": "",
+            "recipe_count": 14,
+        }])
+        response = self.client.get(
+            reverse("cookbook:api-tag-list"),
+            headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["slug"], "sweet")
+
+        response = self.client.get(
+            reverse("cookbook:api-tag-list"),
+            headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
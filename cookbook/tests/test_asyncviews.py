@@ -0,0 +1,172 @@
+import importlib
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import clear_url_caches, resolve, reverse
+
+import cookbook.urls
+from cookbook.asyncviews import AsyncRecipeDetailView, AsyncRecipeListView
+from cookbook.models import Category, Comment, RelatedRecipe, Recipe, Tag
+
+
+User = get_user_model()
+
+
+def reload_urls():
+    # cookbook.urls picks the views when it is imported, and the project
+    # URLconf keeps the patterns it included
+    importlib.reload(cookbook.urls)
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@override_settings(COOKBOOK_ASYNC_VIEWS=True)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Registered first so it runs last, once the setting is restored
+        cls.addClassCleanup(reload_urls)
+        super().setUpClass()
+        reload_urls()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.soups = Category.objects.create(name="Soups")
+        self.quick = Tag.objects.create(name="Quick", slug="quick")
+        self.recipes = []
+        for number in range(14):
+            recipe = Recipe.objects.create(
+                title=f"Soup {number}",
+                author=self.user,
+                category=self.soups,
+                cooking_time=10 + number,
+                description="Soup",
+                ingredients="Water",
+                instructions="Boil"
+            )
+            recipe.tags.add(self.quick)
+            self.recipes.append(recipe)
+        self.recipe = self.recipes[0]
+        RelatedRecipe.objects.create(
+            recipe=self.recipe,
+            related=self.recipes[1],
+            score=0.9
+        )
+        Comment.objects.create(
+            recipe=self.recipe,
+            author=self.user,
+            content="Tasty"
+        )
+        self.user.favorite_recipes.add(self.recipe)
+
+    def test_read_views_are_async(self):
+        for url, view_class in (
+            (reverse("cookbook:recipe-list"), AsyncRecipeListView),
+            (
+                reverse("cookbook:recipe-detail", args=[self.recipe.pk]),
+                AsyncRecipeDetailView
+            ),
+        ):
+            view = resolve(url).func
+            self.assertIs(view.view_class, view_class)
+            self.assertTrue(iscoroutinefunction(view))
+
+    async def test_listing(self):
+        url = reverse("cookbook:recipe-list")
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(url, {"tag": self.quick.pk})
+        self.assertEqual(response.status_code, 200)
+        recipes = response.context["recipes"]
+        self.assertEqual(len(recipes), 12)
+        self.assertEqual(response.context["paginator"].count, 14)
+        self.assertEqual(
+            [recipe.is_favorite for recipe in recipes],
+            [recipe == self.recipe for recipe in recipes]
+        )
+        self.assertEqual(response.context["tags"][0].count, 14)
+
+        response = await self.async_client.get(url, {"page": "last"})
+        self.assertEqual(len(response.context["recipes"]), 2)
+        response = await self.async_client.get(url, {"page": 3})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_detail(self):
+        url = reverse("cookbook:recipe-detail", args=[self.recipe.pk])
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["recipe"], self.recipe)
+        self.assertTrue(response.context["is_favorite"])
+        self.assertEqual(
+            [comment.content for comment in response.context["comments"]],
+            ["Tasty"]
+        )
+        self.assertEqual(
+            response.context["related_recipes"],
+            [self.recipes[1]]
+        )
+        # The queries of the sync view, in one gather
+        self.assertEqual(response["X-Query-Count"], "6")
+
+        response = await self.async_client.get(
+            reverse("cookbook:recipe-detail", args=[0])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(COOKBOOK_PAGE_CACHE=True)
+    async def test_page_cache(self):
+        url = reverse("cookbook:recipe-detail", args=[self.recipe.pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response["X-Page-Cache"], "miss")
+        response = await self.async_client.get(url)
+        self.assertEqual(response["X-Page-Cache"], "hit")
+        self.assertEqual(response["X-Query-Count"], "0")
+
+    async def test_api(self):
+        response = await self.async_client.get(
+            reverse("cookbook:api-recipe-list"),
+            {"fields": "id,tags"}
+        )
+        data = response.json()
+        self.assertEqual(data["count"], 14)
+        self.assertEqual(len(data["results"]), 12)
+        self.assertEqual(
+            data["results"][0]["tags"],
+            [{"id": self.quick.pk, "name": "Quick", "slug": "quick"}]
+        )
+
+        url = reverse("cookbook:api-recipe-detail", args=[self.recipe.pk])
+        response = await self.async_client.get(url, {"fields": "title"})
+        self.assertEqual(response.json(), {"title": "Soup 0"})
+        response = await self.async_client.get(
+            url,
+            {"fields": "title"},
+            headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(COOKBOOK_CURSOR_PAGINATION=True)
+    async def test_api_cursor_pagination(self):
+        url = reverse("cookbook:api-recipe-list")
+        data = (await self.async_client.get(url, {"fields": "id"})).json()
+        second = (await self.async_client.get(data["next"])).json()
+        self.assertEqual(
+            len({row["id"] for row in data["results"] + second["results"]}),
+            14
+        )
+        self.assertIsNone(second["next"])
+
+    async def test_suggestions_from_memory(self):
+        url = reverse("cookbook:api-suggest")
+        await self.async_client.get(url, {"q": "sou"})
+        response = await self.async_client.get(url, {"q": "soup 1"})
+        self.assertEqual(response["X-Query-Count"], "0")
+        self.assertEqual(
+            [row["label"] for row in response.json()["suggestions"]][:2],
+            ["Soup 1", "Soup 10"]
+        )
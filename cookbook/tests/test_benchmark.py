@@ -0,0 +1,137 @@
+import copy
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from cookbook.benchmark import (
+    benchmark,
+    benchmark_cases,
+    compare,
+    flush,
+    seed
+)
+from cookbook.models import Comment, Recipe, User
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.counts = seed(
+            users=4,
+            recipes=15,
+            comments=30,
+            favorites=10,
+            categories=2,
+            tags=3,
+            batch_size=7
+        )
+
+    def test_seed(self):
+        self.assertEqual(self.counts, {
+            "users": 4,
+            "recipes": 15,
+            "comments": 30,
+            "favorites": 10,
+        })
+        self.assertEqual(
+            sum(Recipe.objects.values_list("comment_count", flat=True)),
+            30
+        )
+        self.assertEqual(
+            sum(Recipe.objects.values_list("favorite_count", flat=True)),
+            10
+        )
+        # Backdated rather than all stamped with the insert time
+        self.assertGreater(
+            Comment.objects.values("created_at").distinct().count(),
+            1
+        )
+        with self.assertRaises(ValueError):
+            seed(users=1, recipes=1)
+
+    def test_seed_without_recipes(self):
+        flush()
+        counts = seed(users=2, recipes=0, comments=5, favorites=5)
+        self.assertEqual(counts, {
+            "users": 2,
+            "recipes": 0,
+            "comments": 0,
+            "favorites": 0,
+        })
+
+    def test_seed_is_reproducible(self):
+        first = list(Recipe.objects.order_by("pk").values_list(
+            "title", "author__username", "comment_count"
+        ))
+        flush()
+        self.assertFalse(User.objects.exists())
+        seed(
+            users=4,
+            recipes=15,
+            comments=30,
+            favorites=10,
+            categories=2,
+            tags=3,
+            batch_size=7
+        )
+        second = list(Recipe.objects.order_by("pk").values_list(
+            "title", "author__username", "comment_count"
+        ))
+        self.assertEqual(first, second)
+
+    def test_cases_cover_every_url(self):
+        cases, user = benchmark_cases()
+        names = {case.url_name for case in cases}
+        self.assertIn("cookbook:recipe-detail", names)
+        self.assertIn("cookbook:api-tag-list", names)
+        self.assertIn("accounts:profile", names)
+        methods = {case.url_name: case.method for case in cases}
+        self.assertEqual(methods["cookbook:toggle-favorite"], "post")
+        self.assertEqual(methods["accounts:logout"], "post")
+        # Login required pages are only measured logged in
+        visitors = {
+            case.user for case in cases
+            if case.url_name == "accounts:profile"
+        }
+        self.assertEqual(visitors, {"user"})
+        # The author of the busiest recipe, so its edit pages are allowed
+        self.assertEqual(
+            user,
+            Recipe.objects.order_by("-comment_count", "pk").first().author
+        )
+
+    def test_benchmark_and_compare(self):
+        comments = Comment.objects.count()
+        results = benchmark(repeat=2, warmup=0)
+        # POSTs are rolled back
+        self.assertEqual(Comment.objects.count(), comments)
+
+        detail = results["results"]["GET cookbook:recipe-detail [user]"]
+        self.assertEqual(detail["status"], 200)
+        self.assertGreater(detail["queries"], 0)
+        self.assertFalse(detail["over_budget"])
+        self.assertEqual(
+            results["results"]["POST cookbook:add-comment"]["status"],
+            302
+        )
+        self.assertEqual(results["meta"]["rows"]["recipes"], 15)
+        self.assertEqual(compare(results, results), [])
+
+        slower = copy.deepcopy(results)
+        case = slower["results"]["GET cookbook:index [anonymous]"]
+        case["queries"] += 1
+        case["latency_ms"]["median"] = (
+            case["latency_ms"]["median"] * 2 + 10
+        )
+        regressions = compare(results, slower)
+        self.assertEqual(
+            {regression.metric for regression in regressions},
+            {"queries", "median_ms"}
+        )
+        # Within tolerance, or below the noise floor
+        case["queries"] -= 1
+        case["latency_ms"]["median"] = (
+            results["results"]["GET cookbook:index [anonymous]"]
+            ["latency_ms"]["median"] + 1
+        )
+        self.assertEqual(compare(results, slower), [])
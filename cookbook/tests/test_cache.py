@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from cookbook.cache import card_cache_stats, render_recipe_card
+from cookbook.models import Recipe, Category, Comment
+
+
+User = get_user_model()
+
+
+class RecipeCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        card_cache_stats.clear()
+        self.user = User.objects.create_user(
+            username="chef",
+            password="password123"
+        )
+        self.category = Category.objects.create(name="Desserts")
+        self.recipe = Recipe.objects.create(
+            title="Cake",
+            description="Sweet",
+            ingredients="Flour",
+            instructions="Bake it",
+            cooking_time=30,
+            author=self.user,
+            category=self.category
+        )
+
+    def render(self):
+        recipe = Recipe.objects.select_related(
+            "author", "category"
+        ).get(pk=self.recipe.pk)
+        return render_recipe_card(recipe)
+
+    def test_second_render_is_a_cache_hit(self):
+        html = self.render()
+        self.assertIn("Cake", html)
+        self.assertEqual(self.render(), html)
+        self.assertEqual(card_cache_stats, {"hits": 1, "misses": 1})
+
+    def test_rating_change_renders_a_new_card(self):
+        self.render()
+        Comment.objects.create(
+            recipe=self.recipe,
+            author=self.user,
+            content="Great",
+            rating=5
+        )
+        self.assertIn("fa-star", self.render())
+        self.assertEqual(card_cache_stats["misses"], 2)
+
+    def test_category_and_author_renames_invalidate_cards(self):
+        self.render()
+        category = Category.objects.get(pk=self.category.pk)
+        category.name = "Sweets"
+        category.save()
+        self.assertIn("Sweets", self.render())
+
+        user = User.objects.get(pk=self.user.pk)
+        user.username = "pastry_chef"
+        user.save()
+        self.assertIn("pastry_chef", self.render())
+        self.assertEqual(card_cache_stats["hits"], 0)
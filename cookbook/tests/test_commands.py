@@ -0,0 +1,228 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from cookbook.models import (
+    Recipe,
+    Comment,
+    RecipeIngredient,
+    RelatedRecipe,
+    RelatedRecipeUpdate,
+    Tag
+)
+
+
+User = get_user_model()
+
+
+class CommandTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="chef",
+            password="password123"
+        )
+        self.recipe = Recipe.objects.create(
+            title="Soup",
+            description="Hot soup",
+            ingredients="Water",
+            instructions="Boil it",
+            cooking_time=10,
+            author=self.user
+        )
+
+    def test_rebuild_recipe_stats(self):
+        Comment.objects.create(
+            recipe=self.recipe,
+            author=self.user,
+            content="Tasty",
+            rating=4
+        )
+        Recipe.objects.update(rating_sum=0, rating_count=0, comment_count=0)
+
+        call_command("rebuild_recipe_stats", batch_size=1, stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.comment_count, 1)
+        self.assertEqual(self.recipe.average_rating, 4.0)
+
+    def test_rebuild_related_recipes(self):
+        Recipe.objects.create(
+            title="Cold soup",
+            description="Cold soup",
+            ingredients="Water, cucumber",
+            instructions="Chill it",
+            cooking_time=5,
+            author=self.user
+        )
+        out = StringIO()
+        call_command("rebuild_related_recipes", top=1, stdout=out)
+
+        self.assertEqual(RelatedRecipe.objects.count(), 2)
+        self.assertIn("Stored 2 related recipe pairs", out.getvalue())
+        # The rebuild covers what was queued before it
+        self.assertFalse(RelatedRecipeUpdate.objects.exists())
+
+    def test_process_related_updates(self):
+        cold_soup = Recipe.objects.create(
+            title="Cold soup",
+            description="Cold soup",
+            ingredients="Water, cucumber",
+            instructions="Chill it",
+            cooking_time=5,
+            author=self.user
+        )
+        soups = Tag.objects.create(name="Soups", slug="soups")
+        for recipe in (self.recipe, cold_soup):
+            recipe.tags.add(soups)
+        self.assertEqual(RelatedRecipeUpdate.objects.count(), 2)
+        out = StringIO()
+        call_command("process_related_updates", batch_size=1, stdout=out)
+
+        self.assertFalse(RelatedRecipeUpdate.objects.exists())
+        self.assertEqual(
+            list(cold_soup.neighbors.values_list("related_id", flat=True)),
+            [self.recipe.pk]
+        )
+        self.assertIn("related recipes of 2 recipes", out.getvalue())
+
+    def test_backfill_ingredients(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            ingredients="2 l water\n1 onion"
+        )
+        out = StringIO()
+        call_command("backfill_ingredients", batch_size=1, stdout=out)
+
+        self.assertEqual(
+            list(RecipeIngredient.objects.values_list("name", "unit")),
+            [("water", "l"), ("onion", "")]
+        )
+        self.assertIn("Parsed 2 ingredients of 1 recipes", out.getvalue())
+
+    def test_refresh_site_stats(self):
+        cache.clear()
+        out = StringIO()
+        call_command("refresh_site_stats", stdout=out)
+        self.assertIn("1 recipes, 1 users", out.getvalue())
+        self.assertEqual(cache.get("site-stats:total_recipes"), 1)
+
+    def test_refresh_recipe_scores(self):
+        Comment.objects.create(
+            recipe=self.recipe,
+            author=self.user,
+            content="Good",
+            rating=4
+        )
+        Recipe.objects.update(bayesian_rating=0, trending_score=0)
+        out = StringIO()
+        call_command("refresh_recipe_scores", batch_size=1, stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertAlmostEqual(self.recipe.bayesian_rating, 4.0)
+        self.assertGreater(self.recipe.trending_score, 0)
+        self.assertIn("Refreshed scores of 1 recipes", out.getvalue())
+        self.assertIn("site mean rating 4.00", out.getvalue())
+
+    def test_import_and_export_recipes(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name, "recipes.jsonl")
+
+        err = StringIO()
+        call_command("export_recipes", str(path), stderr=err)
+        self.assertIn("Exported 1 recipes", err.getvalue())
+
+        Recipe.objects.all().delete()
+        with open(path, "a", encoding="utf-8") as stream:
+            stream.write("{broken\n")
+        out, err = StringIO(), StringIO()
+        call_command("import_recipes", str(path), stdout=out, stderr=err)
+
+        self.assertEqual(Recipe.objects.get().title, "Soup")
+        self.assertIn("Line 2: invalid JSON", err.getvalue())
+        self.assertIn("1 created, 0 updated, 1 skipped", out.getvalue())
+        self.assertEqual(cache.get("site-stats:total_recipes"), 1)
+
+    def test_seed_and_benchmark(self):
+        out = StringIO()
+        call_command(
+            "seed_benchmark_data",
+            users=3,
+            recipes=5,
+            comments=10,
+            favorites=4,
+            stdout=out
+        )
+        self.assertIn("Seeded 3 users, 5 recipes", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "use --flush"):
+            call_command("seed_benchmark_data", users=1, stdout=StringIO())
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name, "baseline.json")
+        out = StringIO()
+        call_command(
+            "benchmark_views",
+            repeat=1,
+            warmup=1,
+            only="GET cookbook:recipe-list",
+            output=str(path),
+            stdout=out
+        )
+        self.assertIn("GET cookbook:recipe-list [anonymous]", out.getvalue())
+
+        results = json.loads(path.read_text(encoding="utf-8"))
+        for result in results["results"].values():
+            result["queries"] -= 1
+        path.write_text(json.dumps(results), encoding="utf-8")
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "2 regressions"):
+            call_command(
+                "benchmark_views",
+                repeat=1,
+                warmup=1,
+                only="GET cookbook:recipe-list",
+                baseline=str(path),
+                # Single timings are noise, only the queries count here
+                tolerance=100,
+                stdout=out
+            )
+        self.assertIn("queries", out.getvalue())
+
+        out = StringIO()
+        call_command(
+            "benchmark_views",
+            repeat=1,
+            warmup=1,
+            only="GET cookbook:recipe-detail",
+            asgi=True,
+            stdout=out
+        )
+        self.assertIn("GET cookbook:recipe-detail [user]", out.getvalue())
+
+    def test_explain_views(self):
+        out = StringIO()
+        call_command(
+            "explain_views",
+            only="GET cookbook:recipe-detail",
+            verbosity=2,
+            stdout=out
+        )
+        self.assertIn("GET cookbook:recipe-detail [anonymous]", out.getvalue())
+        self.assertIn("queries:", out.getvalue())
+
+        with self.assertRaisesMessage(CommandError, "scan cookbook_category"):
+            call_command(
+                "explain_views",
+                only="GET cookbook:category-list",
+                problems=True,
+                fail_on_scan="cookbook_category",
+                stdout=StringIO(),
+                stderr=StringIO()
+            )
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Avg
+from django.test import TestCase
+
+from cookbook.explain import explain, explain_cases
+from cookbook.models import Category, Comment, Recipe
+
+
+User = get_user_model()
+
+
+class ExplainTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="chef", password="pw")
+        cls.category = Category.objects.create(name="Soups")
+        cls.recipe = Recipe.objects.create(
+            title="Soup",
+            author=cls.user,
+            category=cls.category,
+            cooking_time=10,
+            description="Hot",
+            ingredients="Water",
+            instructions="Boil"
+        )
+        for rating in (None, 4, 5):
+            Comment.objects.create(
+                recipe=cls.recipe,
+                author=cls.user,
+                content="Nice",
+                rating=rating
+            )
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        return explain(sql, params)
+
+    def test_listings_read_their_index_in_order(self):
+        for queryset, index in (
+            (self.recipe.comments.order_by("-created_at", "-pk"),
+             "comment_recipe_created_idx"),
+            (self.category.recipes.order_by("-created_at", "-pk"),
+             "recipe_category_created_idx"),
+            (self.user.recipes.order_by("-created_at", "-pk"),
+             "recipe_author_created_idx"),
+        ):
+            with self.subTest(index=index):
+                lines, scans, uses_index, sorts = self.plan(queryset[:20])
+                self.assertIn(index, "\n".join(lines))
+                self.assertEqual(scans, [])
+                self.assertTrue(uses_index)
+                self.assertFalse(sorts)
+
+    def test_rating_aggregates_use_the_rated_index(self):
+        rated = Comment.objects.filter(rating__isnull=False).order_by()
+        lines, scans, _, _ = self.plan(
+            rated.values("rating").annotate(mean=Avg("rating"))
+        )
+        self.assertIn("comment_rated_idx", "\n".join(lines))
+        self.assertEqual(scans, [])
+
+        Recipe.objects.filter(pk=self.recipe.pk).refresh_comment_stats()
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            (self.recipe.rating_sum, self.recipe.rating_count,
+             self.recipe.comment_count),
+            (9, 2, 3)
+        )
+
+    def test_full_scans_are_reported(self):
+        _, scans, _, _ = self.plan(Comment.objects.order_by("content"))
+        self.assertEqual(scans, ["cookbook_comment"])
+
+    def test_explain_cases(self):
+        reports = dict(explain_cases(only="recipe-detail [anonymous]"))
+        plans = reports["GET cookbook:recipe-detail [anonymous]"]
+        self.assertTrue(plans)
+        self.assertFalse(any(plan.scans for plan in plans))
+        self.assertTrue(all(plan.location for plan in plans))
@@ -0,0 +1,142 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase
+from django.urls import reverse
+
+from cookbook.facets import RecipeFilters, facet_counts, get_facets
+from cookbook.models import Category, Recipe, Tag
+
+
+User = get_user_model()
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.soups = Category.objects.create(name="Soups")
+        self.desserts = Category.objects.create(name="Desserts")
+        self.quick = Tag.objects.create(name="Quick", slug="quick")
+        self.vegan = Tag.objects.create(name="Vegan", slug="vegan")
+        self.broth = self.create_recipe("Broth", self.soups, 10, 2,
+                                        [self.quick, self.vegan])
+        self.stew = self.create_recipe("Stew", self.soups, 90, 6,
+                                       [self.vegan])
+        self.cake = self.create_recipe("Cake", self.desserts, 60, 8,
+                                       [self.quick])
+
+    def create_recipe(self, title, category, cooking_time, servings, tags):
+        recipe = Recipe.objects.create(
+            title=title,
+            author=self.user,
+            category=category,
+            cooking_time=cooking_time,
+            servings=servings,
+            description=title,
+            ingredients="Water",
+            instructions="Cook"
+        )
+        recipe.tags.set(tags)
+        return recipe
+
+    def filters(self, query):
+        return RecipeFilters(QueryDict(query))
+
+    def filtered(self, query):
+        return self.filters(query).filter(Recipe.objects.all())
+
+    def test_multiple_categories_match_any(self):
+        self.assertQuerySetEqual(
+            self.filtered(f"category={self.soups.pk}"),
+            [self.broth, self.stew],
+            ordered=False
+        )
+        self.assertEqual(
+            self.filtered(
+                f"category={self.soups.pk}&category={self.desserts.pk}"
+            ).count(),
+            3
+        )
+
+    def test_tag_modes(self):
+        both = f"tag={self.quick.pk}&tag={self.vegan.pk}"
+        self.assertQuerySetEqual(self.filtered(both), [self.broth])
+        self.assertEqual(self.filtered(f"{both}&tag_mode=any").count(), 3)
+
+    def test_ranges(self):
+        self.assertQuerySetEqual(
+            self.filtered("time_min=30&time_max=60"),
+            [self.cake]
+        )
+        self.assertQuerySetEqual(
+            self.filtered("servings_max=6&time_min=20"),
+            [self.stew]
+        )
+
+    def test_invalid_values_are_ignored(self):
+        filters = self.filters("category=soups&tag=-1&time_max=&tag_mode=x")
+        self.assertFalse(filters)
+        self.assertEqual(filters.tag_mode, "all")
+        self.assertEqual(filters.filter(Recipe.objects.all()).count(), 3)
+
+    def test_counts_in_one_query(self):
+        filters = self.filters(
+            f"category={self.soups.pk}&tag={self.quick.pk}"
+        )
+        with self.assertNumQueries(1):
+            counts = facet_counts(filters)
+        # Categories ignore the category filter, required tags do not
+        self.assertEqual(counts["category"], {
+            self.soups.pk: 1,
+            self.desserts.pk: 1,
+        })
+        self.assertEqual(counts["tag"], {
+            self.quick.pk: 1,
+            self.vegan.pk: 1,
+        })
+
+        filters = self.filters(f"tag={self.quick.pk}&tag_mode=any")
+        self.assertEqual(facet_counts(filters)["tag"], {
+            self.quick.pk: 2,
+            self.vegan.pk: 2,
+        })
+
+    def test_no_counts_for_impossible_search(self):
+        with self.assertNumQueries(0):
+            counts = facet_counts(self.filters("ingredients=%21%21"))
+        self.assertEqual(counts, {"category": {}, "tag": {}})
+
+    def test_facets_are_cached_until_recipes_change(self):
+        filters = self.filters(f"category={self.desserts.pk}")
+        facets = get_facets(filters)
+        self.assertEqual(
+            [(facet.name, facet.count, facet.selected)
+             for facet in facets["categories"]],
+            [("Desserts", 1, True), ("Soups", 2, False)]
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(get_facets(filters), facets)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_recipe("Pie", self.desserts, 50, 4, [])
+        facets = get_facets(filters)
+        self.assertEqual(facets["categories"][0].count, 2)
+
+    def test_listing(self):
+        url = reverse("cookbook:recipe-list")
+        query = {
+            "tag": [self.quick.pk, self.vegan.pk],
+            "tag_mode": "any",
+            "time_max": 60,
+        }
+        with self.assertNumQueries(6):
+            response = self.client.get(url, query)
+        self.assertQuerySetEqual(
+            response.context["recipes"],
+            [self.cake, self.broth]
+        )
+        self.assertContains(response, "Reset filters")
+        # Counts come from the cache on the next request
+        with self.assertNumQueries(3):
+            self.client.get(url, query)
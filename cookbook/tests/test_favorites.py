@@ -0,0 +1,176 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from cookbook.favorites import (
+    favorited_ids,
+    mark_favorites,
+    set_favorite,
+    toggle_favorite
+)
+from cookbook.models import Recipe
+from cookbook.views import FavoritesFeedMixin
+
+
+User = get_user_model()
+
+
+class FavoritesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.fan = User.objects.create_user(username="fan", password="pw")
+        self.recipes = [self.create_recipe(f"Recipe {i}") for i in range(3)]
+        self.recipe = self.recipes[0]
+
+    def create_recipe(self, title):
+        return Recipe.objects.create(
+            title=title,
+            author=self.user,
+            cooking_time=10,
+            description=title,
+            ingredients="Water",
+            instructions="Boil"
+        )
+
+    def favorite_count(self, recipe):
+        recipe.refresh_from_db(fields=["favorite_count"])
+        return recipe.favorite_count
+
+    def test_set_favorite_is_idempotent(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(set_favorite(self.fan, self.recipe.pk))
+        # One statement decides and writes, one shifts the count
+        statements = [
+            query["sql"].split()[0] for query in queries.captured_queries
+            if "SAVEPOINT" not in query["sql"]
+        ]
+        self.assertEqual(statements, ["INSERT", "UPDATE"])
+        self.assertFalse(set_favorite(self.fan, self.recipe.pk))
+        self.assertEqual(self.favorite_count(self.recipe), 1)
+        self.assertTrue(
+            self.fan.favorite_recipes.filter(pk=self.recipe.pk).exists()
+        )
+
+        self.assertTrue(set_favorite(self.fan, self.recipe.pk, False))
+        self.assertFalse(set_favorite(self.fan, self.recipe.pk, False))
+        self.assertEqual(self.favorite_count(self.recipe), 0)
+
+    def test_missing_recipe(self):
+        self.assertFalse(set_favorite(self.fan, 0))
+        self.assertIsNone(toggle_favorite(self.fan, 0))
+        self.assertFalse(self.fan.favorite_recipes.exists())
+
+    def test_toggle_favorite(self):
+        self.assertTrue(toggle_favorite(self.fan, self.recipe.pk))
+        self.assertTrue(toggle_favorite(self.user, self.recipe.pk))
+        self.assertEqual(self.favorite_count(self.recipe), 2)
+        self.assertFalse(toggle_favorite(self.fan, self.recipe.pk))
+        self.assertEqual(self.favorite_count(self.recipe), 1)
+
+    def test_count_follows_relation_changes(self):
+        self.fan.favorite_recipes.add(*self.recipes[:2])
+        self.recipe.favorited_by.add(self.user)
+        self.assertEqual(self.favorite_count(self.recipe), 2)
+        self.assertEqual(self.favorite_count(self.recipes[1]), 1)
+
+        self.fan.favorite_recipes.clear()
+        self.assertEqual(self.favorite_count(self.recipe), 1)
+        self.assertEqual(self.favorite_count(self.recipes[1]), 0)
+
+        self.recipe.favorited_by.clear()
+        self.assertEqual(self.favorite_count(self.recipe), 0)
+
+    def test_count_follows_user_deletion(self):
+        set_favorite(self.fan, self.recipe.pk)
+        set_favorite(self.user, self.recipe.pk)
+        set_favorite(self.fan, self.recipes[1].pk)
+        self.fan.delete()
+        self.assertEqual(self.favorite_count(self.recipe), 1)
+        self.assertEqual(self.favorite_count(self.recipes[1]), 0)
+
+    def test_mark_favorites_in_one_query(self):
+        set_favorite(self.fan, self.recipes[1].pk)
+        first = list(Recipe.objects.filter(pk=self.recipe.pk))
+        rest = list(Recipe.objects.exclude(pk=self.recipe.pk))
+        with self.assertNumQueries(1):
+            mark_favorites(self.fan, first, rest)
+        self.assertEqual(
+            {recipe.pk for recipe in first + rest if recipe.is_favorite},
+            {self.recipes[1].pk}
+        )
+
+    def test_anonymous_has_no_favorites(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                favorited_ids(AnonymousUser(), [self.recipe.pk]),
+                set()
+            )
+
+    def test_view_sets_wanted_state(self):
+        self.client.login(username="fan", password="pw")
+        url = reverse("cookbook:toggle-favorite", args=[self.recipe.pk])
+        for _ in range(2):
+            response = self.client.post(url, {"favorite": "1"})
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.favorite_count(self.recipe), 1)
+
+        self.client.post(url, {"favorite": "0"})
+        self.assertEqual(self.favorite_count(self.recipe), 0)
+
+        missing = reverse("cookbook:toggle-favorite", args=[0])
+        response = self.client.post(missing, {"favorite": "0"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_listing_marks_favorites(self):
+        set_favorite(self.fan, self.recipes[2].pk)
+        self.client.login(username="fan", password="pw")
+        response = self.client.get(reverse("cookbook:recipe-list"))
+        flags = {
+            recipe.pk: recipe.is_favorite
+            for recipe in response.context["recipes"]
+        }
+        self.assertEqual(flags, {
+            self.recipes[0].pk: False,
+            self.recipes[1].pk: False,
+            self.recipes[2].pk: True,
+        })
+        self.assertContains(response, 'title="In your favorites"', count=1)
+
+    def test_favorites_feed(self):
+        for recipe in reversed(self.recipes):
+            set_favorite(self.fan, recipe.pk)
+        url = reverse("cookbook:user-detail", args=[self.fan.pk])
+
+        response = self.client.get(url)
+        self.assertEqual(response.context["total_favorites"], 3)
+        self.assertEqual(response.context["favorite_recipes"], self.recipes)
+
+    def test_favorites_feed_pages(self):
+        for recipe in self.recipes:
+            set_favorite(self.fan, recipe.pk)
+        self.client.login(username="fan", password="pw")
+        url = reverse("accounts:profile")
+
+        with mock.patch.object(
+            FavoritesFeedMixin,
+            "favorites_paginate_by",
+            2
+        ):
+            response = self.client.get(url)
+            page = response.context["favorites_page"]
+            self.assertEqual(
+                response.context["favorite_recipes"],
+                self.recipes[:0:-1]
+            )
+            response = self.client.get(url, {"favorites": page.next_cursor})
+        self.assertEqual(
+            response.context["favorite_recipes"],
+            [self.recipe]
+        )
+        self.assertFalse(response.context["favorites_page"].has_next())
+        self.assertContains(response, "&laquo; Newer")
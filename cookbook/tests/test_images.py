@@ -0,0 +1,213 @@
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
+
+import cloudinary
+from cloudinary import CloudinaryResource
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage
+from django.db import connection
+from django.db.models.signals import post_save
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+
+from cookbook.images import process_image_deletions
+from cookbook.models import Recipe, ImageDeletion
+from cookbook import renditions
+
+
+User = get_user_model()
+
+deleted_ids = []
+
+
+def stub_delete(public_ids):
+    """Local stand-in for cloudinary.api.delete_resources"""
+    deleted_ids.extend(public_ids)
+    return {
+        public_id: "not_found" if "missing" in public_id else "deleted"
+        for public_id in public_ids
+    }
+
+
+def failing_delete(public_ids):
+    raise ConnectionError("Cloudinary is down")
+
+
+@override_settings(
+    COOKBOOK_IMAGE_DELETER="cookbook.tests.test_images.stub_delete"
+)
+class ImageDeletionTests(TestCase):
+    def setUp(self):
+        deleted_ids.clear()
+        self.user = User.objects.create_user(
+            username="chef",
+            password="password123"
+        )
+
+    def create_recipe(self, image):
+        return Recipe.objects.create(
+            title="Cake",
+            description="Sweet",
+            ingredients="Flour",
+            instructions="Bake it",
+            cooking_time=30,
+            author=self.user,
+            image=image
+        )
+
+    def test_deletes_are_queued_not_sent(self):
+        self.create_recipe("test_folder/cake").delete()
+        recipe = self.create_recipe("test_folder/pie")
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.image = "test_folder/new_pie"
+        recipe.save()
+
+        self.assertEqual(deleted_ids, [])
+        self.assertQuerySetEqual(
+            ImageDeletion.objects.order_by("public_id")
+            .values_list("public_id", flat=True),
+            ["test_folder/cake", "test_folder/pie"]
+        )
+
+    def test_cascading_user_delete_is_one_batch(self):
+        for name in ("a", "b", "missing"):
+            self.create_recipe(f"test_folder/{name}")
+        self.user.delete()
+
+        self.assertEqual(process_image_deletions(), (3, 0))
+        self.assertEqual(len(deleted_ids), 3)
+        self.assertFalse(ImageDeletion.objects.exists())
+
+    def test_failures_are_retried_later(self):
+        self.create_recipe("test_folder/cake").delete()
+
+        self.assertEqual(
+            process_image_deletions(deleter=failing_delete),
+            (0, 1)
+        )
+        deletion = ImageDeletion.objects.get()
+        self.assertEqual(deletion.attempts, 1)
+        self.assertIn("Cloudinary is down", deletion.last_error)
+        # Backed off, so nothing is due right now
+        self.assertEqual(process_image_deletions(), (0, 0))
+
+    def test_title_change_writes_only_dirty_columns(self):
+        recipe = self.create_recipe("test_folder/cake")
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.title = "Cheesecake"
+
+        with CaptureQueriesContext(connection) as queries:
+            recipe.save()
+        self.assertEqual(len(queries), 1)
+        update = queries[0]["sql"]
+        self.assertIn('"title"', update)
+        self.assertNotIn('"image"', update)
+        self.assertFalse(ImageDeletion.objects.exists())
+
+        # Nothing changed: still a save, which bumps updated_at
+        updated_at = recipe.updated_at
+        with mock.patch.object(post_save, "send") as send:
+            with CaptureQueriesContext(connection) as queries:
+                recipe.save()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"updated_at"', queries[0]["sql"])
+        self.assertNotIn('"title"', queries[0]["sql"])
+        self.assertGreater(recipe.updated_at, updated_at)
+        self.assertEqual(
+            send.call_args.kwargs["update_fields"],
+            frozenset({"updated_at"})
+        )
+
+    def test_image_change_detected_without_select(self):
+        recipe = self.create_recipe("test_folder/cake")
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.image = "test_folder/tart"
+
+        with CaptureQueriesContext(connection) as queries:
+            recipe.save()
+        self.assertFalse(any(
+            query["sql"].startswith("SELECT") for query in queries
+        ))
+        self.assertEqual(
+            ImageDeletion.objects.get().public_id,
+            "test_folder/cake"
+        )
+
+
+class RenditionTests(TestCase):
+    def setUp(self):
+        renditions._url_cache.clear()
+        cloud_name = cloudinary.config().cloud_name
+        cloudinary.config(cloud_name="demo")
+        self.addCleanup(cloudinary.config, cloud_name=cloud_name)
+        self.image = CloudinaryResource(
+            "test_folder/soup",
+            format="jpg",
+            version=1,
+            type="upload",
+            resource_type="image"
+        )
+
+    def test_cloudinary_transformation_urls(self):
+        urls = renditions.rendition_urls(self.image, "card")
+        self.assertEqual(
+            [width for _, width in urls],
+            [360, 540, 720, 1080]
+        )
+        url, _ = urls[0]
+        for option in ("c_fill", "w_360", "h_202", "f_auto", "q_auto"):
+            self.assertIn(option, url)
+        self.assertIn("test_folder/soup", url)
+
+    def test_urls_are_memoized_per_image(self):
+        with mock.patch.object(
+            CloudinaryResource,
+            "build_url",
+            autospec=True,
+            return_value="https://cdn/x.jpg"
+        ) as build_url:
+            renditions.rendition_urls(self.image, "avatar")
+            renditions.rendition_urls(
+                CloudinaryResource(
+                    "test_folder/soup",
+                    format="jpg",
+                    version=1,
+                    type="upload",
+                    resource_type="image"
+                ),
+                "avatar"
+            )
+        self.assertEqual(build_url.call_count, 4)
+
+    def test_unknown_rendition(self):
+        with self.assertRaises(ValueError):
+            renditions.rendition_urls(self.image, "poster")
+
+    def test_template_tag(self):
+        template = engines["django"].from_string(
+            "{% load cookbook_tags %}"
+            '{% responsive_image image "hero" alt="Soup" loading="eager" %}'
+        )
+        html = template.render({"image": self.image})
+        self.assertIn('srcset="', html)
+        self.assertIn(" 1920w", html)
+        self.assertIn('sizes="(min-width: 992px) 66vw, 100vw"', html)
+        self.assertIn('loading="eager"', html)
+        self.assertIn('alt="Soup"', html)
+
+    def test_local_storage_resized_with_pillow(self):
+        from PIL import Image
+
+        storage = InMemoryStorage()
+        buffer = BytesIO()
+        Image.new("RGB", (800, 600), "red").save(buffer, "PNG")
+        storage.save("photos/soup.png", ContentFile(buffer.getvalue()))
+        image = SimpleNamespace(name="photos/soup.png", storage=storage)
+
+        urls = renditions.rendition_urls(image, "admin-thumb")
+        self.assertEqual(len(urls), 2)
+        with storage.open("renditions/admin-thumb/120/photos/soup.webp") as f:
+            self.assertEqual(Image.open(f).size, (120, 120))
@@ -0,0 +1,118 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from cookbook.ingredients import cook_with, parse_ingredient
+from cookbook.models import Recipe
+
+
+User = get_user_model()
+
+
+class IngredientParserTests(TestCase):
+    def assertParsed(self, line, quantity, unit, name):
+        parsed = parse_ingredient(line)
+        self.assertEqual(
+            (parsed.quantity, parsed.unit, parsed.name),
+            (quantity, unit, name)
+        )
+
+    def test_quantities_and_units(self):
+        self.assertParsed("- 2 cups flour", Decimal("2"), "cup", "flour")
+        self.assertParsed("1 1/2 cup milk", Decimal("1.5"), "cup", "milk")
+        self.assertParsed("½ onion, chopped", Decimal("0.5"), "", "onion")
+        self.assertParsed("200g butter", Decimal("200"), "g", "butter")
+        self.assertParsed(
+            "2 tablespoons olive oil",
+            Decimal("2"),
+            "tbsp",
+            "olive oil"
+        )
+
+    def test_names_are_normalized(self):
+        self.assertParsed("3 eggs", Decimal("3"), "", "egg")
+        self.assertParsed("2-3 ripe tomatoes", Decimal("2"), "", "tomato")
+        self.assertParsed(
+            "2 cloves garlic (minced)",
+            Decimal("2"),
+            "clove",
+            "garlic"
+        )
+        self.assertParsed("Salt to taste", None, "", "salt")
+        self.assertIsNone(parse_ingredient("   "))
+
+    def test_quantities_fit_the_column(self):
+        self.assertParsed("1.23456 kg flour", Decimal("1.235"), "kg", "flour")
+        self.assertParsed("10000000 g sugar", None, "g", "sugar")
+        self.assertParsed("1" * 40 + " eggs", None, "", "egg")
+
+
+class CookWithTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.omelette = self.create_recipe(
+            "Omelette",
+            "3 eggs\n50 ml milk\nSalt to taste"
+        )
+        self.shakshuka = self.create_recipe(
+            "Shakshuka",
+            "4 eggs\n5 tomatoes\n1 onion\n1 tsp paprika\n2 tbsp olive oil"
+        )
+        self.pancakes = self.create_recipe("Pancakes", "Flour, Milk, Sugar")
+
+    def create_recipe(self, title, ingredients):
+        return Recipe.objects.create(
+            title=title,
+            author=self.user,
+            cooking_time=15,
+            description=title,
+            ingredients=ingredients,
+            instructions="Cook"
+        )
+
+    def test_rows_follow_the_text(self):
+        self.assertEqual(
+            list(self.pancakes.ingredient_items.values_list(
+                "name",
+                flat=True
+            )),
+            ["flour", "milk", "sugar"]
+        )
+        self.omelette.ingredients = "2 eggs"
+        self.omelette.save()
+        self.assertEqual(self.omelette.ingredient_items.count(), 1)
+
+        # Saves that don't touch the ingredients keep the rows
+        self.omelette.title = "Simple omelette"
+        self.omelette.save()
+        self.assertEqual(self.omelette.ingredient_items.count(), 1)
+
+    def test_oversized_quantity_is_stored_as_text(self):
+        recipe = self.create_recipe("Syrup", "10000000 g sugar\n1 l water")
+        self.assertEqual(
+            list(recipe.ingredient_items.values_list("quantity", "raw")),
+            [(None, "10000000 g sugar"), (Decimal("1"), "1 l water")]
+        )
+
+    def test_ranked_by_coverage(self):
+        recipes = list(cook_with(["Eggs", "milk", "tomato"]))
+        self.assertEqual(
+            recipes,
+            [self.omelette, self.shakshuka, self.pancakes]
+        )
+        self.assertEqual(recipes[0].matched, 2)
+        self.assertAlmostEqual(recipes[0].coverage, 2 / 3)
+        self.assertAlmostEqual(recipes[1].coverage, 2 / 5)
+
+    def test_no_match(self):
+        self.assertEqual(list(cook_with(["chocolate"])), [])
+        self.assertEqual(list(cook_with([" "])), [])
+
+    def test_recipe_list_filter(self):
+        response = self.client.get(
+            reverse("cookbook:recipe-list"),
+            {"ingredients": "tomatoes, onion"}
+        )
+        self.assertEqual(list(response.context["recipes"]), [self.shakshuka])
@@ -45,6 +45,61 @@ class ModelTests(TestCase):
         )
         self.assertEqual(self.recipe.average_rating, 4.0)
 
+    def test_recipe_stats_follow_comment_changes(self):
+        comment = Comment.objects.create(
+            recipe=self.recipe,
+            author=self.user,
+            content="Nice",
+            rating=5
+        )
+        Comment.objects.create(
+            recipe=self.recipe,
+            author=self.user,
+            content="No rating"
+        )
+
+        comment = Comment.objects.get(pk=comment.pk)
+        comment.rating = 2
+        comment.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.comment_count, 2)
+        self.assertEqual(self.recipe.rating_count, 1)
+        self.assertEqual(self.recipe.average_rating, 2.0)
+
+        comment.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.comment_count, 1)
+        self.assertIsNone(self.recipe.average_rating)
+
+    def test_recipe_stats_follow_bulk_operations(self):
+        Comment.objects.bulk_create([
+            Comment(
+                recipe=self.recipe,
+                author=self.user,
+                content=str(rating),
+                rating=rating
+            )
+            for rating in (1, 2, 3)
+        ])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.comment_count, 3)
+        self.assertEqual(self.recipe.average_rating, 2.0)
+
+        Comment.objects.filter(rating__lt=3).update(rating=5)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.average_rating, 4.3)
+
+    def test_average_rating_runs_no_queries(self):
+        Comment.objects.create(
+            recipe=self.recipe,
+            author=self.user,
+            content="Nice",
+            rating=4
+        )
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(recipe.average_rating, 4.0)
+
     def test_category_absolute_url(self):
         self.assertEqual(
             self.category.get_absolute_url(),
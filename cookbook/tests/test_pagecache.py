@@ -0,0 +1,145 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cookbook.models import Category, Comment, Recipe
+
+
+User = get_user_model()
+
+
+@override_settings(COOKBOOK_PAGE_CACHE=True)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.category = Category.objects.create(name="Soups")
+        self.recipe = Recipe.objects.create(
+            title="Borscht",
+            author=self.user,
+            category=self.category,
+            cooking_time=60,
+            description="Beet soup",
+            ingredients="Beets",
+            instructions="Boil"
+        )
+        self.detail_url = reverse(
+            "cookbook:recipe-detail",
+            args=[self.recipe.pk]
+        )
+
+    def test_anonymous_pages_are_cached(self):
+        for name in ("index", "recipe-list", "category-list", "tag-list"):
+            url = reverse(f"cookbook:{name}")
+            response = self.client.get(url)
+            self.assertEqual(response["X-Page-Cache"], "miss")
+            self.assertIn("Cookie", response["Vary"])
+
+            with self.assertNumQueries(0):
+                cached = self.client.get(url)
+            self.assertEqual(cached["X-Page-Cache"], "hit")
+            self.assertEqual(cached.content, response.content)
+            self.assertIn("Cookie", cached["Vary"])
+
+    def test_query_string_is_part_of_the_key(self):
+        self.client.get(reverse("cookbook:recipe-list"))
+        response = self.client.get(
+            reverse("cookbook:recipe-list"),
+            {"sort": "oldest"}
+        )
+        self.assertEqual(response["X-Page-Cache"], "miss")
+
+    def test_logged_in_users_bypass_the_cache(self):
+        self.client.get(self.detail_url)
+        self.client.force_login(self.user)
+        response = self.client.get(self.detail_url)
+        self.assertNotIn("X-Page-Cache", response)
+        self.assertContains(response, "Add to favorites")
+        self.assertIn("Cookie", response["Vary"])
+
+    def test_messages_cookie_bypasses_the_cache(self):
+        self.client.get(self.detail_url)
+        self.client.cookies["messages"] = "pending"
+        response = self.client.get(self.detail_url)
+        self.assertNotIn("X-Page-Cache", response)
+
+    def test_deleted_recipe_is_not_served_stale(self):
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+
+        self.assertEqual(self.client.get(self.detail_url).status_code, 404)
+        self.assertEqual(self.client.get(self.detail_url).status_code, 404)
+
+    def test_recipe_change_purges_dependent_pages(self):
+        self.client.get(self.detail_url)
+        self.client.get(reverse("cookbook:category-list"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.title = "Red borscht"
+            self.recipe.save()
+
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response["X-Page-Cache"], "revalidated")
+        self.assertContains(response, "Red borscht")
+        self.assertEqual(self.client.get(self.detail_url)["X-Page-Cache"],
+                         "hit")
+        self.assertEqual(
+            self.client.get(reverse("cookbook:category-list"))["X-Page-Cache"],
+            "revalidated"
+        )
+
+    def test_comment_purges_its_recipe_only(self):
+        other = Recipe.objects.create(
+            title="Pancakes",
+            author=self.user,
+            cooking_time=10,
+            description="Pancakes",
+            ingredients="Flour",
+            instructions="Fry"
+        )
+        other_url = reverse("cookbook:recipe-detail", args=[other.pk])
+        self.client.get(self.detail_url)
+        self.client.get(other_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                recipe=self.recipe,
+                author=self.user,
+                content="Delicious!"
+            )
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, "Delicious!")
+        self.assertEqual(self.client.get(other_url)["X-Page-Cache"], "hit")
+
+    def test_stale_page_is_served_while_revalidating(self):
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = "Hot soups"
+            self.category.save()
+
+        # Another request holds the revalidation lock
+        with mock.patch("cookbook.pagecache.cache.add", return_value=False):
+            with self.assertNumQueries(0):
+                response = self.client.get(self.detail_url)
+        self.assertEqual(response["X-Page-Cache"], "stale")
+        self.assertNotContains(response, "Hot soups")
+
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response["X-Page-Cache"], "revalidated")
+        self.assertContains(response, "Hot soups")
+
+    def test_expired_page_is_revalidated(self):
+        self.client.get(self.detail_url)
+        with override_settings(COOKBOOK_PAGE_CACHE_TIMEOUT=-1):
+            self.client.get(reverse("cookbook:index"))
+        self.assertEqual(
+            self.client.get(reverse("cookbook:index"))["X-Page-Cache"],
+            "revalidated"
+        )
+        self.assertEqual(self.client.get(self.detail_url)["X-Page-Cache"],
+                         "hit")
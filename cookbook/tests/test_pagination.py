@@ -0,0 +1,79 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from cookbook.models import Recipe, Category
+from cookbook.pagination import CursorPaginator, InvalidCursor
+
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="chef",
+            password="password123"
+        )
+        self.category = Category.objects.create(name="Soups")
+        self.recipes = [
+            Recipe.objects.create(
+                title=f"Recipe {i}",
+                description="Tasty",
+                ingredients="Water",
+                instructions="Cook it",
+                cooking_time=10,
+                author=self.user,
+                category=self.category
+            )
+            for i in range(5)
+        ]
+        # Same timestamp everywhere, so the pk has to break the ties
+        created_at = self.recipes[0].created_at
+        Recipe.objects.update(created_at=created_at)
+
+    def test_pages_forwards_and_backwards(self):
+        paginator = CursorPaginator(Recipe.objects.all(), 2)
+        expected = sorted(self.recipes, key=lambda r: r.pk, reverse=True)
+
+        first = paginator.page()
+        self.assertEqual(list(first), expected[:2])
+        self.assertFalse(first.has_previous())
+
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(list(second), expected[2:4])
+
+        last = paginator.page(second.next_cursor)
+        self.assertEqual(list(last), expected[4:])
+        self.assertFalse(last.has_next())
+
+        back = paginator.page(last.previous_cursor)
+        self.assertEqual(list(back), expected[2:4])
+        self.assertTrue(back.has_previous())
+
+    def test_page_does_not_count(self):
+        paginator = CursorPaginator(Recipe.objects.all(), 2)
+        with self.assertNumQueries(1):
+            paginator.page()
+        self.assertEqual(paginator.count, 5)
+
+    def test_invalid_cursor(self):
+        paginator = CursorPaginator(Recipe.objects.all(), 2)
+        with self.assertRaises(InvalidCursor):
+            paginator.page("not-a-cursor")
+
+    @override_settings(COOKBOOK_CURSOR_PAGINATION=True)
+    def test_views_use_cursor_pagination(self):
+        url = reverse("cookbook:recipe-list")
+        response = self.client.get(url, {"sort": "popular"})
+        page = response.context["page_obj"]
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next())
+
+        response = self.client.get(
+            reverse("cookbook:category-detail", args=[self.category.pk])
+        )
+        self.assertEqual(len(response.context["recipes"]), 5)
+
+        response = self.client.get(url, {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
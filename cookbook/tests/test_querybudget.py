@@ -0,0 +1,158 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cookbook.models import Recipe, Category, Comment, Tag
+from cookbook.querybudget import (
+    QueryBudgetExceeded,
+    QueryBudgetTestMixin,
+    QueryRecorder,
+    query_budget,
+    statement_shape
+)
+
+
+User = get_user_model()
+
+
+class QueryRecorderTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Soups")
+        self.users = [
+            User.objects.create_user(username=f"cook{i}", password="pw")
+            for i in range(3)
+        ]
+        for user in self.users:
+            Recipe.objects.create(
+                title=f"Soup by {user.username}",
+                author=user,
+                category=self.category,
+                cooking_time=10,
+                description="Hot",
+                ingredients="Water",
+                instructions="Boil"
+            )
+
+    def test_statement_shape_collapses_literals(self):
+        self.assertEqual(
+            statement_shape("SELECT * FROM t WHERE id IN (%s, %s) LIMIT 21"),
+            statement_shape("SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 5")
+        )
+
+    def test_groups_repeated_statements(self):
+        with QueryRecorder() as recorder:
+            for recipe in Recipe.objects.all():
+                recipe.author.username
+
+        self.assertEqual(recorder.count, 4)
+        repeated = recorder.repeated()
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(len(next(iter(repeated.values()))), 3)
+
+    def test_reports_template_line(self):
+        template = engines["django"].from_string(
+            "{% for recipe in recipes %}\n"
+            "{{ recipe.author.username }}\n"
+            "{% endfor %}"
+        )
+        with QueryRecorder() as recorder:
+            template.render({"recipes": Recipe.objects.all()})
+
+        self.assertIn("N+1: 3x", recorder.report())
+        locations = {query.location for query in recorder.queries[1:]}
+        self.assertEqual(len(locations), 1)
+        self.assertTrue(locations.pop().endswith(":2"))
+
+    def test_no_n_plus_one_with_select_related(self):
+        with QueryRecorder() as recorder:
+            for recipe in Recipe.objects.select_related("author"):
+                recipe.author.username
+
+        self.assertEqual(recorder.count, 1)
+        self.assertEqual(recorder.repeated(), {})
+
+    def test_budget_exceeded(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1):
+                list(Recipe.objects.all())
+                list(Category.objects.all())
+
+
+@override_settings(COOKBOOK_QUERY_BUDGET_MODE="raise")
+class QueryBudgetMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.category = Category.objects.create(name="Desserts")
+
+    def test_header_and_budget(self):
+        response = self.client.get(reverse("cookbook:category-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Query-Count"], "1")
+
+    @override_settings(COOKBOOK_QUERY_BUDGETS={"cookbook:recipe-create": 1})
+    def test_raises_over_budget(self):
+        self.client.login(username="chef", password="pw")
+        with self.assertRaisesMessage(QueryBudgetExceeded, "budget of 1"):
+            self.client.get(reverse("cookbook:recipe-create"))
+
+
+class ViewQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    """Listing pages must not grow with the number of rows they show"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(username=f"user{i}", password="pw")
+            for i in range(4)
+        ]
+        cls.categories = [
+            Category.objects.create(name=f"Category {i}") for i in range(3)
+        ]
+        cls.tag = Tag.objects.create(name="Quick", slug="quick")
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                title=f"Recipe {i}",
+                author=cls.users[i % 4],
+                category=cls.categories[i % 3],
+                cooking_time=10,
+                description="Tasty",
+                ingredients="Salt",
+                instructions="Cook"
+            )
+            recipe.tags.add(cls.tag)
+            for user in cls.users:
+                Comment.objects.create(
+                    recipe=recipe,
+                    author=user,
+                    content="Nice",
+                    rating=4
+                )
+                user.favorite_recipes.add(recipe)
+        cls.recipe = recipe
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username="user0", password="pw")
+
+    def assertPageWithoutNPlusOne(self, url):
+        with self.assertMaxQueries(16) as recorder:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # The session user shares its shape with author lookups, so only
+        # flag shapes repeated more often than that
+        self.assertNoNPlusOne(recorder, threshold=4)
+
+    def test_listings(self):
+        for url in (
+            reverse("cookbook:index"),
+            reverse("cookbook:recipe-list"),
+            reverse("cookbook:recipe-detail", args=[self.recipe.pk]),
+            reverse("cookbook:category-detail", args=[self.categories[0].pk]),
+            reverse("cookbook:tag-detail", args=[self.tag.pk]),
+            reverse("cookbook:user-detail", args=[self.users[0].pk]),
+            reverse("accounts:profile"),
+        ):
+            with self.subTest(url=url):
+                self.assertPageWithoutNPlusOne(url)
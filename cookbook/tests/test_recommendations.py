@@ -0,0 +1,140 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from cookbook import recommendations
+from cookbook.models import Recipe, RelatedRecipe, RelatedRecipeUpdate, Tag
+from cookbook.recommendations import (
+    ingredient_tokens,
+    process_related_updates,
+    rebuild_related
+)
+
+
+User = get_user_model()
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.soup = Tag.objects.create(name="Soup", slug="soup")
+        self.vegan = Tag.objects.create(name="Vegan", slug="vegan")
+        self.borscht = self.create_recipe(
+            "Borscht",
+            "2 beets, 1 cabbage, 3 potatoes, salt",
+            self.soup,
+            self.vegan
+        )
+        self.cabbage_soup = self.create_recipe(
+            "Cabbage soup",
+            "1 cabbage, 2 potatoes, carrots",
+            self.soup
+        )
+        self.pancakes = self.create_recipe(
+            "Pancakes",
+            "flour, milk, eggs"
+        )
+
+    def create_recipe(self, title, ingredients, *tags):
+        recipe = Recipe.objects.create(
+            title=title,
+            author=self.user,
+            cooking_time=30,
+            description=title,
+            ingredients=ingredients,
+            instructions="Cook"
+        )
+        recipe.tags.add(*tags)
+        return recipe
+
+    def neighbors(self, recipe):
+        return list(
+            recipe.neighbors.values_list("related_id", flat=True)
+        )
+
+    def test_ingredient_tokens(self):
+        self.assertEqual(
+            ingredient_tokens("2 cups of flour, 1 tsp salt, fresh basil"),
+            {"flour", "salt", "basil"}
+        )
+
+    def test_rebuild(self):
+        rebuild_related()
+        self.assertEqual(
+            self.neighbors(self.borscht),
+            [self.cabbage_soup.pk]
+        )
+        self.assertEqual(self.neighbors(self.pancakes), [])
+        score = RelatedRecipe.objects.get(recipe=self.borscht).score
+        self.assertAlmostEqual(
+            score,
+            RelatedRecipe.objects.get(recipe=self.cabbage_soup).score
+        )
+
+    def test_co_favorites(self):
+        for i in range(3):
+            fan = User.objects.create_user(username=f"fan{i}")
+            fan.favorite_recipes.add(self.borscht, self.pancakes)
+        rebuild_related()
+        self.assertEqual(
+            self.neighbors(self.borscht),
+            [self.cabbage_soup.pk, self.pancakes.pk]
+        )
+        self.assertEqual(self.neighbors(self.pancakes), [self.borscht.pk])
+
+    def test_incremental_update_on_tag_change(self):
+        rebuild_related()
+        self.assertFalse(RelatedRecipeUpdate.objects.exists())
+        # Only queued by the request
+        self.pancakes.tags.add(self.vegan)
+        self.assertEqual(
+            list(RelatedRecipeUpdate.objects.values_list(
+                "recipe_id",
+                flat=True
+            )),
+            [self.pancakes.pk]
+        )
+        self.assertEqual(self.neighbors(self.borscht), [self.cabbage_soup.pk])
+
+        self.assertEqual(process_related_updates(), 1)
+        self.assertIn(self.pancakes.pk, self.neighbors(self.borscht))
+        self.assertEqual(self.neighbors(self.pancakes), [self.borscht.pk])
+
+        self.pancakes.tags.clear()
+        process_related_updates()
+        self.assertNotIn(self.pancakes.pk, self.neighbors(self.borscht))
+
+    def test_candidates_are_bounded(self):
+        rebuild_related()
+        goulash = self.create_recipe("Goulash", "beef, paprika", self.soup)
+        # Borscht shares the most tags with goulash
+        goulash.tags.add(self.vegan)
+        with mock.patch.object(recommendations, "MAX_CANDIDATES", 1):
+            process_related_updates()
+        self.assertIn(goulash.pk, self.neighbors(self.borscht))
+        self.assertNotIn(goulash.pk, self.neighbors(self.cabbage_soup))
+
+    def test_new_recipe_gets_neighbors(self):
+        goulash = self.create_recipe(
+            "Goulash",
+            "beef, potatoes, paprika",
+            self.soup
+        )
+        process_related_updates()
+        self.assertCountEqual(
+            self.neighbors(goulash),
+            [self.borscht.pk, self.cabbage_soup.pk]
+        )
+        self.assertIn(goulash.pk, self.neighbors(self.cabbage_soup))
+
+    def test_detail_page_shows_neighbors(self):
+        rebuild_related()
+        response = self.client.get(
+            reverse("cookbook:recipe-detail", args=[self.borscht.pk])
+        )
+        self.assertEqual(
+            response.context["related_recipes"],
+            [self.cabbage_soup]
+        )
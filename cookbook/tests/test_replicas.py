@@ -0,0 +1,181 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase
+)
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.connection import ConnectionDoesNotExist
+
+from cookbook import replicas
+from cookbook.models import Recipe
+from cookbook.replicas import (
+    PIN_COOKIE,
+    ReplicaRouter,
+    choose_replica,
+    primary_reads,
+    read_from
+)
+from cookbook.views import FavoriteToggleView, RecipeListView
+
+
+User = get_user_model()
+
+
+@override_settings(COOKBOOK_READ_REPLICAS=["replica1", "replica2"])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        replicas._health.clear()
+        self.addCleanup(replicas._health.clear)
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def choose(self, request=None, view_class=RecipeListView):
+        return choose_replica(
+            request or self.factory.get("/recipes/"),
+            view_class
+        )
+
+    def test_reads_follow_the_request(self):
+        self.assertIsNone(self.router.db_for_read(Recipe))
+        with read_from("replica1"):
+            self.assertEqual(self.router.db_for_read(Recipe), "replica1")
+            self.assertIsNone(self.router.db_for_read(Session))
+            # Read your own writes within the request too
+            self.assertIsNone(self.router.db_for_write(Recipe))
+            self.assertIsNone(self.router.db_for_read(Recipe))
+        with read_from(None):
+            self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_primary_reads(self):
+        with primary_reads():
+            self.assertIsNone(self.router.db_for_read(Recipe))
+        with read_from("replica1") as state:
+            with primary_reads():
+                self.assertIsNone(self.router.db_for_read(Recipe))
+                self.router.db_for_write(Recipe)
+            self.assertTrue(state.wrote)
+            self.assertEqual(state.alias, "replica1")
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica1", "cookbook"))
+        self.assertIsNone(self.router.allow_migrate("default", "cookbook"))
+
+    def test_only_reads_of_read_only_views(self):
+        with mock.patch.object(replicas, "replica_lag", return_value=0):
+            self.assertIn(self.choose(), ["replica1", "replica2"])
+            self.assertIsNone(self.choose(self.factory.post("/recipes/")))
+            self.assertIsNone(self.choose(view_class=FavoriteToggleView))
+
+            request = self.factory.get("/recipes/")
+            request.COOKIES[PIN_COOKIE] = "1"
+            self.assertIsNone(self.choose(request))
+
+    def test_lagging_and_failing_replicas_are_skipped(self):
+        lags = {"replica1": 60, "replica2": 0}
+        with mock.patch.object(replicas, "replica_lag", side_effect=lags.get):
+            self.assertEqual(self.choose(), "replica2")
+
+        replicas._health.clear()
+        with mock.patch.object(
+            replicas,
+            "replica_lag",
+            side_effect=OperationalError
+        ), mock.patch.object(replicas, "connections") as connections:
+            self.assertIsNone(self.choose())
+        # Broken connections are dropped, the next check reconnects
+        connections["replica1"].close.assert_called()
+
+    def test_health_is_checked_once_per_interval(self):
+        with mock.patch.object(
+            replicas,
+            "replica_lag",
+            return_value=0
+        ) as replica_lag:
+            for _ in range(3):
+                self.choose()
+        self.assertEqual(replica_lag.call_count, 2)
+
+    def test_unknown_alias_is_unhealthy(self):
+        self.assertIsNone(self.choose())
+
+
+class ReplicaStickinessTests(TestCase):
+    def setUp(self):
+        replicas._health.clear()
+        self.addCleanup(replicas._health.clear)
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.recipe = Recipe.objects.create(
+            title="Soup",
+            author=self.user,
+            cooking_time=10,
+            description="Soup",
+            ingredients="Water",
+            instructions="Boil"
+        )
+
+    @override_settings(COOKBOOK_READ_REPLICAS=["replica"])
+    def test_writers_are_pinned_to_the_primary(self):
+        # "replica" is not configured here, reads fall back to default
+        response = self.client.get(reverse("cookbook:recipe-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        self.client.login(username="chef", password="pw")
+        response = self.client.post(
+            reverse("cookbook:toggle-favorite", args=[self.recipe.pk]),
+            {"favorite": "1"}
+        )
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], 10)
+        self.assertTrue(cookie["httponly"])
+
+    def test_no_pinning_without_replicas(self):
+        self.client.login(username="chef", password="pw")
+        response = self.client.post(
+            reverse("cookbook:toggle-favorite", args=[self.recipe.pk])
+        )
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class CacheFillingTests(TransactionTestCase):
+    # Reads inside a transaction, as in TestCase, stay on the primary
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username="chef", password="pw")
+        Recipe.objects.create(
+            title="Soup",
+            author=user,
+            cooking_time=10,
+            description="Soup",
+            ingredients="Water",
+            instructions="Boil"
+        )
+
+    @override_settings(
+        COOKBOOK_READ_REPLICAS=["replica"],
+        COOKBOOK_PAGE_CACHE=True
+    )
+    def test_caches_are_filled_from_the_primary(self):
+        # "replica" is not configured here, reading it raises
+        with mock.patch.object(
+            replicas,
+            "choose_replica",
+            return_value="replica"
+        ):
+            for url in (
+                reverse("cookbook:recipe-list"),
+                reverse("cookbook:api-suggest") + "?q=sou",
+            ):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+            self.client.login(username="chef", password="pw")
+            with self.assertRaises(ConnectionDoesNotExist):
+                self.client.get(reverse("cookbook:recipe-list"))
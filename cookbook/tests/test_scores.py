@@ -0,0 +1,126 @@
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cookbook.models import Recipe, Comment
+from cookbook.scores import (
+    RATING_PRIOR_KEY,
+    refresh_trending,
+    trending_weight
+)
+
+
+User = get_user_model()
+
+
+class RecipeScoreTests(TestCase):
+    def setUp(self):
+        cache.set(RATING_PRIOR_KEY, 3.0, None)
+        self.addCleanup(cache.delete, RATING_PRIOR_KEY)
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.old = self.create_recipe("Old favourite")
+        self.new = self.create_recipe("New thing")
+
+    def create_recipe(self, title):
+        return Recipe.objects.create(
+            title=title,
+            author=self.user,
+            cooking_time=10,
+            description=title,
+            ingredients="Water",
+            instructions="Boil"
+        )
+
+    def comment(self, recipe, rating=None):
+        return Comment.objects.create(
+            recipe=recipe,
+            author=self.user,
+            content="Nice",
+            rating=rating
+        )
+
+    def test_bayesian_rating(self):
+        self.comment(self.old, 5)
+        self.comment(self.old, 4)
+        self.comment(self.old)
+        self.old.refresh_from_db()
+        # (5 * 3.0 + 9) / (5 + 2)
+        self.assertAlmostEqual(self.old.bayesian_rating, 24 / 7)
+
+        self.new.refresh_from_db()
+        self.assertEqual(self.new.bayesian_rating, 0)
+
+    def test_single_five_star_does_not_win(self):
+        for _ in range(10):
+            self.comment(self.old, 5)
+        self.comment(self.old, 4)
+        self.comment(self.new, 5)
+
+        response = self.client.get(
+            reverse("cookbook:recipe-list"),
+            {"sort": "rating"}
+        )
+        self.assertEqual(
+            list(response.context["recipes"]),
+            [self.old, self.new]
+        )
+
+    def test_trending_follows_comments(self):
+        self.old.refresh_from_db()
+        self.new.refresh_from_db()
+        self.assertGreater(self.new.trending_score, self.old.trending_score)
+
+        comment = self.comment(self.old)
+        self.old.refresh_from_db()
+        self.assertGreater(self.old.trending_score, self.new.trending_score)
+
+        comment.delete()
+        self.old.refresh_from_db()
+        self.assertLess(self.old.trending_score, self.new.trending_score)
+
+    def test_trending_matches_recount(self):
+        for _ in range(3):
+            self.comment(self.old)
+        self.comment(self.new).delete()
+        scores = dict(Recipe.objects.values_list("pk", "trending_score"))
+        refresh_trending(Recipe.objects.all())
+        for pk, score in Recipe.objects.values_list("pk", "trending_score"):
+            self.assertAlmostEqual(scores[pk], score)
+
+    @override_settings(COOKBOOK_TRENDING_HALF_LIFE_DAYS=1)
+    def test_trending_stays_in_range(self):
+        # 2 ** 7300 is far out of float range
+        later = timezone.now() + timedelta(days=20 * 365)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            recipe = self.create_recipe("Future")
+            self.comment(recipe)
+        recipe.refresh_from_db()
+        self.assertAlmostEqual(
+            recipe.trending_score,
+            trending_weight(later) + 1
+        )
+
+    def test_bulk_refresh(self):
+        self.comment(self.old, 1)
+        Recipe.objects.update(bayesian_rating=0)
+        Recipe.objects.refresh_comment_stats()
+        self.old.refresh_from_db()
+        self.assertAlmostEqual(self.old.bayesian_rating, 16 / 6)
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite query plan")
+    def test_sorts_use_indexes(self):
+        for ordering, index in (
+            ("-comment_count", "recipe_comment_count_idx"),
+            ("-bayesian_rating", "recipe_bayesian_rating_idx"),
+            ("-trending_score", "recipe_trending_idx"),
+        ):
+            plan = Recipe.objects.order_by(ordering, "-pk")[:12].explain()
+            self.assertIn(index, plan)
+            self.assertNotIn("TEMP B-TREE", plan)
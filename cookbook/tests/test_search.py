@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.migrations.state import ProjectState
+from django.db.models.functions import Lower
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from cookbook.models import Recipe
+from cookbook.operations import PostgresAddIndex, PostgresRunSQL
+from cookbook.search import get_search_backend
+
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="chef",
+            password="password123"
+        )
+        self.soup = Recipe.objects.create(
+            title="Tomato soup",
+            description="Warm and simple",
+            ingredients="Tomatoes\nWater\nBasil",
+            instructions="Boil it",
+            cooking_time=20,
+            author=self.user
+        )
+        self.pasta = Recipe.objects.create(
+            title="Pasta",
+            description="Pasta with tomato sauce",
+            ingredients="Pasta\nBasil",
+            instructions="Cook it",
+            cooking_time=15,
+            author=self.user
+        )
+
+    def search(self, query, rank=False):
+        return get_search_backend().search(
+            Recipe.objects.all(),
+            query,
+            rank=rank
+        )
+
+    def test_search_matches_prefixes_across_fields(self):
+        self.assertQuerySetEqual(
+            self.search("tomat"),
+            [self.pasta, self.soup],
+            ordered=False
+        )
+        self.assertQuerySetEqual(self.search("basil wat"), [self.soup])
+
+    def test_search_index_follows_saves_and_deletes(self):
+        self.pasta.ingredients = "Pasta\nGarlic"
+        self.pasta.save()
+        self.assertQuerySetEqual(self.search("garlic"), [self.pasta])
+
+        self.pasta.delete()
+        self.assertQuerySetEqual(self.search("basil"), [self.soup])
+
+    def test_query_without_words_matches_as_typed(self):
+        self.soup.description = "Warm and simple!!"
+        self.soup.save()
+        self.assertQuerySetEqual(self.search("!!"), [self.soup])
+        self.assertQuerySetEqual(self.search("!!", rank=True), [self.soup])
+        self.assertQuerySetEqual(self.search("++"), [])
+
+    def test_relevance_sort_prefers_title_matches(self):
+        response = self.client.get(
+            reverse("cookbook:recipe-list"),
+            {"query": "tomato", "sort": "relevance"}
+        )
+        self.assertEqual(
+            list(response.context["recipes"]),
+            [self.soup, self.pasta]
+        )
+
+
+class PostgresOperationTests(SimpleTestCase):
+    def test_run_on_postgresql_only(self):
+        operation = PostgresRunSQL(["SELECT 1"], reverse_sql=["SELECT 2"])
+        for vendor, expected in (
+            ("sqlite", []),
+            ("postgresql", [mock.call("SELECT 1", params=None)]),
+        ):
+            schema_editor = mock.Mock()
+            schema_editor.connection.vendor = vendor
+            operation.database_forwards("cookbook", schema_editor, None, None)
+            self.assertEqual(schema_editor.execute.call_args_list, expected)
+
+    def test_index_on_postgresql_only(self):
+        index = GinIndex(
+            OpClass(Lower("name"), name="gin_trgm_ops"),
+            name="cookbook_tag_name_trgm"
+        )
+        operation = PostgresAddIndex(model_name="tag", index=index)
+        state = ProjectState.from_apps(apps)
+        operation.state_forwards("cookbook", state)
+        # Kept out of the model state, SQLite table remakes would copy it
+        self.assertNotIn(
+            index,
+            state.models["cookbook", "tag"].options.get("indexes", [])
+        )
+        for vendor, added in (("sqlite", []), ("postgresql", [index])):
+            schema_editor = mock.Mock()
+            schema_editor.connection.alias = "default"
+            schema_editor.connection.vendor = vendor
+            operation.database_forwards("cookbook", schema_editor, state,
+                                        state)
+            self.assertEqual(
+                [call.args[1] for call in schema_editor.add_index.mock_calls],
+                added
+            )
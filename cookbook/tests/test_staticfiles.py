@@ -0,0 +1,99 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from django.test.utils import override_settings
+from whitenoise.compress import Compressor
+
+from cookbook.staticfiles import WhiteNoiseMiddleware
+
+
+class StaticFilesTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.source = Path(directory.name, "source")
+        self.root = Path(directory.name, "root")
+        self.source.mkdir()
+        self.write("app.js", "console.log('soup');\n" * 50)
+        self.write("logo.png", "Cookbook")
+        self.write("app.css", "body { background: url('logo.png'); }\n" * 50)
+
+        settings = override_settings(
+            STATIC_ROOT=self.root,
+            STATICFILES_DIRS=[self.source],
+            STATICFILES_FINDERS=[
+                "django.contrib.staticfiles.finders.FileSystemFinder",
+            ],
+            STORAGES={
+                "staticfiles": {
+                    "BACKEND": "cookbook.staticfiles.StaticFilesStorage",
+                },
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write(self, name, content):
+        Path(self.source, name).write_text(content, encoding="utf-8")
+
+    def collect(self):
+        with mock.patch.object(
+            Compressor,
+            "compress",
+            autospec=True,
+            side_effect=Compressor.compress
+        ) as compress:
+            call_command("collectstatic", interactive=False, verbosity=0)
+        return sorted(
+            Path(call.args[1]).relative_to(self.root).as_posix()
+            for call in compress.call_args_list
+        )
+
+    def test_hashed_and_compressed(self):
+        self.collect()
+        js = staticfiles_storage.stored_name("app.js")
+        self.assertRegex(js, r"^app\.[0-9a-f]{12}\.js$")
+        self.assertTrue(Path(self.root, "staticfiles.json").exists())
+        self.assertTrue(Path(self.root, f"{js}.gz").exists())
+        self.assertTrue(Path(self.root, f"{js}.br").exists())
+        # Only hashed names are served
+        self.assertFalse(Path(self.root, "app.js").exists())
+        css = staticfiles_storage.stored_name("app.css")
+        self.assertIn(
+            staticfiles_storage.stored_name("logo.png"),
+            Path(self.root, css).read_text(encoding="utf-8")
+        )
+
+    def test_only_changed_files_are_collected(self):
+        self.assertEqual(len(self.collect()), 2)
+        old = staticfiles_storage.stored_name("app.js")
+        self.assertEqual(self.collect(), [])
+
+        self.write("app.js", "console.log('stew');\n" * 50)
+        compressed = self.collect()
+        new = staticfiles_storage.stored_name("app.js")
+        self.assertEqual(compressed, [new])
+        for name in (old, f"{old}.gz", f"{old}.br"):
+            self.assertFalse(Path(self.root, name).exists())
+        css = staticfiles_storage.stored_name("app.css")
+        self.assertTrue(Path(self.root, css).exists())
+
+    def test_served_immutable_and_precompressed(self):
+        self.collect()
+        middleware = WhiteNoiseMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get(
+            staticfiles_storage.url("app.js"),
+            headers={"accept-encoding": "gzip, br"}
+        )
+        response = middleware(request)
+        # response.close() would send request_finished, which touches the
+        # database connections
+        response.file_to_stream.close()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Content-Encoding"], "br")
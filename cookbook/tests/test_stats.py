@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from cookbook.models import Recipe, Comment
+from cookbook.stats import get_popular_ids, get_site_stats
+
+
+User = get_user_model()
+
+
+class SiteStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.recipes = [self.create_recipe(f"Recipe {i}") for i in range(4)]
+
+    def create_recipe(self, title):
+        return Recipe.objects.create(
+            title=title,
+            author=self.user,
+            cooking_time=10,
+            description=title,
+            ingredients="Water",
+            instructions="Boil"
+        )
+
+    def comment(self, recipe):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Comment.objects.create(
+                recipe=recipe,
+                author=self.user,
+                content="Nice"
+            )
+
+    def test_totals_follow_writes_without_queries(self):
+        self.assertEqual(get_site_stats()["total_recipes"], 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe("Another one")
+            User.objects.create_user(username="guest")
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+
+        with self.assertNumQueries(0):
+            site_stats = get_site_stats()
+        self.assertEqual(site_stats["total_recipes"], 4)
+        self.assertEqual(site_stats["total_users"], 2)
+
+    def test_popular_list_is_maintained(self):
+        self.assertEqual(get_popular_ids()[0], self.recipes[3].pk)
+        self.comment(self.recipes[1])
+        self.comment(self.recipes[1])
+        self.comment(self.recipes[2])
+        with self.assertNumQueries(0):
+            popular_ids = get_popular_ids()
+        self.assertEqual(
+            popular_ids,
+            [self.recipes[1].pk, self.recipes[2].pk, self.recipes[3].pk]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[1].comments.first().delete()
+            self.recipes[1].comments.first().delete()
+        self.assertEqual(get_popular_ids()[0], self.recipes[2].pk)
+
+    def test_popular_list_follows_bulk_writes(self):
+        self.assertEqual(get_popular_ids()[0], self.recipes[3].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.bulk_create([
+                Comment(recipe=self.recipes[0], author=self.user, content="A")
+                for _ in range(2)
+            ])
+        self.assertEqual(get_popular_ids()[0], self.recipes[0].pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.update(recipe=self.recipes[1])
+        self.assertEqual(get_popular_ids()[0], self.recipes[1].pk)
+
+    def test_index_queries_do_not_grow(self):
+        for recipe in self.recipes:
+            self.comment(recipe)
+        self.client.get(reverse("cookbook:index"))
+        # Recent recipes, their tags, popular recipes, their tags
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("cookbook:index"))
+        self.assertEqual(response.context["total_recipes"], 4)
+        self.assertEqual(len(response.context["popular_recipes"]), 3)
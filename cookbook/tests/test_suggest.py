@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from cookbook.models import Category, Recipe, Tag
+from cookbook.suggest import SuggestionIndex, Suggestion, fold, suggest
+
+
+User = get_user_model()
+
+
+class SuggestionIndexTests(TestCase):
+    def setUp(self):
+        self.index = SuggestionIndex([
+            Suggestion("recipe", 1, "Tomato soup", 5),
+            Suggestion("recipe", 2, "Crème brûlée", 9),
+            Suggestion("ingredient", None, "tomato", 1),
+            Suggestion("tag", 3, "Soups & stews", 2),
+        ])
+
+    def labels(self, query, limit=8):
+        return [suggestion.label for suggestion in
+                self.index.lookup(query, limit)]
+
+    def test_fold(self):
+        self.assertEqual(fold("  Crème   BRÛLÉE! "), "creme brulee")
+
+    def test_prefixes_of_names_and_words(self):
+        self.assertEqual(self.labels("tom"), ["Tomato soup", "tomato"])
+        # Whole-name matches first, then by weight
+        self.assertEqual(self.labels("sou"), ["Soups & stews", "Tomato soup"])
+        self.assertEqual(self.labels("tomato so"), ["Tomato soup"])
+        self.assertEqual(self.labels("CREME"), ["Crème brûlée"])
+        self.assertEqual(self.labels("sou", limit=1), ["Soups & stews"])
+        self.assertEqual(self.labels(""), [])
+
+    def test_corrections(self):
+        self.assertEqual(self.index.correct("tomatp"), "tomato")
+        self.assertEqual(self.index.correct("brulle"), "brulee")
+        self.assertIsNone(self.index.correct("xyzzy"))
+
+
+class SuggestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="chef", password="pw")
+        self.soups = Category.objects.create(name="Soups")
+        self.chicken = Recipe.objects.create(
+            title="Chicken noodle soup",
+            author=self.user,
+            category=self.soups,
+            cooking_time=30,
+            description="Warm",
+            ingredients="1 chicken\n200 g noodles",
+            instructions="Simmer"
+        )
+
+    def test_suggestions_of_every_kind(self):
+        labels = {
+            (suggestion.kind, suggestion.label)
+            for suggestion in suggest("chi").suggestions
+        }
+        self.assertEqual(labels, {
+            ("recipe", "Chicken noodle soup"),
+            ("ingredient", "chicken"),
+        })
+        self.assertEqual(
+            [suggestion.kind for suggestion in suggest("sou").suggestions],
+            ["category", "recipe"]
+        )
+
+    def test_did_you_mean(self):
+        result = suggest("chikcen noodle")
+        self.assertEqual(result.did_you_mean, "chicken noodle")
+        self.assertEqual(
+            [suggestion.label for suggestion in result.suggestions],
+            ["Chicken noodle soup"]
+        )
+        self.assertEqual(suggest("qwerty"), ([], None))
+
+    def test_index_follows_changes(self):
+        suggest("chi")
+        with self.assertNumQueries(0):
+            suggest("chi")
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name="Chilli", slug="chilli")
+        self.assertIn(
+            "Chilli",
+            [suggestion.label for suggestion in suggest("chi").suggestions]
+        )
+
+    def test_endpoint(self):
+        url = reverse("cookbook:api-suggest")
+        response = self.client.get(url, {"q": "noo", "limit": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "query": "noo",
+            "suggestions": [{
+                "type": "ingredient",
+                "id": None,
+                "label": "noodle",
+                "url": reverse("cookbook:recipe-list") + "?ingredients=noodle",
+            }],
+            "did_you_mean": None,
+        })
+        self.assertIn("max-age=60", response["Cache-Control"])
+
+        response = self.client.get(url, {"q": "soup", "limit": "x"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,226 @@
+import io
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+
+from cookbook.models import (
+    Category,
+    ImageDeletion,
+    Recipe,
+    RecipeIngredient,
+    Tag
+)
+from cookbook.pagecache import tag_versions
+from cookbook.scores import trending_weight
+from cookbook.transfer import (
+    RecipeImporter,
+    export_records,
+    read_csv,
+    read_jsonl,
+    write_csv,
+    write_jsonl
+)
+
+
+User = get_user_model()
+
+
+def record(title, **fields):
+    return dict({
+        "title": title,
+        "description": "Tasty",
+        "ingredients": "2 eggs\n100 g flour",
+        "instructions": "Mix",
+        "cooking_time": 20,
+        "author": "chef",
+    }, **fields)
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="chef", password="pw")
+
+    def run_import(self, records, **kwargs):
+        importer = RecipeImporter(**kwargs)
+        importer.run(enumerate(records, 1), batch_size=2)
+        return importer
+
+    def test_import_resolves_relations(self):
+        Tag.objects.create(name="Quick", slug="quick")
+        importer = self.run_import([
+            record(
+                "Crepes",
+                category="Desserts",
+                tags=["quick", "French Food"],
+                created_at="2024-05-01T10:00:00+00:00"
+            ),
+            record("Omelette", servings="2", tags=["Quick"]),
+        ])
+
+        self.assertEqual(importer.counts, Counter(created=2))
+        crepes = Recipe.objects.get(title="Crepes")
+        self.assertEqual(crepes.author, self.user)
+        self.assertEqual(crepes.category.name, "Desserts")
+        self.assertCountEqual(
+            crepes.tags.values_list("slug", flat=True),
+            ["quick", "french-food"]
+        )
+        self.assertEqual(
+            crepes.created_at,
+            datetime(2024, 5, 1, 10, tzinfo=dt_timezone.utc)
+        )
+        self.assertEqual(
+            crepes.trending_score,
+            trending_weight(crepes.created_at)
+        )
+        self.assertEqual(
+            list(crepes.ingredient_items.values_list("name", flat=True)),
+            ["egg", "flour"]
+        )
+        self.assertEqual(Tag.objects.count(), 2)
+        self.assertEqual(
+            Recipe.objects.get(title="Omelette").servings,
+            2
+        )
+
+    def test_tag_names_are_not_duplicated(self):
+        quick = Tag.objects.create(name="Quick Meals", slug="quick")
+        importer = self.run_import([
+            record("Toast", tags=["quick-meals", "breakfast"]),
+            record("Wrap", tags=["quick-meals"]),
+        ])
+        self.assertEqual(importer.counts, Counter(created=2))
+        self.assertCountEqual(
+            Recipe.objects.get(title="Toast").tags.all(),
+            [quick, Tag.objects.get(slug="breakfast")]
+        )
+        self.assertEqual(
+            list(Recipe.objects.get(title="Wrap").tags.all()),
+            [quick]
+        )
+
+    def test_invalid_records_are_skipped(self):
+        importer = self.run_import([
+            record("No time", cooking_time=0),
+            record("Stranger", author="nobody"),
+            ValueError("not a dict"),
+            record(""),
+            record("Fine"),
+        ])
+        self.assertEqual(importer.counts, Counter(created=1, skipped=4))
+        self.assertEqual(
+            [line for line, _ in importer.errors],
+            [1, 2, 3, 4]
+        )
+        self.assertIn("unknown author 'nobody'", importer.errors[1][1])
+
+    def test_create_authors(self):
+        self.run_import([record("Stew", author="newcomer")],
+                        create_authors=True)
+        author = User.objects.get(username="newcomer")
+        self.assertFalse(author.has_usable_password())
+        self.assertEqual(author.recipes.count(), 1)
+
+    def test_existing_ids_are_updated(self):
+        recipe = Recipe.objects.create(
+            title="Old",
+            author=self.user,
+            cooking_time=5,
+            description="Old",
+            ingredients="Salt",
+            instructions="Old"
+        )
+        recipe.tags.create(name="Old", slug="old")
+        importer = self.run_import([
+            record("New", id=recipe.pk, tags=["fresh"]),
+            record("Other", id=recipe.pk + 100),
+        ])
+
+        self.assertEqual(importer.counts, Counter(created=1, updated=1))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "New")
+        self.assertEqual(list(recipe.tags.values_list("slug", flat=True)),
+                         ["fresh"])
+        self.assertEqual(
+            RecipeIngredient.objects.filter(recipe=recipe).count(),
+            2
+        )
+        self.assertFalse(Recipe.objects.filter(pk=recipe.pk + 100).exists())
+
+    def test_updates_queue_replaced_images_and_purge(self):
+        recipes = [
+            Recipe.objects.create(
+                title=name,
+                author=self.user,
+                cooking_time=5,
+                description=name,
+                ingredients="Salt",
+                instructions="Cook",
+                image=f"test_folder/{name}"
+            )
+            for name in ("old", "kept")
+        ]
+        tags = ["recipes", f"recipe:{recipes[0].pk}"]
+        versions = tag_versions(tags)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import([
+                record("New", id=recipes[0].pk, image="test_folder/new"),
+                record("Kept", id=recipes[1].pk, image="test_folder/kept"),
+            ])
+        self.assertEqual(
+            list(ImageDeletion.objects.values_list("public_id", flat=True)),
+            ["test_folder/old"]
+        )
+        new_versions = tag_versions(tags)
+        for tag in tags:
+            self.assertGreater(new_versions[tag], versions[tag])
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        def queries(count):
+            records = [
+                (i, record(f"Recipe {i}", category=f"C{i}", tags=[f"t{i}"]))
+                for i in range(count)
+            ]
+            importer = RecipeImporter()
+            with CaptureQueriesContext(connection) as captured:
+                importer.import_batch(records)
+            return len(captured)
+
+        self.assertEqual(queries(3), queries(30))
+
+    def round_trip(self, write, read):
+        category = Category.objects.create(name="Soups")
+        recipe = Recipe.objects.create(
+            title="Borscht, \"red\"",
+            author=self.user,
+            category=category,
+            cooking_time=90,
+            description="Beet soup",
+            ingredients="3 beets\n1 cabbage",
+            instructions="Line one\nLine two"
+        )
+        recipe.tags.create(name="Vegan", slug="vegan")
+
+        stream = io.StringIO(newline="")
+        write(export_records(), stream)
+        exported = list(export_records())
+        Recipe.objects.all().delete()
+
+        stream.seek(0)
+        importer = RecipeImporter()
+        importer.run(read(stream))
+        self.assertEqual(importer.counts, Counter(created=1))
+        imported = list(export_records())
+        for entry in exported + imported:
+            entry.pop("id")
+        self.assertEqual(imported, exported)
+
+    def test_jsonl_round_trip(self):
+        self.round_trip(write_jsonl, read_jsonl)
+
+    def test_csv_round_trip(self):
+        self.round_trip(write_csv, read_csv)
@@ -2,7 +2,7 @@ from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
-from cookbook.models import Recipe, Category
+from cookbook.models import Recipe, Category, Comment
 
 
 User = get_user_model()
@@ -66,3 +66,50 @@ class CookbookViewsTest(TestCase):
             .filter(pk=self.recipe.pk)
             .exists()
         )
+
+    def test_recipe_detail_queries(self):
+        for i in range(3):
+            commenter = User.objects.create_user(username=f"critic{i}")
+            Comment.objects.create(
+                recipe=self.recipe,
+                author=commenter,
+                content="Tasty",
+                rating=i + 3
+            )
+        self.user.favorite_recipes.add(self.recipe)
+        self.client.login(
+            username="chef",
+            password="password123"
+        )
+        url = reverse(
+            "cookbook:recipe-detail",
+            kwargs={"pk": self.recipe.pk}
+        )
+        # Session, user, recipe, tags, comments and related recipes
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["is_favorite"])
+        self.assertTrue(response.context["is_author"])
+        self.assertContains(response, "Comments (3)")
+
+    def test_recipe_detail_paginates_comments(self):
+        for i in range(25):
+            Comment.objects.create(
+                recipe=self.recipe,
+                author=self.user,
+                content=f"Comment {i}"
+            )
+        url = reverse(
+            "cookbook:recipe-detail",
+            kwargs={"pk": self.recipe.pk}
+        )
+        response = self.client.get(url)
+        page = response.context["comments_page"]
+        self.assertEqual(len(page), 20)
+        self.assertFalse(response.context.get("is_favorite"))
+        self.assertContains(response, "Comments (25)")
+
+        response = self.client.get(url, {"comments": page.next_cursor})
+        self.assertEqual(len(response.context["comments"]), 5)
+        self.assertFalse(response.context["comments_page"].has_next())
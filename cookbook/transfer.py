@@ -0,0 +1,406 @@
+"""Streaming bulk import and export of recipes.
+
+A recipe is exchanged as a flat record (see FIELDS) that refers to its
+author, category and tags by username, name and slug. Records are read
+and written one at a time as JSON Lines or CSV, so files of any size run
+in constant memory.
+
+``RecipeImporter`` writes them in batches with bulk_create/bulk_update
+and resolves authors, categories and tags through in-memory maps, so a
+batch costs a handful of queries however many rows it has. Bulk writes
+send no model signals: the importer parses ingredients, sets trending
+scores, queues replaced images for deletion and purges the page cache
+itself, site stats and related recipes are left to the caller
+(``import_recipes`` refreshes both once at the end). The search index is
+maintained by the database and needs nothing.
+
+Records with an ``id`` of an existing recipe update it, all others create
+new recipes with fresh ids.
+"""
+import csv
+import json
+from collections import Counter, defaultdict
+from itertools import batched
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+
+from .images import public_id_of, queue_image_deletion
+from .ingredients import sync_ingredients
+from .models import Category, Recipe, Tag, User
+from .pagecache import purge_tags
+from .scores import trending_weight
+
+
+RECIPE_FIELDS = (
+    "title",
+    "description",
+    "ingredients",
+    "instructions",
+    "cooking_time",
+    "servings",
+)
+FIELDS = ("id",) + RECIPE_FIELDS + (
+    "author",
+    "category",
+    "tags",
+    "image",
+    "created_at",
+)
+# Separates the tag slugs of a CSV cell
+TAG_SEPARATOR = "|"
+
+
+class RecipeImportError(ValueError):
+    """A record that cannot be imported"""
+
+
+def read_jsonl(stream):
+    """(line number, record) of every non-blank line"""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            record = RecipeImportError(f"invalid JSON: {exc.msg}")
+        yield line_number, record
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    for record in reader:
+        tags = record.get("tags") or ""
+        record["tags"] = [tag for tag in tags.split(TAG_SEPARATOR) if tag]
+        yield reader.line_num, record
+
+
+def write_jsonl(records, stream):
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def write_csv(records, stream):
+    writer = csv.DictWriter(stream, FIELDS)
+    writer.writeheader()
+    for record in records:
+        writer.writerow(dict(record, tags=TAG_SEPARATOR.join(record["tags"])))
+
+
+FORMATS = {
+    "jsonl": (read_jsonl, write_jsonl),
+    "csv": (read_csv, write_csv),
+}
+_EXTENSIONS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv"}
+
+
+def format_for_path(path):
+    """Format name implied by a file extension, None if unknown"""
+    for extension, name in _EXTENSIONS.items():
+        if str(path).lower().endswith(extension):
+            return name
+    return None
+
+
+def export_records(queryset=None, batch_size=1000):
+    """Records of the given (or all) recipes in primary key order"""
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    image_field = Recipe._meta.get_field("image")
+    recipes = queryset.order_by("pk").values_list(
+        "pk",
+        *RECIPE_FIELDS,
+        "author__username",
+        "category__name",
+        "image",
+        "created_at"
+    )
+    tags = Recipe.tags.through.objects.order_by("tag__slug")
+
+    last_pk = 0
+    while True:
+        batch = list(recipes.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+
+        slugs = defaultdict(list)
+        for recipe_id, slug in tags.filter(
+            recipe_id__in=[row[0] for row in batch]
+        ).values_list("recipe_id", "tag__slug"):
+            slugs[recipe_id].append(slug)
+
+        for pk, *fields, author, category, image, created_at in batch:
+            record = {"id": pk}
+            record.update(zip(RECIPE_FIELDS, fields))
+            record.update({
+                "author": author,
+                "category": category,
+                "tags": slugs[pk],
+                "image": image_field.get_prep_value(image) or "",
+                "created_at": created_at.isoformat(),
+            })
+            yield record
+
+
+def _text(record, field, required=True, max_length=None):
+    value = record.get(field)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise RecipeImportError(f"{field} is required")
+    if max_length and len(value) > max_length:
+        raise RecipeImportError(
+            f"{field} is longer than {max_length} characters"
+        )
+    return value
+
+
+def _positive_int(record, field, default=None):
+    value = record.get(field)
+    if value in (None, "") and default is not None:
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise RecipeImportError(f"{field} must be a whole number")
+    if value < 1:
+        raise RecipeImportError(f"{field} must be at least 1")
+    return value
+
+
+def clean_record(record):
+    """Validated and normalized copy of an imported record"""
+    if isinstance(record, RecipeImportError):
+        raise record
+    if not isinstance(record, dict):
+        raise RecipeImportError("a record must be an object")
+
+    cleaned = {
+        "id": None,
+        "title": _text(record, "title", max_length=200),
+        "description": _text(record, "description"),
+        "ingredients": _text(record, "ingredients"),
+        "instructions": _text(record, "instructions"),
+        "cooking_time": _positive_int(record, "cooking_time"),
+        "servings": _positive_int(record, "servings", default=1),
+        "author": _text(record, "author", max_length=150),
+        "category": _text(record, "category", False, 100) or None,
+        "image": _text(record, "image", False, 255),
+        "created_at": None,
+    }
+    if record.get("id") not in (None, ""):
+        cleaned["id"] = _positive_int(record, "id")
+
+    tags = record.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(TAG_SEPARATOR)
+    cleaned["tags"] = set()
+    for tag in tags:
+        slug = slugify(str(tag))[:50]
+        if not slug:
+            raise RecipeImportError(f"invalid tag {tag!r}")
+        cleaned["tags"].add(slug)
+
+    created_at = _text(record, "created_at", required=False)
+    if created_at:
+        try:
+            created_at = parse_datetime(created_at)
+        except ValueError:
+            created_at = None
+        if created_at is None:
+            raise RecipeImportError("created_at is not a valid datetime")
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+        cleaned["created_at"] = created_at
+    return cleaned
+
+
+class RecipeImporter:
+    """Imports record batches, keeping the lookup maps between batches.
+
+    ``errors`` collects (line number, message) of skipped records and
+    ``counts`` the number of created, updated and skipped ones.
+    """
+
+    def __init__(self, create_authors=False):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # The tags of new recipes need their ids
+            raise RecipeImportError(
+                "the database does not return ids from bulk inserts"
+            )
+        self.create_authors = create_authors
+        self.authors = {}
+        self.categories = dict(Category.objects.values_list("name", "pk"))
+        self.tags = dict(Tag.objects.values_list("slug", "pk"))
+        self.errors = []
+        self.counts = Counter()
+
+    def run(self, records, batch_size=1000, progress=None):
+        """Imports (line number, record) pairs, returns ``counts``"""
+        for batch in batched(records, batch_size):
+            self.import_batch(batch)
+            if progress is not None:
+                progress(self.counts)
+        return self.counts
+
+    def import_batch(self, batch):
+        rows = []
+        for line_number, record in batch:
+            try:
+                rows.append((line_number, clean_record(record)))
+            except RecipeImportError as exc:
+                self.skip(line_number, str(exc))
+
+        with transaction.atomic():
+            self._resolve_authors({row["author"] for _, row in rows})
+            self._resolve(
+                Category,
+                self.categories,
+                {row["category"] for _, row in rows} - {None},
+                lambda name: Category(name=name)
+            )
+            self._resolve_tags(
+                {slug for _, row in rows for slug in row["tags"]}
+            )
+            self._write(rows)
+
+    def skip(self, line_number, message):
+        self.errors.append((line_number, message))
+        self.counts["skipped"] += 1
+
+    def _resolve_authors(self, usernames):
+        missing = usernames - self.authors.keys()
+        if not missing:
+            return
+        if self.create_authors:
+            # Unusable passwords, the accounts can be claimed by reset
+            User.objects.bulk_create(
+                [
+                    User(username=name, password=make_password(None))
+                    for name in missing
+                ],
+                ignore_conflicts=True
+            )
+        self.authors.update(User.objects.filter(
+            username__in=missing
+        ).values_list("username", "pk"))
+
+    def _resolve(self, model, lookup, keys, build):
+        missing = keys - lookup.keys()
+        if not missing:
+            return
+        key = "name" if model is Category else "slug"
+        model.objects.bulk_create(map(build, missing), ignore_conflicts=True)
+        lookup.update(model.objects.filter(
+            **{f"{key}__in": missing}
+        ).values_list(key, "pk"))
+
+    def _resolve_tags(self, slugs):
+        names = {
+            slug: slug.replace("-", " ").title()
+            for slug in slugs - self.tags.keys()
+        }
+        self._resolve(
+            Tag,
+            self.tags,
+            names.keys(),
+            lambda slug: Tag(name=names[slug], slug=slug)
+        )
+        # Names are unique too: a tag that already has the name made
+        # from a slug is that slug's tag
+        unresolved = names.keys() - self.tags.keys()
+        if unresolved:
+            by_name = dict(Tag.objects.filter(
+                name__in=[names[slug] for slug in unresolved]
+            ).values_list("name", "pk"))
+            self.tags.update(
+                (slug, by_name[names[slug]]) for slug in unresolved
+                if names[slug] in by_name
+            )
+
+    def _write(self, rows):
+        # Stored image values of the recipes to update
+        existing = dict(Recipe.objects.filter(
+            pk__in=[row["id"] for _, row in rows if row["id"]]
+        ).values_list("pk", "image"))
+
+        now = timezone.now()
+        image_field = Recipe._meta.get_field("image")
+        created, updated, tags, replaced_images = [], [], [], []
+        for line_number, row in rows:
+            author_id = self.authors.get(row["author"])
+            if author_id is None:
+                self.skip(line_number, f"unknown author {row['author']!r}")
+                continue
+            unknown_tags = sorted(set(row["tags"]) - self.tags.keys())
+            if unknown_tags:
+                self.skip(line_number, f"unknown tags {unknown_tags!r}")
+                continue
+            recipe = Recipe(
+                author_id=author_id,
+                category_id=self.categories.get(row["category"]),
+                image=row["image"] or None,
+                **{field: row[field] for field in RECIPE_FIELDS}
+            )
+            if row["id"] in existing:
+                recipe.pk = row["id"]
+                recipe.updated_at = now
+                updated.append(recipe)
+                # Exported values carry the resource type, compare the
+                # public ids
+                old_image = existing[recipe.pk]
+                if old_image and public_id_of(old_image) != public_id_of(
+                    image_field.to_python(recipe.image)
+                ):
+                    replaced_images.append(old_image)
+            else:
+                recipe.created_at = row["created_at"] or now
+                recipe.trending_score = trending_weight(recipe.created_at)
+                created.append(recipe)
+            tags.append((recipe, {self.tags[slug] for slug in row["tags"]}))
+
+        if created:
+            backdated = [
+                (recipe, recipe.created_at) for recipe in created
+                if recipe.created_at != now
+            ]
+            Recipe.objects.bulk_create(created)
+            # bulk_create stamps auto_now_add fields with the current time
+            for recipe, created_at in backdated:
+                recipe.created_at = created_at
+            Recipe.objects.bulk_update(
+                [recipe for recipe, _ in backdated],
+                ["created_at"]
+            )
+        if updated:
+            Recipe.objects.bulk_update(
+                updated,
+                list(RECIPE_FIELDS) + [
+                    "author",
+                    "category",
+                    "image",
+                    "updated_at"
+                ]
+            )
+
+        through = Recipe.tags.through
+        through.objects.filter(recipe__in=updated).delete()
+        through.objects.bulk_create([
+            through(recipe_id=recipe.pk, tag_id=tag_id)
+            for recipe, tag_ids in tags
+            for tag_id in tag_ids
+        ])
+        sync_ingredients(
+            (recipe.pk, recipe.ingredients) for recipe in created + updated
+        )
+        queue_image_deletion(*replaced_images)
+        purge_tags(
+            "recipes",
+            *(f"recipe:{recipe.pk}" for recipe in updated)
+        )
+
+        self.counts["created"] += len(created)
+        self.counts["updated"] += len(updated)
@@ -1,6 +1,7 @@
 from django.urls import path
 
-from . import views
+from . import api, views
+from .asyncviews import as_view
 
 
 app_name = "cookbook"
@@ -16,12 +17,12 @@ urlpatterns = [
     # Recipe URLs
     path(
         "recipes/",
-        views.RecipeListView.as_view(),
+        as_view(views.RecipeListView),
         name="recipe-list"
     ),
     path(
         "recipe/<int:pk>/",
-        views.RecipeDetailView.as_view(),
+        as_view(views.RecipeDetailView),
         name="recipe-detail"
     ),
     path(
@@ -79,4 +80,31 @@ urlpatterns = [
         views.UserDetailView.as_view(),
         name="user-detail"
     ),
+
+    # Read-only JSON API
+    path(
+        "api/recipes/",
+        as_view(api.RecipeListAPIView),
+        name="api-recipe-list"
+    ),
+    path(
+        "api/recipes/<int:pk>/",
+        as_view(api.RecipeDetailAPIView),
+        name="api-recipe-detail"
+    ),
+    path(
+        "api/categories/",
+        api.CategoryListAPIView.as_view(),
+        name="api-category-list"
+    ),
+    path(
+        "api/tags/",
+        api.TagListAPIView.as_view(),
+        name="api-tag-list"
+    ),
+    path(
+        "api/suggest/",
+        as_view(api.SuggestionAPIView),
+        name="api-suggest"
+    ),
 ]
@@ -9,129 +9,210 @@ from django.contrib.auth.mixins import (
 from django.contrib import messages
 from django.views import generic, View
 from django.urls import reverse_lazy
-from django.db.models import Q, Count, Avg
-from django.http import HttpResponseRedirect
+from django.db.models import Count, Exists, OuterRef
+from django.http import Http404, HttpResponseRedirect
 
 from .models import (
     User,
     Recipe,
     Category,
     Tag,
-    Comment
+    Comment,
+    RelatedRecipe
 )
 from .forms import (
     RecipeForm,
     CommentForm,
     RecipeSearchForm
 )
+from .favorites import (
+    favorites_feed,
+    mark_favorites,
+    set_favorite,
+    toggle_favorite
+)
+from .facets import RecipeFilters, get_facets
+from .pagecache import PageCacheMixin
+from .pagination import CursorPaginationMixin
+from .stats import get_site_stats
 
 
-class IndexView(generic.TemplateView):
+class IndexView(PageCacheMixin, generic.TemplateView):
     """Homepage with featured recipes"""
     template_name = "cookbook/index.html"
+    page_cache_tags = ("recipes", "categories", "tags")
+    # 4 with warm site stats, plus 3 to recompute them and 1 for the
+    # viewer's favorites
+    query_budget = 10
+    read_replica = True
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        site_stats = get_site_stats()
+        popular_ids = site_stats["popular_ids"]
+        popular_recipes = Recipe.objects.select_related(
+            "author", "category"
+        ).prefetch_related("tags").in_bulk(popular_ids)
+        popular_recipes = [
+            popular_recipes[pk] for pk in popular_ids
+            if pk in popular_recipes
+        ]
+        recent_recipes = list(
+            Recipe.objects.select_related("author", "category")
+                          .prefetch_related("tags")
+                          .order_by("-created_at")[:6]
+        )
+        mark_favorites(self.request.user, recent_recipes, popular_recipes)
+
         context.update({
-            "recent_recipes": Recipe.objects.select_related("author", "category")
-                                     .prefetch_related("tags")
-                                     .order_by("-created_at")[:6],
-            "popular_recipes": Recipe.objects.annotate(comment_count=Count("comments"))
-                                      .order_by("-comment_count")[:3],
-            "total_recipes": Recipe.objects.count(),
-            "total_users": User.objects.count(),
+            "recent_recipes": recent_recipes,
+            "popular_recipes": popular_recipes,
+            "total_recipes": site_stats["total_recipes"],
+            "total_users": site_stats["total_users"],
         })
         return context
 
 
-class RecipeListView(generic.ListView):
+class RecipeListView(PageCacheMixin, CursorPaginationMixin,
+                     generic.ListView):
     """List all recipes with search and filter"""
     model = Recipe
     template_name = "cookbook/recipe_list.html"
     context_object_name = "recipes"
     paginate_by = 12
+    page_cache_tags = ("recipes", "categories", "tags")
+    query_budget = 10
+    read_replica = True
 
     def get_queryset(self):
         queryset = Recipe.objects.select_related(
             "author", "category"
         ).prefetch_related("tags").order_by("-created_at")
 
-        query = self.request.GET.get("query")
-        if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(ingredients__icontains=query)
-            )
-
-        category_id = self.request.GET.get("category")
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
-
-        tag_id = self.request.GET.get("tag")
-        if tag_id:
-            queryset = queryset.filter(tags__id=tag_id)
-
+        filters = self.get_filters()
         sort = self.request.GET.get("sort")
-        if sort == "oldest":
+        queryset = filters.filter(queryset, rank=sort == "relevance")
+
+        # Ingredient matches keep their coverage order unless another
+        # sort is chosen
+        if sort == "relevance" and filters.query:
+            queryset = queryset.order_by("-search_rank", "-created_at")
+        elif sort == "oldest":
             queryset = queryset.order_by("created_at")
+        # Stored, indexed sort keys (see cookbook.scores)
         elif sort == "popular":
-            queryset = (queryset.annotate(
-                num_comments=Count("comments"))
-                        .order_by("-num_comments")
-                        )
+            queryset = queryset.order_by("-comment_count", "-pk")
         elif sort == "rating":
-            queryset = (queryset.annotate(
-                avg_rate=Avg("comments__rating"))
-                        .order_by("-avg_rate")
-                        )
-        else:
+            queryset = queryset.order_by("-bayesian_rating", "-pk")
+        elif sort == "trending":
+            queryset = queryset.order_by("-trending_score", "-pk")
+        elif not filters.ingredients:
             queryset = queryset.order_by("-created_at")
 
         return queryset
 
+    def get_filters(self):
+        if not hasattr(self, "filters"):
+            self.filters = RecipeFilters(self.request.GET)
+        return self.filters
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["search_form"] = RecipeSearchForm(self.request.GET)
-        context["categories"] = Category.objects.all()
-        context["tags"] = Tag.objects.all()
-        context["current_query"] = self.request.GET.get("query", "")
-        context["current_category"] = self.request.GET.get("category", "")
-        context["current_tag"] = self.request.GET.get("tag", "")
-        context["current_sort"] = self.request.GET.get("sort", "")
+        mark_favorites(self.request.user, context["object_list"])
+        # Facet counts are cached per filter combination (cookbook.facets)
+        context.update(self.get_filter_context(
+            get_facets(self.get_filters())
+        ))
         return context
 
+    def get_filter_context(self, facets):
+        filters = self.get_filters()
+        return {
+            "search_form": RecipeSearchForm(self.request.GET),
+            **facets,
+            "filters": filters,
+            "current_query": filters.query,
+            "current_sort": self.request.GET.get("sort", ""),
+            "current_ingredients": self.request.GET.get("ingredients", ""),
+        }
+
 
-class RecipeDetailView(generic.DetailView):
+class RecipeDetailView(PageCacheMixin, CursorPaginationMixin,
+                       generic.DetailView):
     """Recipe detail page with comments"""
     model = Recipe
     template_name = "cookbook/recipe_detail.html"
     context_object_name = "recipe"
+    query_budget = 6
+    read_replica = True
+    comments_paginate_by = 20
+    comments_cursor_kwarg = "comments"
+    page_cache_tags = ("categories", "tags")
+
+    def get_page_cache_tags(self):
+        return super().get_page_cache_tags() + [f"recipe:{self.kwargs['pk']}"]
+
+    def get_queryset(self):
+        # Comment statistics are stored on the recipe, so the recipe row,
+        # its tags and the viewer's favorite flag are all the page needs
+        queryset = Recipe.objects.select_related(
+            "author", "category"
+        ).prefetch_related("tags")
+
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(is_favorite=Exists(
+                User.favorite_recipes.through.objects.filter(
+                    user_id=user.pk,
+                    recipe_id=OuterRef("pk")
+                )
+            ))
+        return queryset
+
+    def get_comments(self):
+        return Comment.objects.filter(
+            recipe_id=self.kwargs["pk"]
+        ).select_related("author")
+
+    def get_related_recipes(self):
+        # Precomputed by cookbook.recommendations
+        return RelatedRecipe.objects.filter(
+            recipe_id=self.kwargs["pk"]
+        ).select_related("related__author")[:3]
 
     def get_context_data(self, **kwargs):
+        _, comments_page, _, _ = self.cursor_paginate(
+            self.get_comments(),
+            self.comments_paginate_by,
+            cursor_kwarg=self.comments_cursor_kwarg
+        )
+        return self.get_detail_context(
+            comments_page,
+            [neighbor.related for neighbor in self.get_related_recipes()],
+            **kwargs
+        )
+
+    def get_detail_context(self, comments_page, related_recipes, **kwargs):
         context = super().get_context_data(**kwargs)
-        recipe = self.get_object()
+        recipe = self.object
+        user = self.request.user
 
-        context["comments"] = (recipe.comments
-                               .select_related("author")
-                               .all()
-                               )
+        context["comments"] = comments_page.object_list
+        context["comments_page"] = comments_page
 
-        if self.request.user.is_authenticated:
+        if user.is_authenticated:
             context["comment_form"] = CommentForm()
-            context["is_favorite"] = (
-                self.request.user.favorite_recipes
-                .filter(pk=recipe.pk).exists()
-            )
+            context["is_favorite"] = recipe.is_favorite
 
         context["is_author"] = (
-                self.request.user.is_authenticated and
-                self.request.user == recipe.author
+                user.is_authenticated and
+                user.pk == recipe.author_id
         )
 
-        context["related_recipes"] = Recipe.objects.filter(
-            category=recipe.category
-        ).exclude(pk=recipe.pk).select_related("author")[:3]
+        context["related_recipes"] = related_recipes
+        self.page_cache_extra_tags = [
+            f"recipe:{related.pk}" for related in related_recipes
+        ]
 
         return context
 
@@ -215,26 +296,40 @@ class CommentCreateView(LoginRequiredMixin, View):
 
 
 class FavoriteToggleView(LoginRequiredMixin, View):
-    """Add or remove a recipe from favorites"""
+    """Add or remove a recipe from favorites.
+
+    The form posts the state it wants ("favorite" 1 or 0), so a repeated
+    submission does not undo the first one; without it the state flips.
+    """
     def post(self, request, pk):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        user = request.user
-        if user.favorite_recipes.filter(pk=recipe.pk).exists():
-            user.favorite_recipes.remove(recipe)
-            messages.info(request, "Removed from favorites.")
+        wanted = request.POST.get("favorite")
+        if wanted in ("0", "1"):
+            is_favorite = wanted == "1"
+            changed = set_favorite(request.user, pk, is_favorite)
+            if not changed and not Recipe.objects.filter(pk=pk).exists():
+                raise Http404("No recipe found matching the query")
         else:
-            user.favorite_recipes.add(recipe)
+            is_favorite = toggle_favorite(request.user, pk)
+            if is_favorite is None:
+                raise Http404("No recipe found matching the query")
+
+        if is_favorite:
             messages.success(request, "Added to favorites!")
+        else:
+            messages.info(request, "Removed from favorites.")
         return HttpResponseRedirect(
             request.META.get("HTTP_REFERER", "/")
         )
 
 
-class CategoryListView(generic.ListView):
+class CategoryListView(PageCacheMixin, generic.ListView):
     """List all categories"""
     model = Category
     template_name = "cookbook/category_list.html"
     context_object_name = "categories"
+    page_cache_tags = ("categories", "recipes")
+    query_budget = 5
+    read_replica = True
 
     def get_queryset(self):
         return Category.objects.annotate(
@@ -242,26 +337,32 @@ class CategoryListView(generic.ListView):
         ).order_by("name")
 
 
-class CategoryDetailView(generic.DetailView):
+class CategoryDetailView(CursorPaginationMixin, generic.DetailView):
     """Category detail with recipes"""
     model = Category
     template_name = "cookbook/category_detail.html"
     context_object_name = "category"
+    query_budget = 8
+    read_replica = True
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["recipes"] = (self.get_object().recipes
-                              .select_related("author")
-                              .all()
-                              )
+        context.update(self.get_cursor_page_context(
+            self.object.recipes.select_related("author", "category"),
+            "recipes"
+        ))
+        mark_favorites(self.request.user, context["recipes"])
         return context
 
 
-class TagListView(generic.ListView):
+class TagListView(PageCacheMixin, generic.ListView):
     """List all tags"""
     model = Tag
     template_name = "cookbook/tag_list.html"
     context_object_name = "tags"
+    page_cache_tags = ("tags", "recipes")
+    query_budget = 5
+    read_replica = True
 
     def get_queryset(self):
         return Tag.objects.annotate(
@@ -269,35 +370,73 @@ class TagListView(generic.ListView):
         ).order_by("name")
 
 
-class TagDetailView(generic.DetailView):
+class TagDetailView(CursorPaginationMixin, generic.DetailView):
     """Tag detail with recipes"""
     model = Tag
     template_name = "cookbook/tag_detail.html"
     context_object_name = "tag"
+    query_budget = 8
+    read_replica = True
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        tag = self.get_object()
-        context["recipes"] = (tag.recipes
-                              .select_related("author")
-                              .all()
-                              )
+        context.update(self.get_cursor_page_context(
+            self.object.recipes.select_related("author", "category"),
+            "recipes"
+        ))
+        mark_favorites(self.request.user, context["recipes"])
         return context
 
 
-class UserDetailView(generic.DetailView):
+class FavoritesFeedMixin(CursorPaginationMixin):
+    """Cursor-paginated favorites of ``get_feed_user()``, latest first"""
+    favorites_paginate_by = 12
+    favorites_cursor_kwarg = "favorites"
+
+    def get_feed_user(self):
+        """The current user by default"""
+        return self.request.user
+
+    def get_favorites_context(self):
+        user = self.get_feed_user()
+        _, page, rows, _ = self.cursor_paginate(
+            favorites_feed(user),
+            self.favorites_paginate_by,
+            cursor_kwarg=self.favorites_cursor_kwarg
+        )
+        return {
+            "favorite_recipes": [row.recipe for row in rows],
+            "favorites_page": page,
+            "total_favorites": favorites_feed(user).count(),
+        }
+
+
+class UserDetailView(FavoritesFeedMixin, generic.DetailView):
     """User profile page"""
     model = User
     template_name = "cookbook/user_detail.html"
     context_object_name = "profile_user"
+    query_budget = 10
+    read_replica = True
+
+    def get_feed_user(self):
+        return self.object
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.get_object()
+        user = self.object
+        context.update(self.get_cursor_page_context(
+            user.recipes.select_related("author", "category"),
+            "user_recipes"
+        ))
+        context.update(self.get_favorites_context())
         context.update({
-            "user_recipes": user.recipes.all(),
             "total_recipes": user.recipes.count(),
-            "favorite_recipes": user.favorite_recipes.all(),
             "total_comments": Comment.objects.filter(author=user).count(),
         })
+        mark_favorites(
+            self.request.user,
+            context["user_recipes"],
+            context["favorite_recipes"]
+        )
         return context
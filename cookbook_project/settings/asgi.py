@@ -0,0 +1,21 @@
+"""Production behind an ASGI server, opt-in through the environment.
+
+    DJANGO_SETTINGS_MODULE=cookbook_project.settings.asgi \
+    gunicorn cookbook_project.asgi:application \
+        -k uvicorn_worker.UvicornWorker --workers 4
+
+instead of ``gunicorn cookbook_project.wsgi:application``. Without the
+variable, ``cookbook_project.asgi`` uses the same settings as the WSGI
+entry point and serves the sync views only. Each worker runs one event
+loop: the read views are served by their native async variants
+(``cookbook.asyncviews``), the rest by the sync views in threads, as
+Django does for any sync view under ASGI. Compare both servers under
+load on the target machines before switching.
+
+Leave CONN_MAX_AGE at 0. Connections belong to the sync thread of a
+request, which ends with the request, so they could not be reused.
+"""
+from .prod import *  # noqa: F401,F403
+
+
+COOKBOOK_ASYNC_VIEWS = True
@@ -24,16 +24,19 @@ INSTALLED_APPS = [
     "django.contrib.contenttypes",
     "django.contrib.sessions",
     "django.contrib.messages",
-    "cloudinary_storage",
     "django.contrib.staticfiles",
+    # After staticfiles: its collectstatic only uploads to Cloudinary
+    "cloudinary_storage",
     "cloudinary",
     "cookbook",
     "accounts",
 ]
 
 MIDDLEWARE = [
+    "cookbook.querybudget.QueryBudgetMiddleware",
+    "cookbook.replicas.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "cookbook.staticfiles.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -91,6 +94,11 @@ USE_TZ = True
 AUTH_USER_MODEL = "cookbook.User"
 
 
+# Read-only views read from the aliases of COOKBOOK_READ_REPLICAS, if any
+# (see cookbook.replicas)
+DATABASE_ROUTERS = ["cookbook.replicas.ReplicaRouter"]
+
+
 STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
@@ -108,18 +116,17 @@ CLOUDINARY_STORAGE = {
 }
 
 
+# Hashed, precompressed files served by WhiteNoise with immutable cache
+# headers, uploaded media on Cloudinary (see cookbook.staticfiles)
 STORAGES = {
     "default": {
         "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
     },
     "staticfiles": {
-        "BACKEND": "cloudinary_storage.storage.StaticCloudinaryStorage",
+        "BACKEND": "cookbook.staticfiles.StaticFilesStorage",
     },
 }
 
-STATICFILES_STORAGE = "cloudinary_storage.storage.StaticCloudinaryStorage"
-DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.MediaCloudinaryStorage"
-
 
 LOGIN_REDIRECT_URL = "cookbook:index"
 LOGOUT_REDIRECT_URL = "cookbook:index"
@@ -129,3 +136,13 @@ LOGIN_URL = "accounts:login"
 MESSAGE_TAGS = {
     messages.ERROR: "danger",
 }
+
+
+# Query budgets of views that cannot declare query_budget themselves
+COOKBOOK_QUERY_BUDGETS = {
+    "admin:cookbook_category_changelist": 6,
+    "admin:cookbook_tag_changelist": 6,
+    "admin:cookbook_recipe_changelist": 12,
+    "admin:cookbook_recipe_change": 14,
+    "admin:cookbook_comment_changelist": 10,
+}
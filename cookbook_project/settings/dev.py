@@ -14,4 +14,28 @@ DATABASES = {
     }
 }
 
+# Static files are served from the apps, uncollected
+STORAGES = {
+    **STORAGES,
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
+# A second connection to the same file stands in for a read replica
+if os.getenv("COOKBOOK_DEV_REPLICA"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "TEST": {"MIRROR": "default"},
+    }
+    COOKBOOK_READ_REPLICAS = ["replica"]
+
+# Async variants of the read views (cookbook.asyncviews), to try them
+# under uvicorn cookbook_project.asgi:application or benchmark_views --asgi
+COOKBOOK_ASYNC_VIEWS = bool(os.getenv("COOKBOOK_ASYNC_VIEWS"))
+
+# Fail requests (and tests) that exceed their view query budget
+COOKBOOK_QUERY_BUDGET_MODE = "raise"
 
+# Purges run on commit, which never happens inside TestCase
+COOKBOOK_PAGE_CACHE = False
@@ -24,6 +24,33 @@ DATABASES = {
        }
    }
 
+# Streaming replicas of the primary, same credentials:
+# POSTGRES_REPLICA_HOSTS=replica-1:5432,replica-2:5432
+COOKBOOK_READ_REPLICAS = []
+for number, address in enumerate(
+    filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",")),
+    start=1
+):
+    host, _, port = address.strip().partition(":")
+    alias = f"replica{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    COOKBOOK_READ_REPLICAS.append(alias)
+
+# Page cache tag versions, card, facet and site stats entries and the
+# suggestion index version coordinate every worker, so the cache has to be
+# shared by all of them: the default LocMemCache is per process
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["REDIS_URL"],
+    }
+}
+
 SECURE_SSL_REDIRECT = True
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True